@@ -1,6 +1,6 @@
 # agents/conversational_agent.py
 # Orchestrates the flow among classifier, instruction, verification, and scoring.
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from difflib import get_close_matches
 import re
 from . import (
@@ -10,7 +10,7 @@ from . import (
     security_agent,
     recovery_agent,
 )
-from ..services import mcp_server
+from ..services import mcp_server, metrics, tracing, usage
 import logging
 from ..services.risk_confidence import score_risk_confidence
 from ..utils import is_first_aid_related
@@ -50,32 +50,47 @@ def _detect_clarification_prompt(text: str) -> Optional[str]:
     return None
 
 
+def _emit(on_event: Optional[Callable[[str, Dict], None]], kind: str, payload: Dict) -> None:
+    """Report a partial result to a streaming caller; never fails the pipeline."""
+    if on_event is None:
+        return
+    try:
+        on_event(kind, payload)
+    except Exception as exc:
+        logging.warning("Dropping %s event: %s", kind, exc)
+
+
 def handle_message(
     user_input: str,
     history: Optional[List[Dict]] = None,
     session_id: Optional[str] = None,
+    degraded: bool = False,
+    on_event: Optional[Callable[[str, Dict], None]] = None,
 ) -> Dict:
     try:
         # 0) Pull recent conversational context so the pipeline sees the full story.
         context_text = _gather_user_context(history, user_input)
 
         # 1) Security & privacy layer
-        sec = security_agent.protect(context_text)
-        sanitized_context = sec.get("sanitized", context_text)
-        context_scope_hint = sec.get("in_scope")
-        context_classifier_gate = emergency_classifier.classify_text(
-            sanitized_context
-        )
+        with metrics.stage_timer("security"), tracing.span("security"):
+            sec = security_agent.protect(context_text)
+            sanitized_context = sec.get("sanitized", context_text)
+            context_scope_hint = sec.get("in_scope")
 
-        latest_security = security_agent.protect(user_input)
-        sanitized_latest = latest_security.get("sanitized", user_input)
-        security_scope_hint = latest_security.get("in_scope")
-        security_allowed = latest_security.get("allowed", True)
+            latest_security = security_agent.protect(user_input)
+            sanitized_latest = latest_security.get("sanitized", user_input)
+            security_scope_hint = latest_security.get("in_scope")
+            security_allowed = latest_security.get("allowed", True)
 
-        classifier_gate = emergency_classifier.classify_text(sanitized_latest)
+        with metrics.stage_timer("classification_gate"), tracing.span("classification.gate"):
+            context_classifier_gate = emergency_classifier.classify_text(
+                sanitized_context
+            )
+            classifier_gate = emergency_classifier.classify_text(sanitized_latest)
 
         # 2) Detect recovery cues so downstream components can conclude safely.
-        recovery = recovery_agent.detect(history or [], user_input)
+        with metrics.stage_timer("recovery"), tracing.span("recovery"):
+            recovery = recovery_agent.detect(history or [], user_input)
 
         in_scope = classifier_gate.get("is_first_aid", False)
         if not security_allowed:
@@ -100,7 +115,26 @@ def handle_message(
         if session_id:
             conversation_meta["session_id"] = session_id
 
+        # Keyword gates missed but the message still looks borderline: let the
+        # local centroid classifier (if loaded) overturn the rejection when it
+        # is clearly closer to a category than to out-of-scope. The embedding
+        # is reused for retrieval.
+        query_embedding: Optional[List[float]] = None
+        if not in_scope and security_allowed and emergency_classifier.rejection_is_ambiguous(sanitized_latest, classifier_gate):
+            query_embedding = instruction_agent.embed(sanitized_latest) or None
+            with tracing.span("classification.centroid") as centroid_span:
+                local_triage = emergency_classifier.classify(sanitized_latest, embedding=query_embedding)
+                centroid_span.set(
+                    category=local_triage.get("category"),
+                    source=local_triage.get("source"),
+                    margin=local_triage.get("margin"),
+                )
+            if emergency_classifier.overrides_rejection(local_triage):
+                in_scope = True
+                conversation_meta["in_scope"] = True
+
         if not in_scope:
+            metrics.REJECTIONS.inc(stage="pipeline")
             risk_stub = score_risk_confidence(
                 {"category": "out_of_scope", "severity": "low"},
                 {"passed": False, "skipped": True},
@@ -123,24 +157,36 @@ def handle_message(
             }
 
         # 2) Emergency classification
-        triage = emergency_classifier.classify(sanitized_latest)
-        if security_allowed:
-            triage_needs_context = triage.get("category") in {"out_of_scope", "unknown"}
-            triage_needs_context = triage_needs_context or not triage.get("keywords")
-            if triage_needs_context and context_classifier_gate.get("is_first_aid"):
-                triage = emergency_classifier.classify(sanitized_context)
-
-        in_scope = is_first_aid_related(sanitized_latest, triage)
-        if not in_scope:
-            context_in_scope = is_first_aid_related(sanitized_context, triage)
-            if context_in_scope:
-                in_scope = True
+        with metrics.stage_timer("triage"), tracing.span("classification.triage") as triage_span:
+            triage = emergency_classifier.classify(sanitized_latest, embedding=query_embedding)
+            if security_allowed and query_embedding is None and emergency_classifier.needs_local_triage(triage):
+                # Weak keyword triage: embed once, score against the local centroids.
+                query_embedding = instruction_agent.embed(sanitized_latest) or None
+                triage = emergency_classifier.classify(sanitized_latest, embedding=query_embedding)
+            if security_allowed and triage.get("source") != "centroid":
+                triage_needs_context = triage.get("category") in {"out_of_scope", "unknown"}
+                triage_needs_context = triage_needs_context or not triage.get("keywords")
+                if triage_needs_context and context_classifier_gate.get("is_first_aid"):
+                    triage = emergency_classifier.classify(sanitized_context)
+
+            in_scope = is_first_aid_related(sanitized_latest, triage)
+            if not in_scope:
+                context_in_scope = is_first_aid_related(sanitized_context, triage)
+                if context_in_scope:
+                    in_scope = True
+            usage.label(category=triage.get("category"))
+            triage_span.set(
+                category=triage.get("category"),
+                severity=triage.get("severity"),
+                source=triage.get("source", "keywords"),
+            )
 
         if not security_allowed:
             in_scope = False
         elif security_scope_hint is True:
             in_scope = True
         conversation_meta["in_scope"] = in_scope
+        _emit(on_event, "triage", {"triage": triage, "in_scope": in_scope})
 
         em_numbers, maps_hint = {}, {}
         instructions = {"steps": []}
@@ -149,24 +195,30 @@ def handle_message(
         if in_scope:
             # 3) Get external tools via MCP-like adapter
             try:
-                em_numbers = mcp_server.get_emergency_numbers()
-                maps_hint = mcp_server.get_location_from_maps("nearest hospital")
+                with metrics.stage_timer("mcp_tools"), tracing.span("mcp_tools"):
+                    em_numbers = mcp_server.get_emergency_numbers()
+                    maps_hint = mcp_server.get_location_from_maps("nearest hospital")
             except Exception as e:
                 logging.warning(f"Error getting tools from MCP server: {e}")
                 # Default values are already set, so we can just log and continue
 
             # 4) Generate first aid instructions grounded on KB
-            instructions = instruction_agent.generate(
-                sanitized_latest,
-                category=str(triage.get("category") or ""),
-                severity=str(triage.get("severity") or ""),
-            )
+            with tracing.span("instructions"):
+                instructions = instruction_agent.generate(
+                    sanitized_latest,
+                    category=str(triage.get("category") or ""),
+                    severity=str(triage.get("severity") or ""),
+                    use_llm=not degraded,
+                    query_embedding=query_embedding,
+                )
 
             # 5) Verify against guardrails
             instruction_steps = instructions.get("steps")
             if not instruction_steps:
                 raise ValueError("Instruction agent did not return 'steps'")
-            verification_result = verification_agent.verify(instruction_steps)
+            with metrics.stage_timer("verification"), tracing.span("verification"):
+                verification_result = verification_agent.verify(instruction_steps)
+            _emit(on_event, "steps", {"instructions": instructions, "verification": verification_result})
 
             clarification_prompt = _detect_clarification_prompt(user_input)
             needs_clarification = clarification_prompt is not None
@@ -197,3 +249,26 @@ def handle_message(
             "error": "An internal error occurred while processing your request.",
             "details": str(e)
         }
+
+
+def prefetch(draft: str, session_id: Optional[str] = None) -> str:
+    """Cheaply triage a draft turn and warm the retrieval it is likely to need.
+
+    Mirrors the first steps of :func:`handle_message` (sanitization, scope
+    gate, keyword triage) without any model call; returns the prefetch status.
+    """
+
+    protected = security_agent.protect(draft)
+    if not protected.get("allowed", True):
+        return "out_of_scope"
+    sanitized = protected.get("sanitized", draft)
+    triage = emergency_classifier.classify(sanitized)
+    category = str(triage.get("category") or "")
+    # Same final scope decision as handle_message (without conversation context).
+    in_scope = protected.get("in_scope") is True or is_first_aid_related(sanitized, triage)
+    if not in_scope or category == "out_of_scope":
+        return "out_of_scope"
+    with usage.scope(session_id=session_id, category=category):
+        return instruction_agent.prefetch_context(
+            sanitized, category=category, severity=str(triage.get("severity") or "")
+        )
@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from ..config import TRIAGE_CENTROID_MIN_MARGIN
+from ..services import triage_centroids
 from ..utils import FIRST_AID_KEYWORDS, basic_sanitize
 
 # Minimal rule-based mapping used after the allow-list gate passes.
@@ -20,6 +22,8 @@ _CATEGORY_RULES: List[Tuple[str, List[str]]] = [
     ("poisoning", ["poison", "overdose", "toxic"]),
 ]
 
+CATEGORY_KEYWORDS: Dict[str, List[str]] = dict(_CATEGORY_RULES)
+
 _SEVERITY_HINTS = {
     "bleeding": "medium",
     "burn": "medium",
@@ -28,6 +32,17 @@ _SEVERITY_HINTS = {
     "fracture": "high",
 }
 
+# Words that do not pass the allow-list gate on their own but make a rejected
+# message worth a second look from the centroid model.
+_WEAK_CUES = {
+    "arm", "hand", "palm", "finger", "thumb", "wrist", "elbow", "shoulder", "leg", "knee", "ankle",
+    "foot", "toe", "hip", "back", "neck", "head", "face", "eye", "ear", "nose", "mouth", "lip",
+    "tongue", "throat", "chest", "stomach", "belly", "skin", "tooth",
+    "swollen", "oozing", "itchy", "itching", "throbbing", "sore", "red", "purple", "vomit",
+    "vomiting", "unconscious", "unresponsive", "collapsed", "fell", "fall", "hit", "stung",
+    "bitten", "sick", "shaking", "pale", "sweating", "hurts",
+}
+
 _TOKEN_PATTERN = re.compile(r"[a-zA-Z]+", re.IGNORECASE)
 
 
@@ -78,6 +93,23 @@ def classify_text(text: str) -> Dict[str, object]:
     }
 
 
+def _severity_for(category: str, lowered: str) -> str:
+    if category in _SEVERITY_HINTS:
+        return _SEVERITY_HINTS[category]
+    if any(term in lowered for term in ("severe", "heavy", "worse", "worsening", "can't breathe", "cant breathe")):
+        return "high"
+    if any(term in lowered for term in ("swelling", "bad", "painful", "deep", "large")):
+        return "medium"
+    return "low"
+
+
+def severity_hint(category: str) -> str:
+    """Severity assumed for a category (or an alias such as "anaphylaxis") with no other detail."""
+
+    lowered = (category or "").lower()
+    return _severity_for(_rule_based_classification(lowered)["category"], lowered)
+
+
 def _rule_based_classification(text: str) -> Dict[str, object]:
     lowered = text.lower()
     category = "unknown"
@@ -88,19 +120,45 @@ def _rule_based_classification(text: str) -> Dict[str, object]:
             matched_keywords = keywords[:3]
             break
 
-    severity = "low"
-    if category in _SEVERITY_HINTS:
-        severity = _SEVERITY_HINTS[category]
-    elif any(term in lowered for term in ("severe", "heavy", "worse", "worsening", "can't breathe", "cant breathe")):
-        severity = "high"
-    elif any(term in lowered for term in ("swelling", "bad", "painful", "deep", "large")):
-        severity = "medium"
+    return {"category": category, "severity": _severity_for(category, lowered), "keywords": matched_keywords}
 
-    return {"category": category, "severity": severity, "keywords": matched_keywords}
 
+def _centroid_classification(text: str, prediction: Dict[str, object]) -> Dict[str, object]:
+    category = str(prediction["category"])
+    if category == "out_of_scope":
+        return {
+            "category": "out_of_scope",
+            "severity": "low",
+            "keywords": [],
+            "confidence": prediction["confidence"],
+            "margin": prediction.get("margin", 0.0),
+            "source": "centroid",
+        }
+    lowered = text.lower()
+    keywords = CATEGORY_KEYWORDS.get(category, [])
+    return {
+        "category": category,
+        "severity": _severity_for(category, lowered),
+        "keywords": [k for k in keywords if k in lowered][:3],
+        "confidence": prediction["confidence"],
+        "margin": prediction.get("margin", 0.0),
+        "label": category,
+        "source": "centroid",
+    }
+
+
+def classify(text: str, embedding: Optional[Sequence[float]] = None) -> Dict[str, object]:
+    """Maintain compatibility for callers needing triage metadata.
 
-def classify(text: str) -> Dict[str, object]:
-    """Maintain compatibility for callers needing triage metadata."""
+    When ``embedding`` (the query embedding from ``instruction_agent.embed``)
+    is given and a local centroid model is loaded, a confident nearest-centroid
+    prediction decides the category; otherwise the keyword rules apply.
+    """
+
+    if embedding:
+        prediction = triage_centroids.predict(embedding)
+        if prediction is not None:
+            return _centroid_classification(text, prediction)
 
     gate = classify_text(text)
     if not gate.get("is_first_aid"):
@@ -117,4 +175,40 @@ def classify(text: str) -> Dict[str, object]:
     return triage
 
 
-__all__ = ["classify_text", "classify"]
+def needs_local_triage(triage: Dict[str, object]) -> bool:
+    """True when keyword triage is too weak and a local centroid model is loaded."""
+
+    return triage.get("category") in {"out_of_scope", "unknown"} and triage_centroids.available()
+
+
+def rejection_is_ambiguous(text: str, gate: Dict[str, object]) -> bool:
+    """True when the keyword gate rejected ``text`` yet it still carries weak first-aid cues."""
+
+    if gate.get("is_first_aid") or not triage_centroids.available():
+        return False
+    if gate.get("confidence", 0.0):
+        return True
+    lowered = basic_sanitize(text).lower()
+    if any(cue in lowered for keywords in CATEGORY_KEYWORDS.values() for cue in keywords):
+        return True
+    return any(token in _WEAK_CUES for token in _tokenize(lowered))
+
+
+def overrides_rejection(triage: Dict[str, object]) -> bool:
+    """True when a centroid prediction is decisive enough to bring a rejected message in scope."""
+
+    return (
+        triage.get("source") == "centroid"
+        and triage.get("category") != "out_of_scope"
+        and float(triage.get("margin") or 0.0) >= TRIAGE_CENTROID_MIN_MARGIN
+    )
+
+
+__all__ = [
+    "CATEGORY_KEYWORDS",
+    "classify_text",
+    "classify",
+    "needs_local_triage",
+    "rejection_is_ambiguous",
+    "overrides_rejection",
+]
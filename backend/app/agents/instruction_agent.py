@@ -1,38 +1,138 @@
 # agents/instruction_agent.py
 # Generates step-by-step first-aid instructions grounded by retrieved guides.
-from typing import List, Dict
+from array import array
+from typing import List, Dict, Optional, Tuple
+import json
 import logging
-import requests
-from ..config import MODEL_PREFERENCE, OPENAI_API_KEY, GROQ_API_KEY, EMBEDDING_MODEL, has_openai
-from ..services import vector_db
+import time
+from ..config import (
+    MODEL_PREFERENCE, OPENAI_API_KEY, GROQ_API_KEY, EMBEDDING_MODEL, has_openai,
+    OPENAI_API_BASE, GROQ_API_BASE, EMBEDDING_CACHE_TTL_SECONDS, GENERATION_CACHE_TTL_SECONDS,
+    EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_IN_FLIGHT,
+)
+from ..services import (
+    batching, cache, context_bundles, generation_profiles, lexical_index, metrics, prefetch, tracing, upstream, usage,
+    vector_db,
+)
 from ..utils import chunk_text
 
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
-OPENAI_EMBED_URL = "https://api.openai.com/v1/embeddings"
+OPENAI_CHAT_URL = f"{OPENAI_API_BASE}/chat/completions"
+GROQ_CHAT_URL = f"{GROQ_API_BASE}/chat/completions"
+OPENAI_EMBED_URL = f"{OPENAI_API_BASE}/embeddings"
+
+# Embeddings are cached across requests (and workers, with a shared CACHE_BACKEND):
+# triage and retrieval often embed the same text. Vectors are stored packed as doubles.
+_EMBED_CACHE = cache.Cache(
+    "embedding",
+    EMBEDDING_CACHE_TTL_SECONDS,
+    encode=lambda vector: array("d", vector).tobytes(),
+    decode=lambda data: array("d", data).tolist(),
+)
+_GENERATION_CACHE = cache.Cache("generation", GENERATION_CACHE_TTL_SECONDS)
+
+
+class _NoEmbedding(Exception):
+    """Embedding unavailable; raised so the empty result is not cached."""
+
 
 def embed(text: str) -> List[float]:
+    def compute() -> List[float]:
+        vector = _embed_remote(text)
+        if not vector:
+            raise _NoEmbedding()
+        return vector
+
+    try:
+        return _EMBED_CACHE.get_or_compute(text, compute)
+    except _NoEmbedding:
+        return []
+
+
+def _embed_remote(text: str) -> List[float]:
     # Use OpenAI embeddings to query Astra vector search
     if not has_openai():
         logging.warning("OPENAI_API_KEY not set; returning empty embedding")
         return []
     try:
-        headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-        r = requests.post(OPENAI_EMBED_URL, headers=headers, json={
-            "model": EMBEDDING_MODEL,
-            "input": text
-        }, timeout=10)
-        data = r.json()
-        return data.get("data", [{}])[0].get("embedding", [])
+        with metrics.stage_timer("embedding"), tracing.span("embedding", model=EMBEDDING_MODEL) as span:
+            started = time.perf_counter()
+            (vector, tokens), batch_size = _EMBED_BATCHER.submit(text)
+            span.set(embedding_tokens=tokens, batch_size=batch_size)
+        usage.record(
+            "embedding",
+            "openai",
+            EMBEDDING_MODEL,
+            seconds=time.perf_counter() - started,
+            embedding_tokens=tokens,
+            prompt_chars=len(text),
+            shape="batched" if batch_size > 1 else "single",
+        )
+        return vector
     except Exception as exc:
         logging.warning("Embedding request failed: %s", exc)
         return []
 
-def retrieve_context(query: str) -> List[Dict]:
-    vec = embed(query)
-    if not vec:
-        return []
-    return vector_db.similarity_search(vec, top_k=4)
+
+def _embed_batch(texts: List[str]) -> List[Tuple[List[float], Optional[int]]]:
+    """One embeddings request for several inputs; usage is apportioned by length."""
+
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    r = upstream.post("openai", "embeddings", OPENAI_EMBED_URL, headers=headers, json={
+        "model": EMBEDDING_MODEL,
+        "input": texts if len(texts) > 1 else texts[0]
+    }, timeout=10)
+    r.raise_for_status()
+    data = r.json()
+    rows = sorted(data.get("data") or [], key=lambda row: row.get("index", 0))
+    vectors = [row.get("embedding", []) for row in rows]
+    prompt_tokens = (data.get("usage") or {}).get("prompt_tokens")
+    total_chars = sum(len(t) for t in texts) or 1
+    return [
+        (vector, None if prompt_tokens is None else round(prompt_tokens * len(text) / total_chars))
+        for vector, text in zip(vectors, texts)
+    ]
+
+
+_EMBED_BATCHER = batching.MicroBatcher(
+    "embedding",
+    _embed_batch,
+    window=EMBED_BATCH_WINDOW_MS / 1000.0,
+    max_batch=EMBED_BATCH_MAX_SIZE,
+    max_in_flight=EMBED_BATCH_MAX_IN_FLIGHT,
+)
+
+def retrieve_context(query: str, embedding: Optional[List[float]] = None, top_k: int = 4) -> List[Dict]:
+    with tracing.span("lexical_search", top_k=top_k) as span:
+        lexical_hits = lexical_index.search(query, top_k)
+        span.set(hits=len(lexical_hits), top_score=round(lexical_hits[0].score, 3) if lexical_hits else None)
+    lexical_docs = [hit.document for hit in lexical_hits[:top_k]]
+    if lexical_index.is_decisive(lexical_hits, top_k):
+        # Clear-cut lexical match: skip the embeddings call and the vector search.
+        lexical_index.RETRIEVALS.inc(mode="lexical")
+        if not embedding:
+            lexical_index.CALLS_AVOIDED.inc(call="embedding")
+        lexical_index.CALLS_AVOIDED.inc(call="vector_search")
+        return lexical_docs
+
+    vec = embedding or embed(query)
+    docs: List[Dict] = []
+    if vec:
+        with metrics.stage_timer("vector_search"), tracing.span("vector_search", top_k=top_k) as span:
+            docs = vector_db.similarity_search(vec, top_k=top_k)
+            span.set(documents=len(docs))
+    if lexical_docs:
+        lexical_index.RETRIEVALS.inc(mode="hybrid")
+        return lexical_index.fuse(lexical_docs, docs, top_k=top_k)
+    if docs:
+        lexical_index.RETRIEVALS.inc(mode="vector")
+    return docs
+
+
+def _doc_field(doc: Dict, field: str):
+    # Astra returns stored fields at the top level; older payloads nest them under "document".
+    if field in doc:
+        return doc[field]
+    return (doc.get("document") or {}).get(field)
 
 SYSTEM = (
     "You are a First Aid instruction generator. Use provided 'context' strictly. "
@@ -120,6 +220,16 @@ SCENARIO_LIBRARY = [
             "4) If trained, begin CPR if they stop breathing or lose pulse."
         ),
     },
+    {
+        "labels": {"poisoning", "overdose"},
+        "keywords": ["poison", "overdose", "toxic", "swallowed"],
+        "steps": (
+            "1) Move away from the source if it's safe and call emergency services or poison control right away.\n"
+            "2) Don't induce vomiting or give food or drink unless a professional tells you to.\n"
+            "3) Keep the container or label so responders know what was taken.\n"
+            "4) If the person becomes unresponsive or stops breathing, begin CPR if trained."
+        ),
+    },
 ]
 
 
@@ -144,40 +254,149 @@ def _fallback_steps(query: str, category: str = "") -> str:
     )
 
 
-def generate(query: str, *, category: str = "", severity: str = "") -> Dict:
+def _search_query(category: str, query: str) -> str:
+    return f"{category} {query}".strip() or query
+
+
+def prefetch_context(query: str, *, category: str = "", severity: str = "") -> str:
+    """Run the retrieval ``generate`` would run for this turn and keep the result.
+
+    Returns ``bundled`` when a context bundle will answer instead, ``cached``
+    when the query was already prefetched, otherwise ``warmed``.
+    """
+
+    category_hint = (category or "").strip()
+    if context_bundles.lookup(category_hint, query, count=False) is not None:
+        return "bundled"
+    profile = generation_profiles.select(severity, category_hint, count=False)
+    search_query = _search_query(category_hint, query)
+    if prefetch.peek(search_query, profile.top_k) is not None:
+        return "cached"
+    prefetch.put(search_query, profile.top_k, retrieve_context(search_query, top_k=profile.top_k))
+    return "warmed"
+
+
+def guide_steps(category: str) -> str:
+    """Deterministic steps for a category, as served by the precomputed guides."""
+
+    return _fallback_steps(category, category)
+
+
+def _generation_key(provider: str, model: str, profile, user_content: str) -> str:
+    return json.dumps(
+        [provider, model, profile.temperature, profile.max_tokens, SYSTEM, user_content], ensure_ascii=False
+    )
+
+
+def _complete(provider: str, url: str, headers: Dict, model: str, profile, user_content: str, prompt_shape: str, span) -> str:
+    """One chat completion; raises when the provider returns nothing usable, so failures are never cached."""
+
+    started = time.perf_counter()
+    payload = {
+        "model": model,
+        "messages":[
+            {"role":"system","content":SYSTEM},
+            {"role":"user","content":user_content}
+        ],
+        "temperature": profile.temperature,
+    }
+    if profile.max_tokens:
+        payload["max_tokens"] = profile.max_tokens
+    r = upstream.post(provider, "chat_completions", url, headers=headers, json=payload, timeout=profile.timeout)
+    r.raise_for_status()
+    data = r.json()
+    content = data.get("choices",[{}])[0].get("message",{}).get("content","")
+    usage_block = data.get("usage") or {}
+    span.set(prompt_tokens=usage_block.get("prompt_tokens"), completion_tokens=usage_block.get("completion_tokens"))
+    usage.record(
+        "generation",
+        provider,
+        model,
+        seconds=time.perf_counter() - started,
+        prompt_tokens=usage_block.get("prompt_tokens"),
+        completion_tokens=usage_block.get("completion_tokens"),
+        prompt_chars=len(SYSTEM) + len(user_content),
+        completion_chars=len(content or ""),
+        shape=prompt_shape,
+    )
+    if not content or content.strip().lower() == "no response":
+        raise ValueError("Instruction provider returned no usable content")
+    return content
+
+
+def generate(
+    query: str,
+    *,
+    category: str = "",
+    severity: str = "",
+    use_llm: bool = True,
+    query_embedding: Optional[List[float]] = None,
+) -> Dict:
     category_hint = (category or "").strip()
     severity_hint = (severity or "").strip()
 
-    search_query = f"{category_hint} {query}".strip()
-    context_docs = retrieve_context(search_query or query)
-    context_text = "\n\n".join([d.get('document', {}).get('text','') for d in context_docs])
-    # Safety against long contexts
-    context_text = "\n\n".join(chunk_text(context_text, 400))
+    if not use_llm:
+        # Shed by admission control: answer deterministically, skip retrieval too.
+        metrics.FALLBACKS.inc(category=category_hint.lower() or "unknown", reason="shed")
+        tracing.current_span().set(fallback=True, shed=True)
+        return {"steps": _fallback_steps(query, category_hint), "sources": [], "degraded": True}
+
+    profile = generation_profiles.select(severity_hint, category_hint)
+    profile_started = time.perf_counter()
+    bundle = context_bundles.lookup(category_hint, query)
+    if bundle is not None:
+        # The query adds little beyond its category: use the precomputed context.
+        sources = list(bundle.sources)
+        context_text = bundle.text
+        prompt_shape = "bundle"
+    else:
+        search_query = _search_query(category_hint, query)
+        context_docs = prefetch.take(search_query, profile.top_k)
+        if context_docs is None:
+            # A query embedding computed for local triage is reused instead of embedding again.
+            context_docs = retrieve_context(search_query, embedding=query_embedding, top_k=profile.top_k)
+        sources = [_doc_field(d, "_id") for d in context_docs]
+        context_text = "\n\n".join([_doc_field(d, "text") or "" for d in context_docs])
+        prompt_shape = "retrieved" if context_docs else "no_context"
+    # Safety against long contexts, then the profile's context budget
+    context_text = generation_profiles.fit_context("\n\n".join(chunk_text(context_text, 400)), profile.context_chars)
+    outcome = "llm"
     try:
         url = GROQ_CHAT_URL if MODEL_PREFERENCE == "groq" else OPENAI_CHAT_URL
         token = GROQ_API_KEY if MODEL_PREFERENCE == 'groq' else OPENAI_API_KEY
         if not token:
             raise RuntimeError("Missing API key for selected provider")
         headers = {"Authorization": f"Bearer {token}"}
-        model = "llama-3.1-70b-versatile" if MODEL_PREFERENCE == "groq" else "gpt-4o-mini"
         user_prompt = f"User description: {query}"
         if category_hint:
             user_prompt += f"\nLikely emergency category: {category_hint}."
         if severity_hint:
             user_prompt += f"\nReported severity: {severity_hint}."
-        r = requests.post(url, headers=headers, json={
-            "model": model,
-            "messages":[
-                {"role":"system","content":SYSTEM},
-                {"role":"user","content":f"{user_prompt}\n\ncontext:\n{context_text}\n\nReturn numbered steps."}
-            ],
-            "temperature":0.2
-        }, timeout=20)
-        r.raise_for_status()
-        content = r.json().get("choices",[{}])[0].get("message",{}).get("content","")
-        if not content or content.strip().lower() == "no response":
-            raise ValueError("Instruction provider returned no usable content")
+        provider = "groq" if MODEL_PREFERENCE == "groq" else "openai"
+        model = profile.model(provider)
+        user_content = f"{user_prompt}\n\ncontext:\n{context_text}\n\nReturn numbered steps."
+        with metrics.stage_timer("generation"), tracing.span(
+            "generation", model=model, profile=profile.name, context_chars=len(context_text)
+        ) as span:
+            computed = False
+
+            def complete() -> str:
+                nonlocal computed
+                computed = True
+                return _complete(provider, url, headers, model, profile, user_content, prompt_shape, span)
+
+            # Identical prompts (same guide context, same wording) get the answer another request paid for.
+            content = _GENERATION_CACHE.get_or_compute(
+                _generation_key(provider, model, profile, user_content), complete, timeout=profile.timeout
+            )
+            span.set(cached=not computed)
     except Exception as exc:
         logging.warning("Chat generation failed: %s", exc)
+        metrics.FALLBACKS.inc(category=category_hint.lower() or "unknown", reason="error")
+        tracing.current_span().set(fallback=True)
         content = _fallback_steps(query, category_hint)
-    return {"steps": content, "sources": [d.get('document',{}).get('_id') for d in context_docs]}
+        outcome = "fallback"
+    generation_profiles.PROFILE_SECONDS.observe(
+        time.perf_counter() - profile_started, profile=profile.name, outcome=outcome
+    )
+    return {"steps": content, "sources": sources, "profile": profile.name}
@@ -1,34 +1,12 @@
 """Agent utilities for detecting recovery cues in user conversations."""
 from typing import Iterable, List, Optional, Union, Dict
-import re
 
-# Patterns indicating the user reports resolution of their symptoms.
-RECOVERY_PATTERNS: List[str] = [
-    r"\ball good now\b",
-    r"\ball better now\b",
-    r"\bfeeling (?:fine|okay|ok|better)(?: now| again)?\b",
-    r"\bfeels? (?:fine|okay|ok|better)(?: now| again)?\b",
-    r"\b(?:i'?m|i am|im) (?:feeling )?(?:fine|okay|ok|better)(?: now| again)?\b",
-    r"\bgetting better\b",
-    r"\b(?:i'?m|i am|im) getting better\b",
-    r"\bno(?: longer| more)? (?:hurting|hurt|pain|bleeding)(?: anymore)?\b",
-    r"\bnot (?:painful|hurting|bleeding) anymore\b",
-    r"\bpain (?:is )?gone\b",
-    r"\bbleeding (?:has )?stopped\b",
-    r"\b(?:pain|hurting|bleeding) (?:has )?stopped\b",
-    r"\bit'?s healed now\b",
-    r"\byes(?:,)? it (?:has )?stopped\b",
-    r"\byep(?:,)? it (?:has )?stopped\b",
-]
-
-CONFIRMATION_ONLY_PATTERNS: List[str] = [
-    r"\byes\b",
-    r"\byeah\b",
-    r"\byep\b",
-    r"\bthanks\b",
-    r"\bthank you\b",
-    r"\bappreciate it\b",
-]
+from ..services.conversation_features import (
+    CONFIRMATION_ONLY_PATTERNS,
+    RECOVERY_PATTERNS,
+    extract_features,
+    is_confirmation_only,
+)
 
 MessageLike = Union[Dict[str, str], object]
 
@@ -69,22 +47,14 @@ def detect(history: Optional[Iterable[MessageLike]], latest_input: str) -> Dict[
     Returns a dictionary so downstream callers can attach this agent's
     observations to their own payloads.
     """
-    latest_lower = (latest_input or "").lower()
-    matches: List[str] = [
-        pattern for pattern in RECOVERY_PATTERNS if re.search(pattern, latest_lower)
-    ]
+    matches: List[str] = list(extract_features(latest_input).recovery_matches)
 
     if not matches:
         # Handle short acknowledgements that follow a recovery phrase in the
         # immediately previous user turn (for example "yes" or "thanks").
         prev_text = _extract_previous_user_text(history, latest_input)
-        prev_lower = (prev_text or "").lower()
-        if prev_lower and any(
-            re.search(pattern, prev_lower) for pattern in RECOVERY_PATTERNS
-        ) and any(
-            re.fullmatch(pattern, latest_lower.strip()) for pattern in CONFIRMATION_ONLY_PATTERNS
-        ):
-            matches = [pattern for pattern in RECOVERY_PATTERNS if re.search(pattern, prev_lower)]
+        if prev_text and is_confirmation_only(latest_input):
+            matches = list(extract_features(prev_text).recovery_matches)
 
     return {
         "recovered": bool(matches),
@@ -32,6 +32,10 @@ _OFF_TOPIC_KEYWORDS = {
     "football",
 }
 
+_OFF_TOPIC_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in sorted(_OFF_TOPIC_KEYWORDS, key=len, reverse=True) if k) + r")\b"
+)
+
 
 def safety_screen(user_text: str) -> Dict[str, str]:
     """Run guardrail and keyword checks to ensure the text is in scope."""
@@ -47,15 +51,12 @@ def safety_screen(user_text: str) -> Dict[str, str]:
         }
 
     lowered = sanitized.lower()
-    for keyword in _OFF_TOPIC_KEYWORDS:
-        if not keyword:
-            continue
-        if re.search(rf"\b{re.escape(keyword)}\b", lowered):
-            return {
-                "allowed": False,
-                "reason": "This assistant can only discuss first-aid emergencies and treatments.",
-                "sanitized": sanitized,
-            }
+    if _OFF_TOPIC_RE.search(lowered):
+        return {
+            "allowed": False,
+            "reason": "This assistant can only discuss first-aid emergencies and treatments.",
+            "sanitized": sanitized,
+        }
 
     return {"allowed": True, "reason": "", "sanitized": sanitized}
 
@@ -16,10 +16,32 @@ except Exception:
     # ``python-dotenv`` is optional; ignore import/time errors during runtime.
     pass
 
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
 # Provider API keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+# Provider base URLs (override to point at local stand-ins during load tests)
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip("/")
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1").rstrip("/")
+UPSTREAM_POOL_SIZE = _env_int("UPSTREAM_POOL_SIZE", 32)
+# Open provider connections during startup warmup so first requests skip TLS setup
+WARMUP_PRIME_CONNECTIONS = os.getenv("WARMUP_PRIME_CONNECTIONS", "true").lower() in {"1", "true", "yes"}
+
 # Astra DB / Vector store configuration
 ASTRA_DB_API_ENDPOINT = os.getenv("ASTRA_DB_API_ENDPOINT", "")
 ASTRA_DB_KEYSPACE = os.getenv("ASTRA_DB_KEYSPACE", "")
@@ -31,6 +53,123 @@ ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN", "")
 MODEL_PREFERENCE = os.getenv("MODEL_PREFERENCE", "groq")  # 'groq' or 'openai'
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
+# On-demand profiling of /api/chat/continue (disabled unless a token or rate is set)
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = _env_float("PROFILING_SAMPLE_RATE", 0.0)
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/firstaid-profiles")
+PROFILING_MAX_REPORTS = _env_int("PROFILING_MAX_REPORTS", 50)
+
+# Local span tracing (JSONL export, rotated by size)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in {"1", "true", "yes"}
+TRACE_DIR = os.getenv("TRACE_DIR", "/tmp/firstaid-traces")
+TRACE_MAX_BYTES = _env_int("TRACE_MAX_BYTES", 10 * 1024 * 1024)
+TRACE_BACKUP_COUNT = _env_int("TRACE_BACKUP_COUNT", 5)
+TRACE_QUEUE_SIZE = _env_int("TRACE_QUEUE_SIZE", 10000)
+
+# Append-only audit log of conversation turns (segment files written by a background thread)
+AUDIT_LOG_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "true").lower() in {"1", "true", "yes"}
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", "/tmp/firstaid-audit")
+AUDIT_SEGMENT_MAX_BYTES = _env_int("AUDIT_SEGMENT_MAX_BYTES", 64 * 1024 * 1024)
+AUDIT_QUEUE_SIZE = _env_int("AUDIT_QUEUE_SIZE", 10000)
+AUDIT_BLOCK_MS = _env_float("AUDIT_BLOCK_MS", 5.0)
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "false").lower() in {"1", "true", "yes"}
+
+# Token/cost accounting ledger (JSONL, rotated by size; summarise with tools/usage_report.py)
+USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() in {"1", "true", "yes"}
+USAGE_DIR = os.getenv("USAGE_DIR", "/tmp/firstaid-usage")
+USAGE_MAX_BYTES = _env_int("USAGE_MAX_BYTES", 20 * 1024 * 1024)
+USAGE_BACKUP_COUNT = _env_int("USAGE_BACKUP_COUNT", 5)
+USAGE_PRICES = os.getenv("USAGE_PRICES", "")  # JSON: {"model": [input_usd_per_1m, output_usd_per_1m]}
+
+# Optional local nearest-centroid triage (needs numpy and a file from tools/build_triage_centroids.py)
+TRIAGE_CENTROIDS_PATH = os.getenv("TRIAGE_CENTROIDS_PATH", "")
+TRIAGE_CENTROID_MIN_CONFIDENCE = _env_float("TRIAGE_CENTROID_MIN_CONFIDENCE", 0.55)
+TRIAGE_CENTROID_TEMPERATURE = _env_float("TRIAGE_CENTROID_TEMPERATURE", 0.05)
+TRIAGE_CENTROID_MIN_MARGIN = _env_float("TRIAGE_CENTROID_MIN_MARGIN", 0.1)
+
+# Micro-batching of concurrent embedding calls (EMBED_BATCH_WINDOW_MS=0 disables it)
+EMBED_BATCH_WINDOW_MS = _env_float("EMBED_BATCH_WINDOW_MS", 4.0)
+EMBED_BATCH_MAX_SIZE = _env_int("EMBED_BATCH_MAX_SIZE", 32)
+EMBED_BATCH_MAX_IN_FLIGHT = _env_int("EMBED_BATCH_MAX_IN_FLIGHT", 4)
+
+# In-process BM25 index over the knowledge base (JSONL of {"_id", "text"} documents)
+KNOWLEDGE_BASE_PATH = os.getenv("KNOWLEDGE_BASE_PATH", "")
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "")
+LEXICAL_MIN_SCORE = _env_float("LEXICAL_MIN_SCORE", 6.0)
+LEXICAL_DECISIVE_MARGIN = _env_float("LEXICAL_DECISIVE_MARGIN", 0.35)
+
+# Precomputed per-category retrieval contexts
+CONTEXT_BUNDLES_ENABLED = os.getenv("CONTEXT_BUNDLES_ENABLED", "true").lower() in {"1", "true", "yes"}
+CONTEXT_BUNDLE_REFRESH_SECONDS = _env_float("CONTEXT_BUNDLE_REFRESH_SECONDS", 900.0)
+CONTEXT_BUNDLE_TOP_K = _env_int("CONTEXT_BUNDLE_TOP_K", 8)
+CONTEXT_BUNDLE_MAX_CHARS = _env_int("CONTEXT_BUNDLE_MAX_CHARS", 3600)
+CONTEXT_BUNDLE_MAX_EXTRA_TERMS = _env_int("CONTEXT_BUNDLE_MAX_EXTRA_TERMS", 1)
+
+# Generation profiles picked from triage severity/category (YAML; defaults to app/generation_profiles.yaml)
+GENERATION_PROFILES_PATH = os.getenv("GENERATION_PROFILES_PATH", "")
+
+# Cache lifetime of GET /api/guides responses (browsers/CDNs revalidate with the ETag afterwards)
+GUIDES_MAX_AGE_SECONDS = _env_int("GUIDES_MAX_AGE_SECONDS", 300)
+GUIDES_STALE_WHILE_REVALIDATE_SECONDS = _env_int("GUIDES_STALE_WHILE_REVALIDATE_SECONDS", 86400)
+
+# Speculative retrieval from draft input (POST /api/chat/prefetch); PREFETCH_CACHE_SIZE=0 disables it
+PREFETCH_CACHE_SIZE = _env_int("PREFETCH_CACHE_SIZE", 256)
+PREFETCH_TTL_SECONDS = _env_float("PREFETCH_TTL_SECONDS", 60.0)
+PREFETCH_RATE_PER_SECOND = _env_float("PREFETCH_RATE_PER_SECOND", 1.0)
+PREFETCH_BURST = _env_int("PREFETCH_BURST", 3)
+PREFETCH_MAX_IN_FLIGHT = _env_int("PREFETCH_MAX_IN_FLIGHT", 4)
+PREFETCH_MIN_CHARS = _env_int("PREFETCH_MIN_CHARS", 12)
+PREFETCH_MAX_CHARS = _env_int("PREFETCH_MAX_CHARS", 1000)
+
+# Emergency numbers and nearest facilities (mcp_server); the location is a fallback until clients send one
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "LK")
+DEFAULT_LOCATION_LAT = _env_float("DEFAULT_LOCATION_LAT", 6.9271)
+DEFAULT_LOCATION_LNG = _env_float("DEFAULT_LOCATION_LNG", 79.8612)
+FACILITY_INDEX_PATH = os.getenv("FACILITY_INDEX_PATH", "")
+FACILITY_NEAREST_K = _env_int("FACILITY_NEAREST_K", 3)
+
+# Pre-fork server (python -m app.serve); WEB_CONCURRENCY=0 starts one worker per available CPU
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = _env_int("SERVE_PORT", 8000)
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", 0)
+
+# Admission control for /api/chat/continue (ADMISSION_MAX_CONCURRENCY=0 disables it)
+ADMISSION_MAX_CONCURRENCY = _env_int("ADMISSION_MAX_CONCURRENCY", 32)
+ADMISSION_MAX_QUEUE = _env_int("ADMISSION_MAX_QUEUE", 256)
+ADMISSION_SHED_AFTER_MS = _env_float("ADMISSION_SHED_AFTER_MS", 2000.0)
+
+# Idempotent replay of retried /api/chat/continue requests (IDEMPOTENCY_TTL_SECONDS=0 disables it)
+IDEMPOTENCY_TTL_SECONDS = _env_float("IDEMPOTENCY_TTL_SECONDS", 120.0)
+IDEMPOTENCY_MAX_ENTRIES = _env_int("IDEMPOTENCY_MAX_ENTRIES", 10000)
+
+# Cancellation of abandoned requests: keyed work survives its client disconnecting this long (for retries)
+CANCEL_GRACE_SECONDS = _env_float("CANCEL_GRACE_SECONDS", 1.0)
+
+# Cache for embeddings, generations and idempotent replays: memory (per worker), sqlite (per host) or http (shared KV)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_BYTES = _env_int("CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "")
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_LOCAL_MAX_BYTES = _env_int("CACHE_LOCAL_MAX_BYTES", 8 * 1024 * 1024)
+CACHE_LEASE_SECONDS = _env_float("CACHE_LEASE_SECONDS", 10.0)
+CACHE_TIMEOUT_SECONDS = _env_float("CACHE_TIMEOUT_SECONDS", 0.25)
+EMBEDDING_CACHE_TTL_SECONDS = _env_float("EMBEDDING_CACHE_TTL_SECONDS", 86400.0)
+GENERATION_CACHE_TTL_SECONDS = _env_float("GENERATION_CACHE_TTL_SECONDS", 3600.0)
+
+# Request size limits for /api/chat* (413 before parsing) and the history window the pipeline sees
+CHAT_MAX_BODY_BYTES = _env_int("CHAT_MAX_BODY_BYTES", 262144)
+CHAT_MAX_MESSAGES = _env_int("CHAT_MAX_MESSAGES", 100)
+CHAT_MAX_MESSAGE_CHARS = _env_int("CHAT_MAX_MESSAGE_CHARS", 4000)
+CHAT_HISTORY_WINDOW = _env_int("CHAT_HISTORY_WINDOW", 12)
+
+# /api/chat/ws limits (per worker / per connection)
+WS_MAX_CONNECTIONS = _env_int("WS_MAX_CONNECTIONS", 200)
+WS_MAX_PENDING_TURNS = _env_int("WS_MAX_PENDING_TURNS", 2)
+WS_MAX_QUEUED_EVENTS = _env_int("WS_MAX_QUEUED_EVENTS", 16)
+WS_MAX_MESSAGE_BYTES = _env_int("WS_MAX_MESSAGE_BYTES", 16384)
+WS_MAX_HISTORY = _env_int("WS_MAX_HISTORY", 40)
+WS_SEND_TIMEOUT_SECONDS = _env_float("WS_SEND_TIMEOUT_SECONDS", 10.0)
+
 
 def has_openai() -> bool:
     """Return True when an OpenAI API key is configured."""
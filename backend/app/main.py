@@ -1,17 +1,38 @@
 # main.py
 # FastAPI app exposing chat endpoint for the client.
-from fastapi import Depends, FastAPI, HTTPException, status
-import requests
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from .config import (
-    MODEL_PREFERENCE, has_openai, has_groq, has_astra,
-    ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_COLLECTION
+    MODEL_PREFERENCE, has_openai, has_groq, has_astra, OPENAI_API_BASE, GROQ_API_BASE,
+    ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_COLLECTION, WARMUP_PRIME_CONNECTIONS,
+    WS_MAX_CONNECTIONS, WS_MAX_PENDING_TURNS, WS_MAX_QUEUED_EVENTS, WS_MAX_MESSAGE_BYTES, WS_MAX_HISTORY,
+    WS_SEND_TIMEOUT_SECONDS, GUIDES_MAX_AGE_SECONDS, GUIDES_STALE_WHILE_REVALIDATE_SECONDS,
+    PREFETCH_MIN_CHARS, PREFETCH_MAX_CHARS, CANCEL_GRACE_SECONDS,
 )
 from pydantic import BaseModel
-from .agents import conversational_agent, recovery_agent, security_agent, emergency_classifier
+from .agents import (
+    conversational_agent, emergency_classifier, instruction_agent, recovery_agent, security_agent,
+    verification_agent,
+)
+from .services import (
+    admission, audit_log, cancellation, context_bundles, facility_index, generation_profiles, guides, idempotency,
+    lexical_index, mcp_server, metrics, prefetch, profiling, request_limits, rules_guardrails, tracing,
+    triage_centroids, upstream, usage, warmup,
+)
+from .services.conversation_features import extract_features
 from .utils import is_first_aid_related
-from typing import Annotated, List, Optional, Literal
+from typing import Annotated, Callable, List, Optional, Literal
 from textwrap import dedent
-import re
 
 
 Role = Literal['user', 'assistant', 'system']
@@ -27,6 +48,15 @@ class ChatContinueRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+class PrefetchRequest(BaseModel):
+    text: str
+    session_id: Optional[str] = None
+
+
+TRACE_HEADER = "X-Trace-Id"
+DEGRADED_HEADER = "X-Degraded"
+CLIENT_CLOSED_REQUEST = 499  # nginx's status for a client that went away before the response
+
 FIRST_AID_ONLY_MESSAGE = "This assistant can only respond to first-aid emergencies and treatments."
 
 
@@ -38,8 +68,14 @@ def _latest_user_message(messages: List[ChatMessage]) -> Optional[ChatMessage]:
 
 
 def validate_first_aid_intent(payload: ChatContinueRequest) -> ChatContinueRequest:
+    with metrics.stage_timer("screening"):
+        return _screen_first_aid_intent(payload)
+
+
+def _screen_first_aid_intent(payload: ChatContinueRequest) -> ChatContinueRequest:
     latest_user = _latest_user_message(payload.messages)
     if latest_user is None:
+        metrics.REJECTIONS.inc(stage="screening")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=FIRST_AID_ONLY_MESSAGE,
@@ -47,6 +83,7 @@ def validate_first_aid_intent(payload: ChatContinueRequest) -> ChatContinueReque
 
     screen = security_agent.safety_screen(latest_user.content)
     if not screen.get("allowed", False):
+        metrics.REJECTIONS.inc(stage="screening")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=screen.get("reason") or FIRST_AID_ONLY_MESSAGE,
@@ -66,6 +103,7 @@ def validate_first_aid_intent(payload: ChatContinueRequest) -> ChatContinueReque
                     if context_classification.get("is_first_aid"):
                         return payload
 
+        metrics.REJECTIONS.inc(stage="screening")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=FIRST_AID_ONLY_MESSAGE,
@@ -80,42 +118,6 @@ def _normalize_steps(steps) -> str:
     return str(steps or "")
 
 
-BODY_PART_KEYWORDS = {
-    "head", "face", "scalp", "eye", "ear", "nose", "mouth", "jaw",
-    "neck", "throat", "shoulder", "arm", "elbow", "wrist", "hand",
-    "finger", "chest", "rib", "abdomen", "stomach", "back", "hip",
-    "leg", "knee", "ankle", "foot", "toe", "skin"
-}
-
-TREND_PATTERNS = {
-    "worse": [
-        r"\bgetting worse\b",
-        r"\bworsening\b",
-        r"\bworse\b",
-        r"\bheavier\b",
-        r"\bincreasing\b",
-        r"\bspreading\b",
-        r"\bmore (?:pain|bleeding|swelling|numbness)\b",
-    ],
-    "better": [
-        r"\bgetting better\b",
-        r"\bbetter\b",
-        r"\bimproving\b",
-        r"\bimproved\b",
-        r"\bless (?:pain|bleeding|swelling)\b",
-        r"\blighter\b",
-        r"\bsubsiding\b",
-    ],
-    "same": [
-        r"\babout the same\b",
-        r"\bstaying the same\b",
-        r"\bno change\b",
-        r"\bunchanged\b",
-        r"\bstable\b",
-    ],
-}
-
-
 def _tailor_steps_for_context(
     original_steps: str,
     triage: dict,
@@ -201,21 +203,11 @@ def _tailor_steps_for_context(
     ])
 
 def _detect_location_known(text: str) -> bool:
-    if not text:
-        return False
-    lowered = text.lower()
-    return any(re.search(rf"\b{re.escape(part)}\b", lowered) for part in BODY_PART_KEYWORDS)
+    return extract_features(text).location_known
 
 
 def _detect_trend(text: str) -> Optional[str]:
-    if not text:
-        return None
-    lowered = text.lower()
-    for label, patterns in TREND_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, lowered):
-                return label
-    return None
+    return extract_features(text).trend
 
 
 def _acknowledge_user_update(user_text: str, recovered: bool) -> str:
@@ -423,7 +415,70 @@ def _compose_assistant_message(
     return response
 
 
-app = FastAPI(title="FirstAidGuide - Multi-Agent API")
+WARMUP_SAMPLES = (
+    "My hand is bleeding after a deep cut and it's getting worse",
+    "I burned my arm on the stove, there are blisters",
+    "twisted my ankle, the swelling is about the same",
+    "i have a bruse on my knee",
+    "I'm feeling better now, the bleeding has stopped",
+    "Can you recommend a movie about programming?",
+)
+
+
+def _warm_matchers() -> None:
+    """Compile every regex and fill per-text caches used on the request path."""
+
+    for text in WARMUP_SAMPLES:
+        screen = security_agent.safety_screen(text)
+        security_agent.protect(text)
+        triage = emergency_classifier.classify(screen.get("sanitized", text))
+        is_first_aid_related(text, triage)
+        extract_features(text)
+        recovery_agent.detect([], text)
+        conversational_agent._detect_clarification_prompt(text)
+
+
+def _prime_connections() -> None:
+    if not WARMUP_PRIME_CONNECTIONS:
+        return
+    if has_openai():
+        upstream.prime(f"{OPENAI_API_BASE}/models")
+    if has_groq():
+        upstream.prime(f"{GROQ_API_BASE}/models")
+    if has_astra():
+        upstream.prime(ASTRA_DB_API_ENDPOINT)
+
+
+warmup.register("guardrails", rules_guardrails.load_policy, order=10)
+warmup.register("matchers", _warm_matchers, order=20)
+warmup.register("triage_centroids", triage_centroids.load_model, order=30)
+warmup.register("lexical_index", lexical_index.refresh_if_changed, order=40)
+warmup.register("generation_profiles", generation_profiles.load_profiles, order=10)
+warmup.register("facility_index", facility_index.get_index, order=50)
+warmup.register("emergency_numbers", mcp_server._emergency_directory, order=50)
+context_bundles.configure(emergency_classifier.CATEGORY_KEYWORDS, instruction_agent.retrieve_context)
+guides.configure(
+    list(emergency_classifier.CATEGORY_KEYWORDS)
+    + [label for scenario in instruction_agent.SCENARIO_LIBRARY for label in sorted(scenario["labels"])],
+    instruction_agent.guide_steps,
+    verification_agent.verify,
+    emergency_classifier.severity_hint,
+)
+warmup.register("guides", guides.render_all, order=60)
+context_bundles.on_refresh(guides.render_all)
+warmup.register("connections", _prime_connections, order=90, per_worker=True)
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # Serve /api/health immediately; /api/ready turns 200 once warmup is done.
+    warmup.run_in_background()
+    context_bundles.start_background_refresh()
+    yield
+
+
+app = FastAPI(title="FirstAidGuide - Multi-Agent API", lifespan=_lifespan)
+app.add_middleware(request_limits.RequestLimitMiddleware)
 
 class ChatRequest(BaseModel):
     message: str
@@ -431,7 +486,8 @@ class ChatRequest(BaseModel):
 @app.post("/api/chat")
 def chat(req: ChatRequest):
     # Orchestrate the multi-agent flow
-    result = conversational_agent.handle_message(req.message)
+    with tracing.start_trace("POST /api/chat"), metrics.stage_timer("pipeline"):
+        result = conversational_agent.handle_message(req.message)
     return {"ok": True, "result": result}
 
 @app.get("/api/health")
@@ -439,6 +495,48 @@ def health():
     return {"ok": True}
 
 
+def _guide_response(rendered: guides.Rendered, if_none_match: Optional[str]) -> Response:
+    headers = {
+        "ETag": rendered.etag,
+        "Cache-Control": (
+            f"public, max-age={GUIDES_MAX_AGE_SECONDS}, "
+            f"stale-while-revalidate={GUIDES_STALE_WHILE_REVALIDATE_SECONDS}"
+        ),
+    }
+    if guides.not_modified(rendered.etag, if_none_match):
+        guides.count("not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    guides.count("ok")
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/guides")
+async def list_guides(if_none_match: Annotated[Optional[str], Header()] = None):
+    return _guide_response(guides.index(), if_none_match)
+
+
+@app.get("/api/guides/{category}")
+async def get_guide(category: str, if_none_match: Annotated[Optional[str], Header()] = None):
+    rendered = guides.get(category)
+    if rendered is None:
+        guides.count("not_found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No guide for this category.")
+    return _guide_response(rendered, if_none_match)
+
+
+@app.get("/api/ready")
+def ready(response: Response):
+    state = warmup.status()
+    if not state["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/api/health/details")
 def health_details():
     details = {"ok": True}
@@ -450,14 +548,16 @@ def health_details():
         "has_astra_config": has_astra(),
     }
     # Shallow external reachability checks (no secrets)
+    import requests
+
     checks = {}
     try:
-        r = requests.get("https://api.openai.com/v1/models", timeout=3)
+        r = requests.get(f"{OPENAI_API_BASE}/models", timeout=3)
         checks["openai_models_head"] = r.status_code
     except Exception as exc:
         checks["openai_models_head"] = str(exc)
     try:
-        r = requests.get("https://api.groq.com/openai/v1/models", timeout=3)
+        r = requests.get(f"{GROQ_API_BASE}/models", timeout=3)
         checks["groq_models_head"] = r.status_code
     except Exception as exc:
         checks["groq_models_head"] = str(exc)
@@ -480,30 +580,409 @@ ValidatedChatRequest = Annotated[ChatContinueRequest, Depends(validate_first_aid
 
 
 @app.post("/api/chat/continue")
-def chat_continue(req: ValidatedChatRequest):
+async def chat_continue(
+    req: ValidatedChatRequest,
+    request: Request,
+    response: Response,
+    x_profile_token: Annotated[Optional[str], Header()] = None,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+):
+    store = idempotency.store()
+    request_fingerprint = idempotency.fingerprint(req.messages) if store.enabled else ""
+    key = idempotency.key_for(idempotency_key, req.session_id, request_fingerprint) if store.enabled else None
+    token = cancellation.acquire(key)
+    if key is None:
+        work = asyncio.ensure_future(_admit_chat_continue(req, response, x_profile_token, token))
+    else:
+        work = asyncio.ensure_future(
+            _run_keyed_chat_continue(store, key, request_fingerprint, req, response, x_profile_token, token)
+        )
+    abandoned = await _client_disconnected_before(request, work)
+    unwanted = cancellation.release(key, token, abandoned, CANCEL_GRACE_SECONDS)
+    if not abandoned:
+        return work.result()
+    # Nobody will read this response. When no other request waits on the
+    # work either, the token stops its upstream calls (and a queued request
+    # leaves the admission queue).
+    stage = ("running" if token.started else "queued") if unwanted else "shared"
+    cancellation.ABANDONED.inc(endpoint="/api/chat/continue", stage=stage)
+    work.add_done_callback(_discard_result)
+    if unwanted:
+        token.on_cancel(work.cancel)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+async def _run_keyed_chat_continue(
+    store: idempotency.IdempotencyStore,
+    key: str,
+    request_fingerprint: str,
+    req: ChatContinueRequest,
+    response: Response,
+    x_profile_token: Optional[str],
+    token: cancellation.CancelToken,
+) -> dict:
+    async def compute() -> tuple:
+        # Headers are captured so that retries replay them along with the body.
+        scratch = Response()
+        payload = await _admit_chat_continue(req, scratch, x_profile_token, token)
+        return payload, dict(scratch.headers)
+
+    try:
+        (payload, headers), outcome = await store.run(key, request_fingerprint, compute)
+    except idempotency.Conflict:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different conversation.",
+        )
+    for name in (TRACE_HEADER, DEGRADED_HEADER, profiling.REPORT_HEADER):
+        if name.lower() in headers:
+            response.headers[name] = headers[name.lower()]
+    if outcome != "miss":
+        response.headers[idempotency.REPLAYED_HEADER] = "true"
+    return payload
+
+
+async def _client_disconnected_before(request: Request, work: "asyncio.Future") -> bool:
+    """Wait for ``work``; True when the client disconnected first."""
+
+    async def disconnected() -> None:
+        # The body has been read, so the next message is the disconnect.
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    return not work.done()
+
+
+def _discard_result(work: "asyncio.Future") -> None:
+    if not work.cancelled():
+        work.exception()  # retrieved: nobody is waiting for it any more
+
+
+async def _admit_chat_continue(
+    req: ChatContinueRequest,
+    response: Response,
+    x_profile_token: Optional[str],
+    token: Optional[cancellation.CancelToken] = None,
+) -> dict:
+    try:
+        async with admission.admit(_estimate_severity(req.messages)) as ticket:
+            # The pipeline is blocking; run it off the event loop once admitted.
+            return await run_in_threadpool(_run_chat_continue, req, response, x_profile_token, ticket, token)
+    except admission.Overloaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The assistant is busy. If this is an emergency, call your local emergency number now.",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _estimate_severity(messages: List[ChatMessage]) -> str:
+    """Cheap pre-admission triage of the latest turn (falls back to recent context)."""
+
+    user_turns = [m.content for m in messages if m.role == "user"]
+    triage = emergency_classifier.classify(user_turns[-1])
+    if triage.get("category") in {"out_of_scope", "unknown"} and len(user_turns) > 1:
+        triage = emergency_classifier.classify(" \n".join(user_turns[-3:]))
+    return str(triage.get("severity") or "low")
+
+
+def _run_chat_continue(
+    req: ChatContinueRequest,
+    response: Response,
+    x_profile_token: Optional[str],
+    ticket: admission.Ticket,
+    token: Optional[cancellation.CancelToken] = None,
+) -> dict:
+    with cancellation.scope(token), tracing.start_trace(
+        "POST /api/chat/continue",
+        session_id=req.session_id,
+        queue_wait_ms=round(ticket.waited * 1000, 2),
+        degraded=ticket.degraded,
+    ) as trace:
+        cancellation.check()
+        if trace.trace_id:
+            response.headers[TRACE_HEADER] = trace.trace_id
+        if ticket.degraded:
+            response.headers[DEGRADED_HEADER] = "shed"
+        if not profiling.should_profile(x_profile_token):
+            return _continue_conversation(req, degraded=ticket.degraded)
+
+        with profiling.profile_request("/api/chat/continue") as report_id:
+            payload = _continue_conversation(req, degraded=ticket.degraded)
+        if report_id:
+            response.headers[profiling.REPORT_HEADER] = report_id
+        return payload
+
+
+_prefetch_tasks: "set[asyncio.Future]" = set()
+
+
+@app.post("/api/chat/prefetch", status_code=status.HTTP_202_ACCEPTED)
+async def chat_prefetch(req: PrefetchRequest, request: Request):
+    """Warm retrieval for a draft message; returns at once, the work runs in the background."""
+
+    if not prefetch.enabled():
+        return {"ok": True, "status": "disabled"}
+    text = req.text.strip()[:PREFETCH_MAX_CHARS]
+    if len(text) < PREFETCH_MIN_CHARS:
+        prefetch.REQUESTS.inc(result="too_short")
+        return {"ok": True, "status": "too_short"}
+    client = req.session_id or (request.client.host if request.client else "unknown")
+    if not prefetch.allow(client):
+        prefetch.REQUESTS.inc(result="rate_limited")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Prefetching too often.",
+            headers={"Retry-After": "1"},
+        )
+    # Speculative work never competes with queued conversations.
+    if admission.controller().queue_depth or not prefetch.try_start():
+        prefetch.REQUESTS.inc(result="busy")
+        return {"ok": True, "status": "busy"}
+    task = asyncio.ensure_future(run_in_threadpool(_run_prefetch, text, req.session_id))
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+    return {"ok": True, "status": "accepted"}
+
+
+def _run_prefetch(text: str, session_id: Optional[str]) -> str:
+    try:
+        with tracing.start_trace("POST /api/chat/prefetch", session_id=session_id):
+            result = conversational_agent.prefetch(text, session_id)
+    except Exception as exc:
+        logging.warning("Prefetch failed: %s", exc)
+        result = "error"
+    finally:
+        prefetch.finish()
+    prefetch.REQUESTS.inc(result=result)
+    return result
+
+
+WS_CONNECTIONS = metrics.gauge("firstaid_ws_connections", "Open /api/chat/ws connections in this worker.")
+WS_REFUSED = metrics.counter(
+    "firstaid_ws_refused_total",
+    "WebSocket connections or turns refused (capacity, backpressure, too_large, slow_consumer).",
+    ("reason",),
+)
+_ws_open = 0
+
+
+class _SlowConsumer(Exception):
+    pass
+
+
+@app.websocket("/api/chat/ws")
+async def chat_ws(websocket: WebSocket, session_id: Optional[str] = None):
+    """One conversation per socket: send ``{"type": "user", "content": ...}``;
+    the server answers each turn with ``triage``, ``steps`` and ``message`` events."""
+
+    global _ws_open
+    await websocket.accept()
+    if _ws_open >= WS_MAX_CONNECTIONS:
+        WS_REFUSED.inc(reason="capacity")
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Too many open conversations.")
+        return
+    _ws_open += 1
+    WS_CONNECTIONS.set(_ws_open)
+    try:
+        await _serve_chat_socket(websocket, session_id or uuid.uuid4().hex)
+    finally:
+        _ws_open -= 1
+        WS_CONNECTIONS.set(_ws_open)
+
+
+async def _serve_chat_socket(websocket: WebSocket, session_id: str) -> None:
+    loop = asyncio.get_running_loop()
+    turn_token: Optional[cancellation.CancelToken] = None  # the turn in progress, if any
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_PENDING_TURNS)
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_QUEUED_EVENTS)
+
+    async def send(event: dict) -> None:
+        try:
+            await asyncio.wait_for(outbox.put(event), WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise _SlowConsumer()
+
+    async def reader() -> None:
+        while True:
+            raw = await websocket.receive_text()
+            if len(raw.encode("utf-8")) > WS_MAX_MESSAGE_BYTES:
+                WS_REFUSED.inc(reason="too_large")
+                await send({"type": "error", "status": 413, "detail": "Message too large."})
+                continue
+            try:
+                inbox.put_nowait(raw)
+            except asyncio.QueueFull:
+                WS_REFUSED.inc(reason="backpressure")
+                await send({"type": "error", "status": 429, "detail": "Still working on your previous messages."})
+
+    async def writer() -> None:
+        while True:
+            event = await outbox.get()
+            try:
+                await asyncio.wait_for(websocket.send_json(event), WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise _SlowConsumer()
+
+    async def processor() -> None:
+        nonlocal turn_token
+        history: List[ChatMessage] = []
+        turn = 0
+        while True:
+            content = _parse_socket_turn(await inbox.get())
+            if content is None:
+                await send({"type": "error", "status": 400, "detail": 'Send {"type": "user", "content": "..."}.'})
+                continue
+            turn += 1
+            req = ChatContinueRequest(
+                messages=(history + [ChatMessage(role="user", content=content)])[-WS_MAX_HISTORY:],
+                session_id=session_id,
+            )
+
+            def emit(kind: str, payload: dict, turn: int = turn) -> None:
+                # Called from the pipeline thread; blocks it while the client is not reading.
+                cancellation.check()
+                asyncio.run_coroutine_threadsafe(send({"type": kind, "turn": turn, **payload}), loop).result()
+
+            turn_token = cancellation.CancelToken()
+            try:
+                validate_first_aid_intent(req)
+                async with admission.admit(_estimate_severity(req.messages)) as ticket:
+                    payload = await run_in_threadpool(_run_socket_turn, req, ticket, emit, turn_token)
+            except HTTPException as exc:
+                await send({"type": "error", "turn": turn, "status": exc.status_code, "detail": exc.detail})
+                continue
+            except admission.Overloaded:
+                await send({"type": "error", "turn": turn, "status": 503, "detail": "The assistant is busy."})
+                continue
+            finally:
+                turn_token = None
+            history = [ChatMessage(**m) for m in payload["messages"]][-WS_MAX_HISTORY:]
+            await send({
+                "type": "message",
+                "turn": turn,
+                "content": history[-1].content,
+                "result": payload["result"],
+            })
+
+    await websocket.send_json({"type": "ready", "session_id": session_id})
+    tasks = [asyncio.create_task(coro()) for coro in (reader, writer, processor)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if isinstance(task.exception(), _SlowConsumer):
+                WS_REFUSED.inc(reason="slow_consumer")
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Client is not reading.")
+            elif task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                raise task.exception()
+    finally:
+        if turn_token is not None:
+            # The socket closed mid-turn: stop the pipeline's upstream calls.
+            cancellation.ABANDONED.inc(endpoint="/api/chat/ws", stage="running" if turn_token.started else "queued")
+            turn_token.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+def _parse_socket_turn(raw: str) -> Optional[str]:
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get("type", "user") != "user":
+        return None
+    content = message.get("content")
+    return content if isinstance(content, str) and content.strip() else None
+
+
+def _run_socket_turn(
+    req: ChatContinueRequest,
+    ticket: admission.Ticket,
+    emit: Callable[[str, dict], None],
+    token: Optional[cancellation.CancelToken] = None,
+) -> dict:
+    with cancellation.scope(token), tracing.start_trace(
+        "WS /api/chat/ws",
+        session_id=req.session_id,
+        queue_wait_ms=round(ticket.waited * 1000, 2),
+        degraded=ticket.degraded,
+    ):
+        payload = _continue_conversation(req, degraded=ticket.degraded, on_event=emit)
+    result = payload["result"]
+    recovered = bool((result.get("recovery") or {}).get("recovered"))
+    last_user = req.messages[-1].content
+    in_scope = (result.get("conversation") or {}).get("in_scope")
+    if in_scope and not result.get("error"):
+        question = _craft_follow_up_question(result, req.messages[:-1], last_user, recovered)
+        if question:
+            emit("follow_up", {"question": question})
+    return payload
+
+
+def _require_profiling_token(token: Optional[str]) -> None:
+    if not profiling.token_matches(token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Profiling token required.")
+
+
+@app.get("/api/profiles")
+def list_profiles(x_profile_token: Annotated[Optional[str], Header()] = None):
+    _require_profiling_token(x_profile_token)
+    return {"ok": True, "reports": profiling.list_reports()}
+
+
+@app.get("/api/profiles/{report_id}", response_class=PlainTextResponse)
+def get_profile(report_id: str, x_profile_token: Annotated[Optional[str], Header()] = None):
+    _require_profiling_token(x_profile_token)
+    report = profiling.read_report(report_id)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile report not found.")
+    return PlainTextResponse(report)
+
+
+def _continue_conversation(
+    req: ChatContinueRequest,
+    degraded: bool = False,
+    on_event: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
     # Find the latest user message (dependency already ensured a user turn exists)
     last_user = next(m.content for m in reversed(req.messages) if m.role == "user")
 
-    # Run existing pipeline on the last user message
-    history_payload = [m.dict() for m in req.messages]
-    result = conversational_agent.handle_message(
-        last_user,
-        history=history_payload,
-        session_id=req.session_id,
-    )
+    # Run existing pipeline on the last user message; it only sees the recent window
+    history_payload = [m.dict() for m in request_limits.window(req.messages)]
+    with metrics.stage_timer("pipeline"), usage.scope(session_id=req.session_id):
+        result = conversational_agent.handle_message(
+            last_user,
+            history=history_payload,
+            session_id=req.session_id,
+            degraded=degraded,
+            on_event=on_event,
+        )
 
     if isinstance(result, dict) and result.get("rejected"):
+        _audit_turn(result, req, degraded=degraded)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=result.get("reason", FIRST_AID_ONLY_MESSAGE),
         )
 
     # Compose assistant-style message
-    recovery_info = result.get("recovery") if isinstance(result, dict) else None
-    if recovery_info is None:
-        recovery_info = recovery_agent.detect(history_payload, last_user)
-    assistant_text = _compose_assistant_message(result, last_user, req.messages, recovery_info)
+    with metrics.stage_timer("compose"), tracing.span("compose"):
+        recovery_info = result.get("recovery") if isinstance(result, dict) else None
+        if recovery_info is None:
+            recovery_info = recovery_agent.detect(req.messages, last_user)
+        # Follow-up questions check what the user has said in the whole (size-capped)
+        # conversation, so details from early turns are not asked for again.
+        assistant_text = _compose_assistant_message(result, last_user, req.messages, recovery_info)
     new_messages = req.messages + [ChatMessage(role='assistant', content=assistant_text)]
+    _audit_turn(result, req, assistant_text, degraded)
 
     return {
         "ok": True,
@@ -511,3 +990,19 @@ def chat_continue(req: ValidatedChatRequest):
         "result": result,
         "session_id": req.session_id,
     }
+
+
+
+def _audit_turn(result: dict, req: ChatContinueRequest, assistant_text: str = "", degraded: bool = False) -> None:
+    if not isinstance(result, dict):
+        return
+    audit_log.record_turn(audit_log.build_record(
+        result,
+        session_id=req.session_id,
+        assistant_text=assistant_text,
+        degraded=degraded,
+        trace_id=tracing.current_trace_id(),
+    ))
+
+
+warmup.record("import_app_main", time.perf_counter() - _IMPORT_STARTED)
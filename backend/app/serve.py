@@ -0,0 +1,165 @@
+"""Pre-fork multi-worker server.
+
+Usage (from ``backend/``)::
+
+    python -m app.serve --workers 4 --port 8000
+
+The parent binds the listening socket, imports the app and runs the shared
+warmup phases (guardrail and keyword matchers, generation profiles, the
+lexical and facility indexes, guides ...), then freezes the garbage collector
+so those objects are never written to again and forks the workers. Workers
+inherit the structures copy-on-write and accept connections from the shared
+socket; each creates its own connection pools, background threads and queues
+after the fork (the per-worker warmup phases and lazily started threads).
+
+The parent only supervises: it restarts a worker that dies and, on SIGTERM or
+SIGINT, asks every worker to shut down gracefully and waits for them.
+In-process state (metrics, admission queues, idempotency entries, caches) is
+per worker.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .config import SERVE_HOST, SERVE_PORT, WEB_CONCURRENCY
+
+LOGGER = logging.getLogger("app.serve")
+
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity/cpusets, unlike ``os.cpu_count``)."""
+
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.create_server((host, port), family=family, backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _prepare_parent() -> None:
+    """Import the app and build everything workers can share read-only."""
+
+    from .main import app  # noqa: F401  (module-level setup: matchers, registries, metrics)
+    from .services import warmup
+
+    warmup.run_shared()
+    stray = [t.name for t in threading.enumerate() if t is not threading.main_thread()]
+    if stray:
+        LOGGER.warning("Threads running before fork will not exist in workers: %s", ", ".join(stray))
+    # Move everything allocated so far out of the collector's generations, so
+    # collections in the workers do not touch (and copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+
+
+def _run_worker(sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    from .main import app
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, workers: int, log_level: str) -> None:
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.children: Dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self.sock, self.log_level)
+            except BaseException:
+                LOGGER.exception("Worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        LOGGER.info("Started worker %d", pid)
+        return pid
+
+    def stop(self, signum: int, _frame: Optional[object] = None) -> None:
+        if not self.stopping:
+            LOGGER.info("Received %s; stopping %d workers", signal.Signals(signum).name, len(self.children))
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            if self.stopping:
+                continue
+            LOGGER.warning("Worker %d exited (status %d); restarting", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)  # avoid a hot crash loop
+            self.spawn()
+        self.sock.close()
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WEB_CONCURRENCY,
+        help="worker processes (default WEB_CONCURRENCY; 0 = one per available CPU)",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(name)s %(message)s")
+
+    workers = args.workers if args.workers > 0 else available_cpus()
+    sock = _bind(args.host, args.port, args.backlog)
+    started = time.perf_counter()
+    _prepare_parent()
+    LOGGER.info(
+        "Listening on %s:%d with %d workers (shared warmup %.0f ms)",
+        args.host, args.port, workers, (time.perf_counter() - started) * 1000,
+    )
+    return Supervisor(sock, workers, args.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Severity-aware admission control for chat requests.
+
+At most ``ADMISSION_MAX_CONCURRENCY`` requests run the agent pipeline at once;
+the rest wait in a bounded priority queue ordered by triage severity, so a
+choking report is admitted before a mild headache that arrived earlier.
+
+Load is shed in two ways:
+
+* when the queue is full, new non-critical requests are refused (HTTP 503);
+* a low-severity request that has waited longer than
+  ``ADMISSION_SHED_AFTER_MS`` leaves the queue and is answered with the
+  deterministic fallback steps instead of waiting for an LLM slot.
+
+High-severity requests are never refused or degraded.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Tuple
+
+from ..config import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_SHED_AFTER_MS,
+)
+from . import metrics
+
+SEVERITY_PRIORITY = {"high": 0, "severe": 0, "medium": 1, "low": 2}
+LOW_PRIORITY = 2
+
+_QUEUE_DEPTH = metrics.gauge(
+    "firstaid_admission_queue_depth",
+    "Requests waiting for an admission slot.",
+)
+_IN_FLIGHT = metrics.gauge(
+    "firstaid_admission_in_flight",
+    "Requests currently holding an admission slot.",
+)
+_WAIT_SECONDS = metrics.histogram(
+    "firstaid_admission_wait_seconds",
+    "Time spent queued before admission, by severity.",
+    ("severity",),
+)
+_SHED = metrics.counter(
+    "firstaid_admission_shed_total",
+    "Requests refused (queue_full) or degraded to fallback steps (queue_timeout).",
+    ("severity", "reason"),
+)
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full."""
+
+
+@dataclass
+class Ticket:
+    severity: str
+    waited: float = 0.0
+    degraded: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "severity": self.severity,
+            "queue_wait_ms": round(self.waited * 1000, 2),
+            "degraded": self.degraded,
+        }
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int, max_queue: int, shed_after: float) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.shed_after = shed_after
+        self._active = 0
+        self._queued = 0
+        self._waiters: List[Tuple[int, int, "asyncio.Future[bool]"]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _set_gauges(self) -> None:
+        _QUEUE_DEPTH.set(self._queued)
+        _IN_FLIGHT.set(self._active)
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot. Returns False when the request was shed instead."""
+
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            self._set_gauges()
+            return True
+        if priority > 0 and self._queued >= self.max_queue:
+            raise Overloaded()
+
+        future: "asyncio.Future[bool]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued += 1
+        self._set_gauges()
+        try:
+            if priority >= LOW_PRIORITY and self.shed_after > 0:
+                await asyncio.wait_for(asyncio.shield(future), self.shed_after)
+            else:
+                await future
+            return True
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return True  # a slot was handed over as the timer fired
+            future.cancel()
+            self._queued -= 1
+            self._set_gauges()
+            return False
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+                self._queued -= 1
+                self._set_gauges()
+            raise
+
+    def release(self) -> None:
+        """Hand the slot to the most urgent waiter, or free it."""
+
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._queued -= 1
+            future.set_result(True)
+            self._set_gauges()
+            return
+        self._active -= 1
+        self._set_gauges()
+
+    @asynccontextmanager
+    async def admit(self, severity: str) -> AsyncIterator[Ticket]:
+        severity = (severity or "low").lower()
+        ticket = Ticket(severity=severity)
+        if not self.enabled:
+            yield ticket
+            return
+
+        priority = SEVERITY_PRIORITY.get(severity, 1)
+        start = time.perf_counter()
+        try:
+            admitted = await self.acquire(priority)
+        except Overloaded:
+            _SHED.inc(severity=severity, reason="queue_full")
+            raise
+        ticket.waited = time.perf_counter() - start
+        _WAIT_SECONDS.observe(ticket.waited, severity=severity)
+
+        if not admitted:
+            # Shed: run the cheap deterministic path without taking a slot.
+            ticket.degraded = True
+            _SHED.inc(severity=severity, reason="queue_timeout")
+            yield ticket
+            return
+        try:
+            yield ticket
+        finally:
+            self.release()
+
+
+_CONTROLLER: Optional[AdmissionController] = None
+
+
+def controller() -> AdmissionController:
+    global _CONTROLLER
+    if _CONTROLLER is None:
+        _CONTROLLER = AdmissionController(
+            ADMISSION_MAX_CONCURRENCY,
+            ADMISSION_MAX_QUEUE,
+            ADMISSION_SHED_AFTER_MS / 1000.0,
+        )
+    return _CONTROLLER
+
+
+def admit(severity: str):
+    """Async context manager admitting one request of the given severity."""
+
+    return controller().admit(severity)
+
+
+__all__ = ["Overloaded", "Ticket", "AdmissionController", "SEVERITY_PRIORITY", "admit", "controller"]
@@ -0,0 +1,324 @@
+"""Append-only audit log of conversation turns, written off the request path.
+
+Every turn's triage decision, guardrail outcome and the instructions sent are
+handed to a bounded queue (:func:`record_turn`); a background thread encodes
+and appends them to segment files in ``AUDIT_LOG_DIR``. When the writer falls behind, a
+producer waits up to ``AUDIT_BLOCK_MS`` for space and then drops the record,
+counting it in ``firstaid_audit_records_dropped_total``.
+
+Segments are named ``audit-<opened ms>-<pid>-<seq>.seg`` (one writer per
+worker process) and rotated at ``AUDIT_SEGMENT_MAX_BYTES``; they are never
+deleted by the service. Each record is a fixed header followed by the
+category and a zlib-compressed JSON body::
+
+    <I length of everything after this field
+    <I crc32 of the body
+    <q timestamp (unix ms)
+    <B severity code (index into SEVERITIES)
+    <B flags (1 = in scope, 2 = verification passed, 4 = degraded)
+    <H category length, then category (utf-8), then body
+
+:func:`scan` memory-maps segments and filters on the header fields, so a query
+such as "high-severity bleeding turns in the last week" only decompresses the
+matching records. A torn record at the end of a segment (crash mid-write) ends
+the scan of that segment.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config import (
+    AUDIT_BLOCK_MS,
+    AUDIT_FSYNC,
+    AUDIT_LOG_DIR,
+    AUDIT_LOG_ENABLED,
+    AUDIT_QUEUE_SIZE,
+    AUDIT_SEGMENT_MAX_BYTES,
+)
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "audit-"
+SEGMENT_SUFFIX = ".seg"
+SEVERITIES = ("unknown", "low", "medium", "high", "severe")
+FLAG_IN_SCOPE = 1
+FLAG_VERIFIED = 2
+FLAG_DEGRADED = 4
+
+_HEADER = struct.Struct("<IIqBBH")
+_LENGTH_SIZE = 4
+
+_WRITTEN = metrics.counter("firstaid_audit_records_written_total", "Audit records appended to segment files.")
+_DROPPED = metrics.counter(
+    "firstaid_audit_records_dropped_total",
+    "Audit records dropped because the writer queue stayed full.",
+)
+_QUEUE_DEPTH = metrics.gauge("firstaid_audit_queue_depth", "Audit records waiting for the writer.")
+
+
+def encode(record: Dict[str, Any]) -> bytes:
+    """Frame one audit record (see the module docstring for the layout)."""
+
+    body = zlib.compress(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8"), 6)
+    category = str(record.get("category") or "").encode("utf-8")[:65535]
+    severity = str(record.get("severity") or "unknown").lower()
+    flags = (
+        (FLAG_IN_SCOPE if record.get("in_scope") else 0)
+        | (FLAG_VERIFIED if record.get("verification_passed") else 0)
+        | (FLAG_DEGRADED if record.get("degraded") else 0)
+    )
+    header = _HEADER.pack(
+        _HEADER.size - _LENGTH_SIZE + len(category) + len(body),
+        zlib.crc32(body),
+        int(record.get("ts_ms") or time.time() * 1000),
+        SEVERITIES.index(severity) if severity in SEVERITIES else 0,
+        flags,
+        len(category),
+    )
+    return header + category + body
+
+
+class _Writer:
+    def __init__(self, directory: str, segment_bytes: int, queue_size: int) -> None:
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self._handle = None
+        self._size = 0
+        self._sequence = 0
+
+    def submit(self, record: Dict[str, Any], block: float) -> bool:
+        self._ensure_thread()
+        try:
+            if block > 0:
+                self.queue.put(record, timeout=block)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            _DROPPED.inc()
+            return False
+        _QUEUE_DEPTH.set(self.queue.qsize())
+        return True
+
+    def _ensure_thread(self) -> None:
+        # Started lazily (and again after a fork) so each worker writes its own segments.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._handle = None
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _open_segment(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        name = f"{SEGMENT_PREFIX}{int(time.time() * 1000):013d}-{os.getpid()}-{self._sequence}{SEGMENT_SUFFIX}"
+        self._handle = open(self.directory / name, "ab")
+        self._size = self._handle.tell()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            _QUEUE_DEPTH.set(self.queue.qsize())
+            frames = []
+            for record in batch:
+                try:
+                    frames.append(encode(record))
+                except Exception as exc:
+                    LOGGER.warning("Unable to encode audit record: %s", exc)
+            payload = b"".join(frames)
+            try:
+                if self._handle is None or (self._size and self._size + len(payload) > self.segment_bytes):
+                    self._open_segment()
+                self._handle.write(payload)
+                self._handle.flush()
+                if AUDIT_FSYNC:
+                    os.fsync(self._handle.fileno())
+                self._size += len(payload)
+                _WRITTEN.inc(len(frames))
+            except Exception as exc:
+                LOGGER.warning("Unable to write %d audit records: %s", len(frames), exc)
+                if self._handle is not None:
+                    with contextlib.suppress(Exception):
+                        self._handle.close()
+                    self._handle = None
+
+    def flush(self, timeout: float = 2.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Give the writer a moment to finish the batch it already dequeued.
+        time.sleep(0.02)
+
+
+_WRITER = _Writer(AUDIT_LOG_DIR, AUDIT_SEGMENT_MAX_BYTES, AUDIT_QUEUE_SIZE)
+
+
+def build_record(
+    result: Dict[str, Any],
+    *,
+    session_id: Optional[str] = None,
+    assistant_text: str = "",
+    degraded: bool = False,
+    trace_id: str = "",
+) -> Dict[str, Any]:
+    """Summarise one pipeline result as an audit record."""
+
+    triage = result.get("triage") or {}
+    verification = result.get("verification") or {}
+    instructions = result.get("instructions") or {}
+    security = result.get("security") or {}
+    conversation = result.get("conversation") or {}
+    return {
+        "ts_ms": int(time.time() * 1000),
+        "session_id": session_id,
+        "trace_id": trace_id,
+        "category": str(triage.get("category") or "").lower(),
+        "severity": str(triage.get("severity") or "unknown").lower(),
+        "triage_source": triage.get("source", "keywords"),
+        "confidence": triage.get("confidence"),
+        "in_scope": bool(conversation.get("in_scope", not result.get("rejected"))),
+        "rejected": bool(result.get("rejected")),
+        "security_allowed": security.get("allowed", True),
+        "user_text": security.get("latest_sanitized", ""),
+        "verification_passed": bool(verification.get("passed", False)),
+        "verification_skipped": bool(verification.get("skipped")),
+        "policy_flags": verification.get("policy_flags", []),
+        "steps": instructions.get("steps", ""),
+        "sources": instructions.get("sources", []),
+        "instructions_degraded": bool(instructions.get("degraded")),
+        "degraded": degraded,
+        "assistant_text": assistant_text,
+    }
+
+
+def record_turn(record: Dict[str, Any]) -> bool:
+    """Queue a record for the writer (which encodes it); False when disabled or dropped."""
+
+    if not AUDIT_LOG_ENABLED:
+        return False
+    return _WRITER.submit(record, AUDIT_BLOCK_MS / 1000.0)
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Wait briefly for queued records to be written (used by tests and tools)."""
+
+    _WRITER.flush(timeout)
+
+
+def segments(directory: str) -> List[Path]:
+    base = Path(directory)
+    if not base.is_dir():
+        return []
+    return sorted(base.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+
+def scan(
+    directory: str,
+    *,
+    since_ms: Optional[int] = None,
+    until_ms: Optional[int] = None,
+    severities: Optional[List[str]] = None,
+    category: Optional[str] = None,
+    in_scope: Optional[bool] = None,
+    decode: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Yield matching records from every segment, filtering on headers first.
+
+    With ``decode=False`` only the header fields are returned (``ts_ms``,
+    ``severity``, ``category``, ``in_scope``, ``verification_passed``,
+    ``degraded``), which is enough for counts and skips decompression.
+    """
+
+    wanted_severities = {SEVERITIES.index(s) for s in severities or () if s in SEVERITIES} if severities else None
+    wanted_category = category.lower().encode("utf-8") if category else None
+    for path in segments(directory):
+        try:
+            if since_ms is not None and path.stat().st_mtime * 1000 < since_ms:
+                continue  # last written before the window opened
+            first_ms = int(path.name[len(SEGMENT_PREFIX):].split("-", 1)[0])
+        except (OSError, ValueError):
+            continue
+        if until_ms is not None and first_ms > until_ms:
+            continue
+        with path.open("rb") as handle:
+            try:
+                view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty segment
+                continue
+        with view:
+            yield from _scan_segment(
+                view, path, since_ms, until_ms, wanted_severities, wanted_category, in_scope, decode
+            )
+
+
+def _scan_segment(view, path, since_ms, until_ms, severities, category, in_scope, decode):
+    offset, end = 0, len(view)
+    while offset + _HEADER.size <= end:
+        length, crc, ts_ms, severity, flags, category_length = _HEADER.unpack_from(view, offset)
+        record_end = offset + _LENGTH_SIZE + length
+        body_start = offset + _HEADER.size + category_length
+        if length < _HEADER.size - _LENGTH_SIZE + category_length or record_end > end:
+            # Normal at the tail of a segment that is still being written.
+            LOGGER.debug("Truncated audit record at %s:%d", path, offset)
+            return
+        start, offset = offset, record_end
+        if (since_ms is not None and ts_ms < since_ms) or (until_ms is not None and ts_ms > until_ms):
+            continue
+        if severities is not None and severity not in severities:
+            continue
+        if in_scope is not None and bool(flags & FLAG_IN_SCOPE) != in_scope:
+            continue
+        if category is not None and view[start + _HEADER.size:body_start] != category:
+            continue
+        if not decode:
+            yield {
+                "ts_ms": ts_ms,
+                "severity": SEVERITIES[severity] if severity < len(SEVERITIES) else "unknown",
+                "category": view[start + _HEADER.size:body_start].decode("utf-8"),
+                "in_scope": bool(flags & FLAG_IN_SCOPE),
+                "verification_passed": bool(flags & FLAG_VERIFIED),
+                "degraded": bool(flags & FLAG_DEGRADED),
+            }
+            continue
+        body = view[body_start:record_end]
+        if zlib.crc32(body) != crc:
+            LOGGER.warning("Corrupt audit record at %s:%d", path, start)
+            continue
+        yield json.loads(zlib.decompress(body))
+
+
+__all__ = [
+    "SEVERITIES",
+    "encode",
+    "build_record",
+    "record_turn",
+    "flush",
+    "segments",
+    "scan",
+]
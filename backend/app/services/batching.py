@@ -0,0 +1,126 @@
+"""Online micro-batching of concurrent single-item upstream calls.
+
+Callers block in :meth:`MicroBatcher.submit` while a dispatcher thread
+collects items for up to ``window`` seconds after the first one arrives (or
+until ``max_batch`` items are waiting), then hands the batch to a small
+sender pool that makes one multi-input call. Each caller gets its own result,
+or the batch's exception. Identical inputs within a batch are sent once.
+
+Batch sizes and the wait added before sending are exported per batcher.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import metrics
+
+_BATCH_SIZE = metrics.histogram(
+    "firstaid_batch_size",
+    "Items per upstream batch, by batcher.",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+_BATCH_WAIT = metrics.histogram(
+    "firstaid_batch_wait_seconds",
+    "Time an item waited for its batch to be sent, by batcher.",
+    ("batcher",),
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1),
+)
+
+_Item = Tuple[Any, "Future[Tuple[Any, int]]", float]
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[List[Any]], Sequence[Any]],
+        window: float,
+        max_batch: int,
+        max_in_flight: int = 4,
+    ) -> None:
+        self.name = name
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    def submit(self, item: Any) -> Tuple[Any, int]:
+        """Return ``(result, batch_size)`` for one item, batching it with concurrent callers."""
+
+        if not self.enabled:
+            _BATCH_SIZE.observe(1, batcher=self.name)
+            return self.send([item])[0], 1
+        self._ensure_thread()
+        future: "Future[Tuple[Any, int]]" = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_thread(self) -> None:
+        # Started lazily (and again after a fork) so each worker owns its dispatcher.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=f"{self.name}-batch")
+            self._thread = threading.Thread(target=self._dispatch, name=f"{self.name}-batcher", daemon=True)
+            self._thread.start()
+
+    def _dispatch(self) -> None:
+        pending = self._queue
+        while True:
+            first = pending.get()
+            batch = [first]
+            deadline = first[2] + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._send_batch, batch)
+
+    def _send_batch(self, batch: List[_Item]) -> None:
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            _BATCH_WAIT.observe(started - enqueued, batcher=self.name)
+        _BATCH_SIZE.observe(len(batch), batcher=self.name)
+
+        positions: Dict[Any, int] = {}
+        unique: List[Any] = []
+        for item, _, _ in batch:
+            if item not in positions:
+                positions[item] = len(unique)
+                unique.append(item)
+        try:
+            results = self.send(unique)
+            if len(results) != len(unique):
+                raise ValueError(f"{self.name} batch returned {len(results)} results for {len(unique)} inputs")
+        except Exception as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        for item, future, _ in batch:
+            future.set_result((results[positions[item]], len(batch)))
+
+
+__all__ = ["MicroBatcher"]
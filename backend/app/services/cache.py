@@ -0,0 +1,581 @@
+"""Cache shared by the embedding, generation and session (idempotency) layers.
+
+A :class:`Cache` is a namespace with a TTL on top of one backend, chosen with
+``CACHE_BACKEND``:
+
+* ``memory`` – an in-process LRU bounded by ``CACHE_MAX_BYTES`` (each worker
+  has its own);
+* ``sqlite`` – one SQLite file in WAL mode (``CACHE_SQLITE_PATH``) shared by
+  every worker on the host, bounded by ``CACHE_MAX_BYTES``;
+* ``http`` – a network key-value service at ``CACHE_URL`` shared by every
+  host (``loadtest.standins`` serves the protocol for tests and load runs).
+
+The shared backends are fronted by a small in-process LRU
+(``CACHE_LOCAL_MAX_BYTES``), so hot keys are served without a round trip.
+Eviction is size-aware: entries are charged their key and value bytes and the
+least recently used go first once a tier is over its budget; a value larger
+than a tier's budget is not stored there.
+
+Stampede protection: concurrent :meth:`Cache.get_or_compute` calls for one
+key in a worker share a single computation, and with a shared backend the
+computing worker holds a lease that makes the other workers wait for its
+result instead of computing it too. The lease, and the wait, last
+``CACHE_LEASE_SECONDS`` or, for computations with a longer timeout (an LLM
+call), that timeout plus a second.
+
+Keys are hashed with their namespace; values are JSON unless a cache brings
+its own codec. Backend errors are logged and treated as misses: the cache
+never fails a request.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+from urllib.parse import quote
+
+from ..config import (
+    CACHE_BACKEND,
+    CACHE_LEASE_SECONDS,
+    CACHE_LOCAL_MAX_BYTES,
+    CACHE_MAX_BYTES,
+    CACHE_SQLITE_PATH,
+    CACHE_TIMEOUT_SECONDS,
+    CACHE_URL,
+)
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+ENTRY_OVERHEAD_BYTES = 64
+POLL_SECONDS = 0.05
+
+_COALESCED = metrics.counter(
+    "firstaid_cache_coalesced_total",
+    "Cache misses served by another caller's computation, by cache and outcome (joined, waited, timeout).",
+    ("cache", "outcome"),
+)
+_EVICTIONS = metrics.counter(
+    "firstaid_cache_evictions_total",
+    "Entries evicted to stay within the byte budget, by backend.",
+    ("backend",),
+)
+_BYTES = metrics.gauge("firstaid_cache_bytes", "Bytes held by the cache, by backend.", ("backend",))
+_ERRORS = metrics.counter(
+    "firstaid_cache_errors_total",
+    "Cache backend failures treated as misses, by backend and operation.",
+    ("backend", "operation"),
+)
+
+T = TypeVar("T")
+Hit = Tuple[bytes, float]  # value and seconds left to live
+
+
+class MemoryBackend:
+    """Thread-safe LRU bounded by the bytes of its keys and values."""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._leases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(key: str, value: bytes) -> int:
+        return len(key) + len(value) + ENTRY_OVERHEAD_BYTES
+
+    def _drop(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self.bytes -= self._cost(key, value)
+
+    def get(self, key: str) -> Optional[Hit]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1] - now
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        cost = self._cost(key, value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if cost > self.max_bytes or ttl <= 0:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self.bytes += cost
+            evicted = 0
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+        if evicted:
+            _EVICTIONS.inc(evicted, backend=self.name)
+        _BYTES.set(self.bytes, backend=self.name)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def lease(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._leases.get(key, 0.0) > now:
+                return False
+            self._leases[key] = now + ttl
+            return True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._leases.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._leases.clear()
+            self.bytes = 0
+        _BYTES.set(0, backend=self.name)
+
+
+_SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+    " expires_at REAL NOT NULL, used_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS cache_used_at ON cache (used_at)",
+    "CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO usage VALUES (0, 0)",
+    "CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache"
+    " BEGIN UPDATE usage SET bytes = bytes + NEW.size WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache"
+    " BEGIN UPDATE usage SET bytes = bytes - OLD.size WHERE id = 0; END",
+    "CREATE TRIGGER IF NOT EXISTS cache_resize AFTER UPDATE OF size ON cache"
+    " BEGIN UPDATE usage SET bytes = bytes - OLD.size + NEW.size WHERE id = 0; END",
+    "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)",
+)
+
+
+class SqliteBackend:
+    """One SQLite file (WAL) shared by the workers of a host.
+
+    Each thread opens its own connection (again after a fork); expiry uses
+    wall-clock time because the file outlives processes. Total bytes are kept
+    by triggers, so eviction does not scan the table.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SQLITE_SCHEMA:
+                conn.execute(statement)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Hit]:
+        now = time.time()
+        db = self._db()
+        row = db.execute("SELECT value, expires_at, used_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, used_at = row
+        if expires_at <= now:
+            db.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            return None
+        if now - used_at > 1.0:  # recency at one-second resolution keeps reads mostly read-only
+            db.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+        return bytes(value), expires_at - now
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        size = len(key) + len(value) + ENTRY_OVERHEAD_BYTES
+        db = self._db()
+        if size > self.max_bytes or ttl <= 0:
+            db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return
+        now = time.time()
+        evicted = 0
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO cache (key, value, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                " expires_at = excluded.expires_at, used_at = excluded.used_at",
+                (key, value, size, now + ttl, now),
+            )
+            total = db.execute("SELECT bytes FROM usage WHERE id = 0").fetchone()[0]
+            if total > self.max_bytes:
+                evicted += db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+            while total > self.max_bytes:
+                evicted += db.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache WHERE key != ? ORDER BY used_at LIMIT 32)",
+                    (key,),
+                ).rowcount
+                total = db.execute("SELECT bytes FROM usage WHERE id = 0").fetchone()[0]
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if evicted:
+            _EVICTIONS.inc(evicted, backend=self.name)
+        _BYTES.set(total, backend=self.name)
+
+    def delete(self, key: str) -> None:
+        self._db().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def lease(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            acquired = db.execute("INSERT OR IGNORE INTO leases VALUES (?, ?)", (key, now + ttl)).rowcount == 1
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def release(self, key: str) -> None:
+        self._db().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        db = self._db()
+        db.execute("DELETE FROM cache")
+        db.execute("DELETE FROM leases")
+
+
+class HttpBackend:
+    """Network key-value service.
+
+    Protocol: ``GET /kv/<key>`` (``200`` with the value and ``X-Expires-In``,
+    or ``404``), ``PUT /kv/<key>?ttl=S``, ``DELETE /kv/<key>``,
+    ``POST /lease/<key>?ttl=S`` (``201`` acquired, ``409`` held),
+    ``DELETE /lease/<key>`` and ``POST /flush``.
+    """
+
+    name = "http"
+    shared = True
+
+    def __init__(self, url: str, timeout: float) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _url(self, kind: str, key: str) -> str:
+        return f"{self.url}/{kind}/{quote(key, safe='')}"
+
+    @staticmethod
+    def _session():
+        from . import upstream
+
+        return upstream.session()
+
+    def get(self, key: str) -> Optional[Hit]:
+        response = self._session().get(self._url("kv", key), timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content, float(response.headers.get("X-Expires-In") or 0.0)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._session().put(
+            self._url("kv", key), params={"ttl": ttl}, data=value, timeout=self.timeout
+        ).raise_for_status()
+
+    def delete(self, key: str) -> None:
+        self._session().delete(self._url("kv", key), timeout=self.timeout).raise_for_status()
+
+    def lease(self, key: str, ttl: float) -> bool:
+        response = self._session().post(self._url("lease", key), params={"ttl": ttl}, timeout=self.timeout)
+        if response.status_code == 409:
+            return False
+        response.raise_for_status()
+        return True
+
+    def release(self, key: str) -> None:
+        self._session().delete(self._url("lease", key), timeout=self.timeout).raise_for_status()
+
+    def clear(self) -> None:
+        self._session().post(f"{self.url}/flush", timeout=self.timeout).raise_for_status()
+
+
+class TieredBackend:
+    """An in-process LRU in front of a shared backend."""
+
+    shared = True
+
+    def __init__(self, local: MemoryBackend, remote: Any) -> None:
+        self.local = local
+        self.remote = remote
+        self.name = remote.name
+
+    def get(self, key: str) -> Optional[Hit]:
+        hit = self.local.get(key)
+        if hit is None:
+            hit = self.remote.get(key)
+            if hit is not None:
+                self.local.set(key, hit[0], hit[1])
+        return hit
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.local.set(key, value, ttl)
+        self.remote.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        self.remote.delete(key)
+
+    def lease(self, key: str, ttl: float) -> bool:
+        return self.remote.lease(key, ttl)
+
+    def release(self, key: str) -> None:
+        self.remote.release(key)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.remote.clear()
+
+
+def build_backend(kind: str = CACHE_BACKEND) -> Any:
+    kind = (kind or "memory").strip().lower()
+    if kind == "sqlite":
+        path = CACHE_SQLITE_PATH or os.path.join(tempfile.gettempdir(), "firstaid-cache.sqlite3")
+        remote: Any = SqliteBackend(path, CACHE_MAX_BYTES)
+    elif kind == "http" and CACHE_URL:
+        remote = HttpBackend(CACHE_URL, CACHE_TIMEOUT_SECONDS)
+    else:
+        if kind != "memory":
+            LOGGER.warning("Unknown or unconfigured CACHE_BACKEND %r; using the in-process cache", kind)
+        return MemoryBackend(CACHE_MAX_BYTES)
+    if CACHE_LOCAL_MAX_BYTES > 0:
+        return TieredBackend(MemoryBackend(CACHE_LOCAL_MAX_BYTES), remote)
+    return remote
+
+
+_BACKEND: Optional[Any] = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def backend() -> Any:
+    """The configured backend, created on first use."""
+
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                _BACKEND = build_backend()
+    return _BACKEND
+
+
+def is_shared() -> bool:
+    return bool(getattr(backend(), "shared", False))
+
+
+def _json_encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _json_decode(data: bytes) -> Any:
+    return json.loads(data)
+
+
+class Cache:
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        backend: Optional[Any] = None,
+        encode: Callable[[Any], bytes] = _json_encode,
+        decode: Callable[[bytes], Any] = _json_decode,
+    ) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self._backend = backend
+        self.encode = encode
+        self.decode = decode
+        self._flights: Dict[str, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> Any:
+        return self._backend if self._backend is not None else backend()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def _call(self, operation: str, default: Any, *args: Any) -> Any:
+        store = self.backend
+        try:
+            return getattr(store, operation)(*args)
+        except Exception as exc:
+            LOGGER.warning("Cache %s %s failed: %s", store.name, operation, exc)
+            _ERRORS.inc(backend=store.name, operation=operation)
+            return default
+
+    def _load(self, full_key: str) -> Tuple[bool, Any]:
+        hit = self._call("get", None, full_key)
+        if hit is None:
+            return False, None
+        try:
+            return True, self.decode(hit[0])
+        except ValueError:
+            self._call("delete", None, full_key)
+            return False, None
+
+    def _store(self, full_key: str, value: Any, ttl: Optional[float]) -> None:
+        self._call("set", None, full_key, self.encode(value), self.ttl if ttl is None else ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        found, value = self._load(self._key(key))
+        metrics.record_cache(self.namespace, found)
+        return value if found else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if self.enabled:
+            self._store(self._key(key), value, ttl)
+
+    def delete(self, key: str) -> None:
+        self._call("delete", None, self._key(key))
+
+    def clear(self) -> None:
+        """Empty the backend (every namespace on it)."""
+
+        self._call("clear", None)
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], T], ttl: Optional[float] = None, timeout: Optional[float] = None
+    ) -> T:
+        """The cached value, or ``compute()`` stored under ``key``; computed once per miss.
+
+        ``timeout`` is how long ``compute`` may take; other callers wait at
+        least that long for its result before computing it themselves.
+        Exceptions from ``compute`` are not cached; callers waiting on the
+        failed computation get the same exception, except when it was
+        abandoned (a ``BaseException`` such as a cancellation), in which case
+        they compute the value themselves.
+        """
+
+        if not self.enabled:
+            return compute()
+        full_key = self._key(key)
+        found, value = self._load(full_key)
+        metrics.record_cache(self.namespace, found)
+        if found:
+            return value
+        hold = CACHE_LEASE_SECONDS if timeout is None else max(CACHE_LEASE_SECONDS, timeout + 1.0)
+        while True:
+            with self._lock:
+                flight = self._flights.get(full_key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[full_key] = Future()
+            if leader:
+                break
+            try:
+                # The leader may first wait out another worker's lease, then compute.
+                value = flight.result(timeout=2 * hold)
+            except CancelledError:
+                continue  # the computation was abandoned; take it over
+            except FutureTimeout:
+                _COALESCED.inc(cache=self.namespace, outcome="timeout")
+                return compute()
+            _COALESCED.inc(cache=self.namespace, outcome="joined")
+            return value
+        try:
+            value = self._compute_once(full_key, compute, ttl, hold)
+        except Exception as exc:
+            flight.set_exception(exc)
+            flight.exception()  # retrieved, even when nobody was waiting
+            raise
+        except BaseException:
+            flight.cancel()
+            raise
+        else:
+            flight.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                if self._flights.get(full_key) is flight:
+                    del self._flights[full_key]
+
+    def _compute_once(self, full_key: str, compute: Callable[[], T], ttl: Optional[float], hold: float) -> T:
+        store = self.backend
+        if not getattr(store, "shared", False):
+            value = compute()
+            self._store(full_key, value, ttl)
+            return value
+        # Another worker computing it holds the lease: wait for its result rather
+        # than repeat the work, and take over as soon as the lease is free again
+        # (its computation failed, which is never cached).
+        deadline = time.monotonic() + hold
+        waited = False
+        while time.monotonic() < deadline:
+            if self._call("lease", True, full_key, hold):
+                try:
+                    found, value = self._load(full_key)  # the previous holder may have just finished
+                    if found:
+                        if waited:
+                            _COALESCED.inc(cache=self.namespace, outcome="waited")
+                    else:
+                        value = compute()
+                        self._store(full_key, value, ttl)
+                    return value
+                finally:
+                    self._call("release", None, full_key)
+            time.sleep(POLL_SECONDS)
+            waited = True
+            found, value = self._load(full_key)
+            if found:
+                _COALESCED.inc(cache=self.namespace, outcome="waited")
+                return value
+        _COALESCED.inc(cache=self.namespace, outcome="timeout")
+        value = compute()
+        self._store(full_key, value, ttl)
+        return value
+
+
+__all__ = [
+    "Cache",
+    "MemoryBackend",
+    "SqliteBackend",
+    "HttpBackend",
+    "TieredBackend",
+    "build_backend",
+    "backend",
+    "is_shared",
+]
@@ -0,0 +1,204 @@
+"""Cancellation of pipeline work whose client has gone away.
+
+A :class:`CancelToken` is created per ``/api/chat/continue`` computation and
+per WebSocket turn and made current for the pipeline thread with
+:func:`scope`. Every request waiting on the computation holds the token
+(:func:`acquire`; an idempotent retry holds the original's); when the last
+holder's client disconnects (:func:`release`) the token is cancelled:
+
+* ``upstream.post`` raises :class:`Cancelled` instead of starting a call, so
+  the embedding, vector search or LLM call that would follow is skipped;
+* a call already in flight has its connection's socket shut down, which
+  makes the blocked read fail at once and tells the provider to stop.
+
+:class:`Cancelled` derives from ``BaseException`` (like
+``asyncio.CancelledError``) so the agents' ``except Exception`` fallbacks do
+not turn an abandoned request into a fallback answer.
+
+Metrics: ``firstaid_abandoned_requests_total{endpoint,stage}``,
+``firstaid_upstream_cancelled_total{provider,operation,phase}`` and
+``firstaid_upstream_seconds_saved_total{provider,operation}`` (estimated
+from each operation's typical latency).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from . import metrics
+
+ABANDONED = metrics.counter(
+    "firstaid_abandoned_requests_total",
+    "Requests whose client disconnected, by endpoint and stage (queued, running, shared).",
+    ("endpoint", "stage"),
+)
+UPSTREAM_CANCELLED = metrics.counter(
+    "firstaid_upstream_cancelled_total",
+    "Upstream calls not made (skipped) or cut short (aborted) for abandoned requests.",
+    ("provider", "operation", "phase"),
+)
+SECONDS_SAVED = metrics.counter(
+    "firstaid_upstream_seconds_saved_total",
+    "Estimated upstream seconds not spent on abandoned requests (typical latency minus time already spent).",
+    ("provider", "operation"),
+)
+
+_CURRENT: "contextvars.ContextVar[Optional[CancelToken]]" = contextvars.ContextVar("cancel_token", default=None)
+
+
+class Cancelled(BaseException):
+    """The request this work was for has been abandoned."""
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._connections: Set[Any] = set()
+        self._callbacks: List[Callable[[], None]] = []
+        self.holders = 0  # requests waiting on the work; only touched from the event loop
+        self.started = False
+        self.cancelled_at: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.cancelled_at = time.monotonic()
+            self._event.set()
+            for connection in self._connections:
+                _shutdown(connection)
+            self._connections.clear()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled()
+
+    def bind(self, connection: Any) -> None:
+        """Tie an upstream connection to this token until :meth:`unbind`."""
+
+        with self._lock:
+            if self._event.is_set():
+                _shutdown(connection)
+            else:
+                self._connections.add(connection)
+
+    def unbind(self, connection: Any) -> None:
+        with self._lock:
+            self._connections.discard(connection)
+
+
+_SHARED: Dict[str, CancelToken] = {}
+
+
+def acquire(key: Optional[str] = None) -> CancelToken:
+    """Hold the token of the work for ``key`` (a new token when none is live)."""
+
+    token = _SHARED.get(key) if key else None
+    if token is None or token.cancelled:
+        token = CancelToken()
+        if key:
+            _SHARED[key] = token
+    token.holders += 1
+    return token
+
+
+def release(key: Optional[str], token: CancelToken, abandoned: bool, grace: float = 0.0) -> bool:
+    """Drop one holder; returns True when the work is now unwanted.
+
+    The last holder leaving because its client disconnected cancels the token,
+    after ``grace`` seconds for keyed work so that a prompt retry can still
+    join it.
+    """
+
+    token.holders = max(0, token.holders - 1)
+    if token.holders:
+        return False
+    if not abandoned:
+        _forget(key, token)
+        return False
+    if key and grace > 0:
+        asyncio.get_running_loop().call_later(grace, _expire, key, token)
+    else:
+        _forget(key, token)
+        token.cancel()
+    return True
+
+
+def _expire(key: str, token: CancelToken) -> None:
+    if token.holders == 0:
+        _forget(key, token)
+        token.cancel()
+
+
+def _forget(key: Optional[str], token: CancelToken) -> None:
+    if key and _SHARED.get(key) is token:
+        del _SHARED[key]
+
+
+def _shutdown(connection: Any) -> None:
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@contextmanager
+def scope(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    """Make ``token`` current for the work done inside the block."""
+
+    if token is not None:
+        token.started = True
+    reset = _CURRENT.set(token)
+    try:
+        yield token
+    finally:
+        _CURRENT.reset(reset)
+
+
+def current() -> Optional[CancelToken]:
+    return _CURRENT.get()
+
+
+def check() -> None:
+    """Raise :class:`Cancelled` if the current request has been abandoned."""
+
+    token = _CURRENT.get()
+    if token is not None:
+        token.check()
+
+
+__all__ = [
+    "ABANDONED",
+    "UPSTREAM_CANCELLED",
+    "SECONDS_SAVED",
+    "Cancelled",
+    "CancelToken",
+    "acquire",
+    "release",
+    "scope",
+    "current",
+    "check",
+]
@@ -0,0 +1,212 @@
+"""Precomputed retrieval contexts for each triage category.
+
+Retrieval for ``generate`` is dominated by the handful of triage categories,
+so a background thread retrieves the top documents for each category once,
+deduplicates them and packs them into a ready-to-use context bundle. When a
+query adds little beyond its category keywords ("I burned my hand"),
+generation uses the bundle instead of embedding and searching again.
+
+Bundles are rebuilt every ``CONTEXT_BUNDLE_REFRESH_SECONDS``, when the lexical
+knowledge-base file changes, and after documents are upserted to the vector
+store (:func:`mark_stale`).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from ..config import (
+    CONTEXT_BUNDLE_MAX_CHARS,
+    CONTEXT_BUNDLE_MAX_EXTRA_TERMS,
+    CONTEXT_BUNDLE_REFRESH_SECONDS,
+    CONTEXT_BUNDLE_TOP_K,
+    CONTEXT_BUNDLES_ENABLED,
+)
+from . import lexical_index, metrics
+
+LOGGER = logging.getLogger(__name__)
+
+POLL_SECONDS = 30.0
+
+# Words that carry no retrieval signal beyond the category itself.
+_FILLER_TERMS = frozenset(
+    "help hurt hurting got get need please think just bad really little bit now "
+    "dont cant wont pain painful happened happen first aid advice tip".split()
+)
+
+_REQUESTS = metrics.counter(
+    "firstaid_context_bundle_requests_total",
+    "Generation requests by category and bundle outcome (hit, miss, specific).",
+    ("category", "result"),
+)
+_REFRESHED = metrics.gauge(
+    "firstaid_context_bundle_refresh_timestamp_seconds",
+    "Unix time of the last context bundle refresh.",
+)
+
+
+class Bundle(NamedTuple):
+    category: str
+    text: str
+    sources: List[str]
+    built_at: float
+
+
+Retriever = Callable[..., List[Dict]]
+
+_BUNDLES: Dict[str, Bundle] = {}
+_CATEGORIES: Dict[str, Sequence[str]] = {}
+_RETRIEVE: Optional[Retriever] = None
+_STALE = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+_THREAD_LOCK = threading.Lock()
+_LISTENERS: List[Callable[[], None]] = []
+
+
+def configure(categories: Dict[str, Sequence[str]], retrieve: Retriever) -> None:
+    """Set the category keyword map and the retrieval function used to build bundles."""
+
+    global _RETRIEVE
+    _CATEGORIES.clear()
+    _CATEGORIES.update(categories)
+    _RETRIEVE = retrieve
+
+
+def _pack(category: str, documents: List[Dict]) -> Optional[Bundle]:
+    seen_ids, seen_text = set(), set()
+    parts: List[str] = []
+    sources: List[str] = []
+    size = 0
+    for document in documents:
+        text = str(document.get("text") or (document.get("document") or {}).get("text") or "").strip()
+        doc_id = str(document.get("_id") or (document.get("document") or {}).get("_id") or "")
+        fingerprint = hashlib.blake2b(" ".join(text.lower().split()).encode("utf-8"), digest_size=8).digest()
+        if not text or (doc_id and doc_id in seen_ids) or fingerprint in seen_text:
+            continue
+        if size and size + len(text) > CONTEXT_BUNDLE_MAX_CHARS:
+            break
+        seen_ids.add(doc_id)
+        seen_text.add(fingerprint)
+        parts.append(text[:CONTEXT_BUNDLE_MAX_CHARS])
+        sources.append(doc_id)
+        size += len(parts[-1])
+    if not parts:
+        return None
+    return Bundle(category, "\n\n".join(parts), sources, time.time())
+
+
+def refresh_all() -> int:
+    """Rebuild every bundle; returns how many categories have one."""
+
+    global _BUNDLES
+    if _RETRIEVE is None:
+        return 0
+    _STALE.clear()
+    built: Dict[str, Bundle] = {}
+    for category in list(_CATEGORIES):
+        try:
+            documents = _RETRIEVE(f"{category} first aid", top_k=CONTEXT_BUNDLE_TOP_K)
+        except Exception as exc:
+            LOGGER.warning("Context bundle refresh failed for %s: %s", category, exc)
+            documents = []
+        bundle = _pack(category, documents)
+        if bundle is not None:
+            built[category] = bundle
+        elif category in _BUNDLES:
+            built[category] = _BUNDLES[category]  # keep serving the previous bundle
+    _BUNDLES = built  # swapped whole so readers never see a half-built map
+    _REFRESHED.set(time.time())
+    for listener in list(_LISTENERS):
+        try:
+            listener()
+        except Exception as exc:
+            LOGGER.warning("Context bundle listener %s failed: %s", getattr(listener, "__name__", listener), exc)
+    return len(built)
+
+
+def on_refresh(listener: Callable[[], None]) -> None:
+    """Call ``listener`` after every refresh (e.g. to re-render derived content)."""
+
+    if listener not in _LISTENERS:
+        _LISTENERS.append(listener)
+
+
+def current(category: str) -> Optional[Bundle]:
+    """The bundle for ``category`` as of the last refresh, without counting a lookup."""
+
+    return _BUNDLES.get((category or "").strip().lower())
+
+
+def mark_stale() -> None:
+    """Ask the background refresher to rebuild soon (e.g. after a knowledge-base upsert)."""
+
+    _STALE.set()
+
+
+def _run() -> None:
+    last_refresh = 0.0
+    last_version = None
+    while True:
+        lexical_index.refresh_if_changed()
+        version = lexical_index.version()
+        due = time.monotonic() - last_refresh >= CONTEXT_BUNDLE_REFRESH_SECONDS
+        if due or _STALE.is_set() or version != last_version:
+            count = refresh_all()
+            last_refresh, last_version = time.monotonic(), version
+            LOGGER.info("Context bundles refreshed for %d categories", count)
+        _STALE.wait(POLL_SECONDS)
+
+
+def start_background_refresh() -> Optional[threading.Thread]:
+    global _THREAD
+    if not CONTEXT_BUNDLES_ENABLED or _RETRIEVE is None:
+        return None
+    with _THREAD_LOCK:
+        if _THREAD is None or not _THREAD.is_alive():
+            _THREAD = threading.Thread(target=_run, name="context-bundles", daemon=True)
+            _THREAD.start()
+    return _THREAD
+
+
+def _adds_little(category: str, query: str) -> bool:
+    keywords = tuple(k for k in _CATEGORIES.get(category, ()) if " " not in k) + tuple(category.split())
+    extra = [
+        token
+        for token in lexical_index.tokenize(query)
+        if len(token) > 2 and token not in _FILLER_TERMS and not token.startswith(keywords)
+    ]
+    return len(extra) <= CONTEXT_BUNDLE_MAX_EXTRA_TERMS
+
+
+def lookup(category: str, query: str, count: bool = True) -> Optional[Bundle]:
+    """Return the category bundle when ``query`` adds little beyond the category.
+
+    ``count=False`` leaves the request metrics alone (speculative lookups).
+    """
+
+    category = (category or "").strip().lower()
+    if not CONTEXT_BUNDLES_ENABLED or category not in _CATEGORIES:
+        return None
+    if not _adds_little(category, query):
+        if count:
+            _REQUESTS.inc(category=category, result="specific")
+        return None
+    bundle = _BUNDLES.get(category)
+    if count:
+        _REQUESTS.inc(category=category, result="hit" if bundle else "miss")
+    return bundle
+
+
+__all__ = [
+    "Bundle",
+    "configure",
+    "refresh_all",
+    "on_refresh",
+    "current",
+    "mark_stale",
+    "start_background_refresh",
+    "lookup",
+]
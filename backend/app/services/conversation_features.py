@@ -0,0 +1,203 @@
+"""Single-pass extraction of conversational cues (trend, body parts, recovery).
+
+The follow-up logic in ``main.py`` and the recovery agent used to run dozens of
+independent regex searches over the same text on every turn. The pattern tables
+now live here and are compiled once into combined alternations so a text is
+scanned a single time per feature group, with results cached per text.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+
+from . import metrics
+
+BODY_PART_KEYWORDS = {
+    "head", "face", "scalp", "eye", "ear", "nose", "mouth", "jaw",
+    "neck", "throat", "shoulder", "arm", "elbow", "wrist", "hand",
+    "finger", "chest", "rib", "abdomen", "stomach", "back", "hip",
+    "leg", "knee", "ankle", "foot", "toe", "skin"
+}
+
+# Checked in order: the first label with any match wins.
+TREND_PATTERNS = {
+    "worse": [
+        r"\bgetting worse\b",
+        r"\bworsening\b",
+        r"\bworse\b",
+        r"\bheavier\b",
+        r"\bincreasing\b",
+        r"\bspreading\b",
+        r"\bmore (?:pain|bleeding|swelling|numbness)\b",
+    ],
+    "better": [
+        r"\bgetting better\b",
+        r"\bbetter\b",
+        r"\bimproving\b",
+        r"\bimproved\b",
+        r"\bless (?:pain|bleeding|swelling)\b",
+        r"\blighter\b",
+        r"\bsubsiding\b",
+    ],
+    "same": [
+        r"\babout the same\b",
+        r"\bstaying the same\b",
+        r"\bno change\b",
+        r"\bunchanged\b",
+        r"\bstable\b",
+    ],
+}
+
+# Patterns indicating the user reports resolution of their symptoms.
+RECOVERY_PATTERNS: List[str] = [
+    r"\ball good now\b",
+    r"\ball better now\b",
+    r"\bfeeling (?:fine|okay|ok|better)(?: now| again)?\b",
+    r"\bfeels? (?:fine|okay|ok|better)(?: now| again)?\b",
+    r"\b(?:i'?m|i am|im) (?:feeling )?(?:fine|okay|ok|better)(?: now| again)?\b",
+    r"\bgetting better\b",
+    r"\b(?:i'?m|i am|im) getting better\b",
+    r"\bno(?: longer| more)? (?:hurting|hurt|pain|bleeding)(?: anymore)?\b",
+    r"\bnot (?:painful|hurting|bleeding) anymore\b",
+    r"\bpain (?:is )?gone\b",
+    r"\bbleeding (?:has )?stopped\b",
+    r"\b(?:pain|hurting|bleeding) (?:has )?stopped\b",
+    r"\bit'?s healed now\b",
+    r"\byes(?:,)? it (?:has )?stopped\b",
+    r"\byep(?:,)? it (?:has )?stopped\b",
+]
+
+CONFIRMATION_ONLY_PATTERNS: List[str] = [
+    r"\byes\b",
+    r"\byeah\b",
+    r"\byep\b",
+    r"\bthanks\b",
+    r"\bthank you\b",
+    r"\bappreciate it\b",
+]
+
+FEATURE_CACHE_SIZE = 2048
+
+
+def _labelled_alternation(groups: Dict[str, List[str]]) -> Tuple[Pattern[str], Dict[str, str]]:
+    """Compile ``{label: [patterns]}`` into one regex with a named group per label."""
+
+    group_to_label: Dict[str, str] = {}
+    branches: List[str] = []
+    for index, (label, patterns) in enumerate(groups.items()):
+        group = f"g{index}"
+        group_to_label[group] = label
+        branches.append(f"(?P<{group}>{'|'.join(f'(?:{p})' for p in patterns)})")
+    return re.compile("|".join(branches)), group_to_label
+
+
+_TREND_RE, _TREND_GROUPS = _labelled_alternation(TREND_PATTERNS)
+_TREND_PRIORITY = {label: rank for rank, label in enumerate(TREND_PATTERNS)}
+
+# Longest alternatives first so shared prefixes cannot shadow a longer part name.
+_BODY_PART_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(part) for part in sorted(BODY_PART_KEYWORDS, key=len, reverse=True))
+    + r")\b"
+)
+
+_RECOVERY_COMPILED: Tuple[Tuple[str, Pattern[str]], ...] = tuple(
+    (pattern, re.compile(pattern)) for pattern in RECOVERY_PATTERNS
+)
+# Cheap pre-filter: one scan decides whether any recovery pattern can match.
+_RECOVERY_ANY_RE = re.compile("|".join(f"(?:{p})" for p in RECOVERY_PATTERNS))
+_CONFIRMATION_RE = re.compile("|".join(f"(?:{p})" for p in CONFIRMATION_ONLY_PATTERNS))
+
+
+@dataclass(frozen=True)
+class ConversationFeatures:
+    """Cues extracted from one piece of (lower-cased) conversation text."""
+
+    trend: Optional[str]
+    body_parts: FrozenSet[str]
+    recovery_matches: Tuple[str, ...]
+
+    @property
+    def location_known(self) -> bool:
+        return bool(self.body_parts)
+
+    @property
+    def recovered(self) -> bool:
+        return bool(self.recovery_matches)
+
+
+_EMPTY = ConversationFeatures(trend=None, body_parts=frozenset(), recovery_matches=())
+
+
+def _scan_trend(lowered: str) -> Optional[str]:
+    best: Optional[str] = None
+    for match in _TREND_RE.finditer(lowered):
+        label = _TREND_GROUPS[match.lastgroup or ""]
+        if best is None or _TREND_PRIORITY[label] < _TREND_PRIORITY[best]:
+            best = label
+            if _TREND_PRIORITY[best] == 0:
+                break
+    return best
+
+
+def _scan_recovery(lowered: str) -> Tuple[str, ...]:
+    if not _RECOVERY_ANY_RE.search(lowered):
+        return ()
+    return tuple(pattern for pattern, compiled in _RECOVERY_COMPILED if compiled.search(lowered))
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def _extract_lowered(lowered: str) -> ConversationFeatures:
+    return ConversationFeatures(
+        trend=_scan_trend(lowered),
+        body_parts=frozenset(_BODY_PART_RE.findall(lowered)),
+        recovery_matches=_scan_recovery(lowered),
+    )
+
+
+def extract_features(text: Optional[str]) -> ConversationFeatures:
+    """Return trend, body-part and recovery cues for ``text`` (cached per text)."""
+
+    if not text:
+        return _EMPTY
+    return _extract_lowered(text.lower())
+
+
+def is_confirmation_only(text: Optional[str]) -> bool:
+    """Return True when ``text`` is just a short acknowledgement such as "yes"."""
+
+    return bool(_CONFIRMATION_RE.fullmatch((text or "").lower().strip()))
+
+
+def cache_info():
+    """Expose the extractor's cache statistics."""
+
+    return _extract_lowered.cache_info()
+
+
+def _cache_samples() -> Dict[Tuple[str, ...], float]:
+    info = cache_info()
+    return {("hit",): info.hits, ("miss",): info.misses}
+
+
+metrics.callback(
+    "firstaid_feature_cache_requests_total",
+    "Conversation feature extractor cache lookups by result.",
+    ("result",),
+    _cache_samples,
+    kind="counter",
+)
+
+
+__all__ = [
+    "BODY_PART_KEYWORDS",
+    "TREND_PATTERNS",
+    "RECOVERY_PATTERNS",
+    "CONFIRMATION_ONLY_PATTERNS",
+    "ConversationFeatures",
+    "extract_features",
+    "is_confirmation_only",
+    "cache_info",
+]
@@ -0,0 +1,297 @@
+"""Nearest-facility lookups over a memory-mapped k-d tree.
+
+``FACILITY_INDEX_PATH`` points at a binary file written by
+``python -m tools.build_facility_index`` from a CSV or JSONL list of
+facilities (``name``, ``lat``, ``lng``, ``kind``). Facilities are stored as
+unit vectors in an implicit, balanced k-d tree: the node for a range of
+positions is its middle element, split on the axis recorded for it, and
+ranges of at most ``leaf_size`` facilities are scanned linearly. Straight-line
+(chord) distance between unit vectors orders points exactly like great-circle
+distance, so there are no special cases at the poles or the date line, and
+query cost does not depend on how unevenly facilities are spread.
+
+The file is opened with ``mmap`` and read through ``memoryview`` casts, so
+nothing is copied into the Python heap: every worker process maps the same
+page-cache pages.
+
+Layout (little-endian, sections 8-byte aligned)::
+
+    header      magic, version, count, leaf size, names size
+    xyz         float64[3 * count] unit vectors, in tree order
+    lat, lng    float64[count]
+    axes        uint8[count]       split axis of each internal node
+    name_starts uint32[count + 1]  offsets into the names blob
+    kinds       uint8[count]       index into ``KINDS``
+    names       utf-8
+"""
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+import logging
+import math
+import mmap
+import struct
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..config import FACILITY_INDEX_PATH
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"FAIDKDT1"
+FORMAT_VERSION = 1
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_LEAF_SIZE = 12
+KINDS = ("hospital", "urgent_care", "clinic", "other")
+
+_HEADER = struct.Struct("<8sIIII")
+_HEADER_SIZE = 64
+
+
+class Facility(NamedTuple):
+    name: str
+    kind: str
+    lat: float
+    lng: float
+    distance_km: float
+
+
+def _unit_vector(lat: float, lng: float) -> Tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lng)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi)
+
+
+def _chord_to_km(chord_squared: float) -> float:
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_squared) / 2.0))
+
+
+def _km_to_chord_squared(km: float) -> float:
+    angle = min(math.pi, km / EARTH_RADIUS_KM)
+    return (2.0 * math.sin(angle / 2.0)) ** 2
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _tree_order(coords: Tuple[List[float], List[float], List[float]], leaf_size: int) -> Tuple[List[int], bytearray]:
+    """Arrange positions so every range's middle element splits it on its widest axis."""
+
+    count = len(coords[0])
+    order = list(range(count))
+    axes = bytearray(count)
+    ranges = [(0, count)]
+    while ranges:
+        lo, hi = ranges.pop()
+        if hi - lo <= leaf_size:
+            continue
+        members = order[lo:hi]
+        spreads = [max(values[i] for i in members) - min(values[i] for i in members) for values in coords]
+        axis = spreads.index(max(spreads))
+        order[lo:hi] = sorted(members, key=coords[axis].__getitem__)
+        mid = (lo + hi) // 2
+        axes[mid] = axis
+        ranges.extend(((lo, mid), (mid + 1, hi)))
+    return order, axes
+
+
+def write(records: Iterable[Dict[str, Any]], path: str, leaf_size: int = DEFAULT_LEAF_SIZE) -> int:
+    """Write the index file for ``records``; returns the number of facilities."""
+
+    lats, lngs, kinds, names = [], [], [], []
+    for record in records:
+        lat, lng = float(record["lat"]), float(record["lng"])
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            raise ValueError(f"coordinates out of range for {record.get('name')!r}: {lat}, {lng}")
+        kind = str(record.get("kind") or "other").strip().lower().replace(" ", "_")
+        lats.append(lat)
+        lngs.append(lng)
+        kinds.append(KINDS.index(kind) if kind in KINDS else len(KINDS) - 1)
+        names.append(str(record.get("name") or "").encode("utf-8"))
+
+    vectors = [_unit_vector(lat, lng) for lat, lng in zip(lats, lngs)]
+    coords = ([v[0] for v in vectors], [v[1] for v in vectors], [v[2] for v in vectors])
+    order, axes = _tree_order(coords, max(1, leaf_size))
+
+    xyz = array("d")
+    name_starts, blob = array("I", [0]), bytearray()
+    for position in order:
+        xyz.extend(vectors[position])
+        blob.extend(names[position])
+        name_starts.append(len(blob))
+    sections = (
+        xyz,
+        array("d", (lats[i] for i in order)),
+        array("d", (lngs[i] for i in order)),
+        bytes(axes),
+        name_starts,
+        bytes(kinds[i] for i in order),
+        bytes(blob),
+    )
+    with open(path, "wb") as handle:
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(order), max(1, leaf_size), len(blob))
+        handle.write(header.ljust(_HEADER_SIZE, b"\0"))
+        for section in sections:
+            handle.write(b"\0" * (_align(handle.tell()) - handle.tell()))
+            handle.write(section)
+    return len(order)
+
+
+def iter_records(path: str) -> Iterable[Dict[str, Any]]:
+    """Yield facility records from a CSV (header row) or JSONL file."""
+
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(handle):
+                yield {
+                    "name": row.get("name", ""),
+                    "kind": row.get("kind") or row.get("type") or "other",
+                    "lat": row.get("lat") or row.get("latitude"),
+                    "lng": row.get("lng") or row.get("lon") or row.get("longitude"),
+                }
+            return
+        for raw in handle:
+            if raw.strip():
+                yield json.loads(raw)
+
+
+class FacilityIndex:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        try:
+            self._attach(path)
+        except Exception:
+            self._release()  # the map cannot close while views over it exist
+            raise
+
+    def _attach(self, path: str) -> None:
+        if len(self._map) < _HEADER_SIZE:
+            raise ValueError(f"{path} is not a facility index")
+        magic, version, count, leaf_size, names_size = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} facility index")
+        view = memoryview(self._map)
+        self._views.append(view)
+        offset = _HEADER_SIZE
+
+        def section(fmt: str, length: int) -> memoryview:
+            nonlocal offset
+            offset = _align(offset)
+            size = length * struct.calcsize(fmt)
+            if offset + size > len(self._map):
+                raise ValueError(f"{path} is truncated")
+            part = view[offset:offset + size].cast(fmt)
+            self._views.append(part)
+            offset += size
+            return part
+
+        self.count = count
+        self.leaf_size = leaf_size
+        self._xyz = section("d", 3 * count)
+        self._lats = section("d", count)
+        self._lngs = section("d", count)
+        self._axes = section("B", count)
+        self._name_starts = section("I", count + 1)
+        self._kinds = section("B", count)
+        self._names = section("B", names_size)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _facility(self, position: int, chord_squared: float) -> Facility:
+        name = bytes(self._names[self._name_starts[position]:self._name_starts[position + 1]]).decode("utf-8")
+        return Facility(
+            name,
+            KINDS[self._kinds[position]],
+            self._lats[position],
+            self._lngs[position],
+            round(_chord_to_km(chord_squared), 3),
+        )
+
+    def nearest(self, lat: float, lng: float, k: int = 3, max_km: Optional[float] = None) -> List[Facility]:
+        """The ``k`` closest facilities (great-circle distance), nearest first."""
+
+        if k <= 0 or not self.count:
+            return []
+        query = _unit_vector(lat, lng)
+        qx, qy, qz = query
+        limit = _km_to_chord_squared(max_km) if max_km is not None else 4.0
+        xyz, axes, leaf_size = self._xyz, self._axes, self.leaf_size
+        best: List[Tuple[float, int]] = []  # max-heap of (-chord², position)
+        worst = limit
+        stack = [(0.0, 0, self.count)]  # (lower bound, lo, hi)
+
+        while stack:
+            bound, lo, hi = stack.pop()
+            if bound > worst:
+                continue
+            if hi - lo > leaf_size:
+                mid = (lo + hi) // 2
+                positions = (mid,)
+                axis = axes[mid]
+                gap = query[axis] - xyz[3 * mid + axis]
+                far_bound = max(bound, gap * gap)
+                # Visit the query's side first (pushed last); the other side only
+                # matters if the splitting plane is closer than the current k-th hit.
+                if gap < 0:
+                    stack.append((far_bound, mid + 1, hi))
+                    stack.append((bound, lo, mid))
+                else:
+                    stack.append((far_bound, lo, mid))
+                    stack.append((bound, mid + 1, hi))
+            else:
+                positions = range(lo, hi)
+            for position in positions:
+                base = 3 * position
+                dx, dy, dz = xyz[base] - qx, xyz[base + 1] - qy, xyz[base + 2] - qz
+                chord = dx * dx + dy * dy + dz * dz
+                if chord > worst:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-chord, position))
+                    if len(best) == k:
+                        worst = min(limit, -best[0][0])
+                else:
+                    heapq.heapreplace(best, (-chord, position))
+                    worst = -best[0][0]
+        return [self._facility(position, -negative) for negative, position in sorted(best, reverse=True)]
+
+    def _release(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._map.close()
+
+    def close(self) -> None:
+        self._release()
+
+
+@lru_cache(maxsize=1)
+def get_index() -> Optional[FacilityIndex]:
+    """Map ``FACILITY_INDEX_PATH`` once; None when unset or unreadable."""
+
+    if not FACILITY_INDEX_PATH:
+        return None
+    try:
+        index = FacilityIndex(FACILITY_INDEX_PATH)
+    except (OSError, ValueError) as exc:
+        LOGGER.warning("Facility index unavailable (%s): %s", FACILITY_INDEX_PATH, exc)
+        return None
+    LOGGER.info("Facility index mapped from %s: %d facilities", FACILITY_INDEX_PATH, len(index))
+    return index
+
+
+def nearest(lat: float, lng: float, k: int = 3, max_km: Optional[float] = None) -> List[Facility]:
+    index = get_index()
+    if index is None:
+        return []
+    return index.nearest(lat, lng, k, max_km)
+
+
+__all__ = ["Facility", "FacilityIndex", "KINDS", "write", "iter_records", "get_index", "nearest"]
@@ -0,0 +1,164 @@
+"""Generation profiles chosen from the triage severity and category.
+
+A profile fixes the model, completion cap, temperature, context budget,
+retrieval depth and timeout of one ``instruction_agent.generate`` call, so a
+choking or anaphylaxis turn gets a small, fast, tightly bounded completion
+(and the deterministic fallback steps soon after the timeout) while a
+low-severity turn can afford a richer one. Profiles and the rules that pick
+them live in ``generation_profiles.yaml`` (``GENERATION_PROFILES_PATH``
+overrides the location); a missing or malformed file falls back to a single
+profile matching the historical settings.
+
+Latency per profile is exported as ``firstaid_generation_profile_seconds``.
+"""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from ..config import GENERATION_PROFILES_PATH
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "generation_profiles.yaml"
+
+PROFILE_SECONDS = metrics.histogram(
+    "firstaid_generation_profile_seconds",
+    "Instruction generation latency by profile and outcome (llm, fallback).",
+    ("profile", "outcome"),
+)
+SELECTED = metrics.counter(
+    "firstaid_generation_profile_selected_total",
+    "Generation profile selections by profile.",
+    ("profile",),
+)
+
+
+class Profile(NamedTuple):
+    name: str
+    models: Dict[str, str]
+    max_tokens: Optional[int]
+    temperature: float
+    context_chars: int
+    top_k: int
+    timeout: float
+
+    def model(self, provider: str) -> str:
+        return self.models.get(provider) or DEFAULT_PROFILE.models[provider]
+
+
+DEFAULT_PROFILE = Profile(
+    name="standard",
+    models={"groq": "llama-3.1-70b-versatile", "openai": "gpt-4o-mini"},
+    max_tokens=None,
+    temperature=0.2,
+    context_chars=0,
+    top_k=4,
+    timeout=20.0,
+)
+
+
+class _Rule(NamedTuple):
+    categories: frozenset
+    severities: frozenset
+    profile: str
+
+
+class _Table(NamedTuple):
+    profiles: Dict[str, Profile]
+    rules: Tuple[_Rule, ...]
+    default: Profile
+
+
+def _path() -> Path:
+    return Path(GENERATION_PROFILES_PATH) if GENERATION_PROFILES_PATH else DEFAULT_PATH
+
+
+def _load_document(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        LOGGER.warning("Generation profiles missing at %s; using the default profile", path)
+        return {}
+    import yaml
+
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            data = yaml.safe_load(handle) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        LOGGER.warning("Unable to load generation profiles: %s", exc)
+        return {}
+    if not isinstance(data, dict):
+        LOGGER.warning("Generation profiles must be a mapping; using the default profile")
+        return {}
+    return data
+
+
+def _parse_profile(name: str, raw: Dict[str, Any]) -> Profile:
+    models = raw.get("model") or {}
+    if isinstance(models, str):
+        models = {"groq": models, "openai": models}
+    max_tokens = raw.get("max_tokens")
+    return Profile(
+        name=name,
+        models={str(k): str(v) for k, v in models.items()},
+        max_tokens=int(max_tokens) if max_tokens else None,
+        temperature=float(raw.get("temperature", DEFAULT_PROFILE.temperature)),
+        context_chars=int(raw.get("context_chars", 0) or 0),
+        top_k=max(1, int(raw.get("top_k", DEFAULT_PROFILE.top_k))),
+        timeout=float(raw.get("timeout", DEFAULT_PROFILE.timeout)),
+    )
+
+
+def _lowered(values: Any) -> frozenset:
+    return frozenset(str(v).strip().lower() for v in values or () if v)
+
+
+@lru_cache(maxsize=1)
+def load_profiles() -> _Table:
+    """Parse the profiles file once; invalid entries are skipped with a warning."""
+
+    data = _load_document(_path())
+    profiles: Dict[str, Profile] = {}
+    for name, raw in (data.get("profiles") or {}).items():
+        try:
+            profiles[str(name)] = _parse_profile(str(name), raw or {})
+        except (TypeError, ValueError, AttributeError) as exc:
+            LOGGER.warning("Ignoring generation profile %r: %s", name, exc)
+    rules: List[_Rule] = []
+    for raw in data.get("rules") or ():
+        if not isinstance(raw, dict) or raw.get("profile") not in profiles:
+            LOGGER.warning("Ignoring generation profile rule %r", raw)
+            continue
+        rules.append(_Rule(_lowered(raw.get("categories")), _lowered(raw.get("severities")), raw["profile"]))
+    default = profiles.get(str(data.get("default") or ""), DEFAULT_PROFILE)
+    return _Table(profiles, tuple(rules), default)
+
+
+def select(severity: str = "", category: str = "", count: bool = True) -> Profile:
+    """The first profile whose rule matches ``category`` or ``severity``."""
+
+    table = load_profiles()
+    severity, category = (severity or "").strip().lower(), (category or "").strip().lower()
+    profile = table.default
+    for rule in table.rules:
+        if (category and category in rule.categories) or (severity and severity in rule.severities):
+            profile = table.profiles[rule.profile]
+            break
+    if count:
+        SELECTED.inc(profile=profile.name)
+    return profile
+
+
+def fit_context(text: str, budget: int) -> str:
+    """Trim ``text`` to ``budget`` characters, preferring a paragraph boundary."""
+
+    if budget <= 0 or len(text) <= budget:
+        return text
+    cut = text.rfind("\n\n", 0, budget)
+    if cut < budget // 2:
+        cut = text.rfind(" ", 0, budget)
+    return text[:cut if cut > 0 else budget].rstrip()
+
+
+__all__ = ["Profile", "DEFAULT_PROFILE", "PROFILE_SECONDS", "load_profiles", "select", "fit_context"]
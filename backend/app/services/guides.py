@@ -0,0 +1,168 @@
+"""Precomputed first-aid guides for ``GET /api/guides/{category}``.
+
+Most traffic is effectively "show me the burn steps", which needs no model
+call. Every triage and scenario category gets a guide built from the
+deterministic steps, checked by the verification agent (guides that fail are
+not served), and serialised once to JSON with a strong ``ETag`` (a hash of the
+body). The endpoint then only compares ``If-None-Match`` and returns the
+stored bytes, so browsers and CDNs can cache guides and revalidate with
+``304 Not Modified``.
+
+Guides are rendered during warmup and again after each context-bundle refresh
+(which follows knowledge-base changes), so their ``sources`` track the
+knowledge base. The body holds no timestamps: an unchanged guide keeps the
+same ETag across renders, restarts and workers.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from . import context_bundles, mcp_server, metrics
+
+LOGGER = logging.getLogger(__name__)
+
+_STEP_NUMBER = re.compile(r"^\s*\d+[).]\s*")
+# A step telling the reader to call for help: the guide must then say so too.
+_CALLS_EMERGENCY = re.compile(r"\bcall\b[^.]*\b(?:emergency services|emergency number|ambulance|poison control)\b", re.I)
+
+_REQUESTS = metrics.counter(
+    "firstaid_guide_requests_total",
+    "Guide requests by result (ok, not_modified, not_found).",
+    ("result",),
+)
+_REJECTED = metrics.counter(
+    "firstaid_guides_unverified_total",
+    "Guides withheld because verification failed, by category.",
+    ("category",),
+)
+
+
+class Rendered(NamedTuple):
+    body: bytes
+    etag: str
+
+
+_CATEGORIES: List[str] = []
+_STEPS: Optional[Callable[[str], str]] = None
+_VERIFY: Optional[Callable[[str], Dict]] = None
+_SEVERITY: Optional[Callable[[str], str]] = None
+_GUIDES: Dict[str, Rendered] = {}
+_INDEX: Optional[Rendered] = None
+_LOCK = threading.Lock()
+
+
+def configure(
+    categories: Sequence[str],
+    steps: Callable[[str], str],
+    verify: Callable[[str], Dict],
+    severity: Callable[[str], str],
+) -> None:
+    """Set the categories and the step, verification and severity functions."""
+
+    global _STEPS, _VERIFY, _SEVERITY
+    _CATEGORIES[:] = list(dict.fromkeys(normalize(c) for c in categories if c))
+    _STEPS, _VERIFY, _SEVERITY = steps, verify, severity
+
+
+def normalize(category: str) -> str:
+    """``Allergic-Reaction`` and ``allergic_reaction`` both name ``allergic reaction``."""
+
+    return " ".join((category or "").lower().replace("-", " ").replace("_", " ").split())
+
+
+def slug(category: str) -> str:
+    return normalize(category).replace(" ", "-")
+
+
+def _render(document: Dict) -> Rendered:
+    body = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return Rendered(body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+
+
+def _guide(category: str, emergency: Dict) -> Optional[Dict]:
+    text = _STEPS(category)
+    verification = _VERIFY(text) if _VERIFY is not None else {"passed": True}
+    if not verification.get("passed"):
+        LOGGER.warning("Guide for %s failed verification: %s", category, verification.get("policy_flags"))
+        _REJECTED.inc(category=category)
+        return None
+    severity = _SEVERITY(category) if _SEVERITY is not None else "low"
+    steps = [_STEP_NUMBER.sub("", line).strip() for line in text.splitlines() if line.strip()]
+    bundle = context_bundles.current(category)
+    return {
+        "category": category,
+        "slug": slug(category),
+        "severity": severity,
+        "call_emergency_services": severity in {"high", "severe"} or any(_CALLS_EMERGENCY.search(s) for s in steps),
+        "steps": steps,
+        "emergency_numbers": emergency,
+        "sources": list(bundle.sources) if bundle else [],
+        "verified": True,
+    }
+
+
+def render_all() -> int:
+    """Render every guide and swap them in at once; returns how many are served."""
+
+    global _GUIDES, _INDEX
+    if _STEPS is None:
+        return 0
+    with _LOCK:
+        numbers = mcp_server.get_emergency_numbers()
+        emergency = {"country": numbers["country"], **numbers.get("numbers", {})}
+        guides: Dict[str, Rendered] = {}
+        listing = []
+        for category in _CATEGORIES:
+            try:
+                guide = _guide(category, emergency)
+            except Exception as exc:
+                LOGGER.warning("Unable to render guide for %s: %s", category, exc)
+                guide = None
+            if guide is None:
+                continue
+            guides[category] = rendered = _render(guide)
+            listing.append(
+                {"category": category, "slug": guide["slug"], "severity": guide["severity"], "etag": rendered.etag}
+            )
+        _GUIDES, _INDEX = guides, _render({"guides": listing})
+    LOGGER.info("Rendered %d first-aid guides", len(guides))
+    return len(guides)
+
+
+def _ensure_rendered() -> None:
+    if _INDEX is None:
+        render_all()
+
+
+def get(category: str) -> Optional[Rendered]:
+    _ensure_rendered()
+    return _GUIDES.get(normalize(category))
+
+
+def index() -> Optional[Rendered]:
+    _ensure_rendered()
+    return _INDEX
+
+
+def not_modified(etag: str, if_none_match: Optional[str]) -> bool:
+    """RFC 9110 ``If-None-Match`` check (weak comparison, ``*`` matches anything)."""
+
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def count(result: str) -> None:
+    _REQUESTS.inc(result=result)
+
+
+__all__ = ["Rendered", "configure", "normalize", "slug", "render_all", "get", "index", "not_modified", "count"]
@@ -0,0 +1,179 @@
+"""Idempotent replay of retried ``/api/chat/continue`` requests.
+
+A request is keyed on its ``Idempotency-Key`` header or, without one, on its
+``session_id`` plus a hash of the message list (requests with neither are not
+deduplicated: identical first messages from different people must not share
+an answer). The first request with a key runs the pipeline; its result is kept
+for ``IDEMPOTENCY_TTL_SECONDS`` and returned to retries without rerunning
+anything. A retry that arrives while the original is still running waits for
+it instead of starting its own computation. Only successful results are kept:
+a retry after an error or a refusal runs again.
+
+Reusing an ``Idempotency-Key`` with a different message list raises
+:class:`Conflict` (HTTP 422). Entries live in this worker's memory and are all
+touched from the event loop, so no locking is needed. With a cross-process
+``CACHE_BACKEND`` completed results are also written to the shared cache, so a
+retry that lands on another worker is replayed too (one still running in
+another worker is not joined: the retry computes it again).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from ..config import IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS
+from . import cache, cancellation, metrics
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_REQUESTS = metrics.counter(
+    "firstaid_idempotency_requests_total",
+    "Keyed chat requests by outcome (miss, replay, joined, conflict).",
+    ("outcome",),
+)
+_ENTRIES = metrics.gauge("firstaid_idempotency_entries", "Idempotency entries held by this worker.")
+
+
+class Conflict(Exception):
+    """The idempotency key was already used for a different request."""
+
+
+class _Entry(NamedTuple):
+    fingerprint: str
+    future: "asyncio.Future[Any]"
+    expires_at: float
+
+
+def fingerprint(messages: List[Any]) -> str:
+    """Stable hash of a message list (dicts or pydantic models)."""
+
+    plain = [m.dict() if hasattr(m, "dict") else m for m in messages]
+    encoded = json.dumps(plain, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def key_for(header_key: Optional[str], session_id: Optional[str], request_fingerprint: str) -> Optional[str]:
+    """The store key for a request, or None when it cannot be deduplicated safely."""
+
+    header_key = (header_key or "").strip()
+    if header_key:
+        return f"key:{session_id or ''}:{header_key[:200]}"
+    if session_id:
+        return f"session:{session_id}:{request_fingerprint}"
+    return None
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float, max_entries: int, shared: Optional[cache.Cache] = None) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        # Oldest first; in-flight entries have an infinite expiry and are only
+        # dropped for capacity (their waiters keep the future alive).
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[key]
+        _ENTRIES.set(len(self._entries))
+
+    async def run(
+        self, key: str, request_fingerprint: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        """Run ``compute`` once per key; returns ``(result, outcome)``.
+
+        ``outcome`` is ``miss`` for the call that computed the result,
+        ``joined`` for one that waited on it and ``replay`` for one served
+        from the store.
+        """
+
+        while True:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                break
+            if entry.fingerprint != request_fingerprint:
+                _REQUESTS.inc(outcome="conflict")
+                raise Conflict(key)
+            outcome = "replay" if entry.future.done() else "joined"
+            try:
+                result = await asyncio.shield(entry.future)
+            except asyncio.CancelledError:
+                if entry.future.cancelled():
+                    continue  # the original was abandoned; compute it here instead
+                raise
+            _REQUESTS.inc(outcome=outcome)
+            return result, outcome
+
+        self._evict(now)
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._entries[key] = _Entry(request_fingerprint, future, float("inf"))
+        _ENTRIES.set(len(self._entries))
+        try:
+            result, outcome = await self._compute_or_replay(key, request_fingerprint, compute)
+        except BaseException as exc:
+            if self._entries.get(key, (None, None))[1] is future:
+                del self._entries[key]
+                _ENTRIES.set(len(self._entries))
+            if isinstance(exc, (asyncio.CancelledError, cancellation.Cancelled)):
+                future.cancel()  # waiters compute it themselves
+            else:
+                # Requests already waiting on this one share its error.
+                future.set_exception(exc)
+                future.exception()  # retrieved, even when nobody was waiting
+            raise
+        future.set_result(result)
+        if self._entries.get(key, (None, None))[1] is future:
+            self._entries[key] = _Entry(request_fingerprint, future, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+        return result, outcome
+
+    async def _compute_or_replay(
+        self, key: str, request_fingerprint: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        loop = asyncio.get_running_loop()
+        if self.shared is not None:
+            stored = await loop.run_in_executor(None, self.shared.get, key)
+            if stored is not None:
+                if stored.get("fingerprint") != request_fingerprint:
+                    _REQUESTS.inc(outcome="conflict")
+                    raise Conflict(key)
+                _REQUESTS.inc(outcome="replay")
+                return stored.get("result"), "replay"
+        _REQUESTS.inc(outcome="miss")
+        result = await compute()
+        if self.shared is not None:
+            record = {"fingerprint": request_fingerprint, "result": result}
+            await loop.run_in_executor(None, self.shared.set, key, record)
+        return result, "miss"
+
+
+_STORE: Optional[IdempotencyStore] = None
+
+
+def store() -> IdempotencyStore:
+    global _STORE
+    if _STORE is None:
+        shared = cache.Cache("idempotency", IDEMPOTENCY_TTL_SECONDS) if cache.is_shared() else None
+        _STORE = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES, shared)
+    return _STORE
+
+
+__all__ = ["REPLAYED_HEADER", "Conflict", "IdempotencyStore", "fingerprint", "key_for", "store"]
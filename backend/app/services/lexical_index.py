@@ -0,0 +1,296 @@
+"""In-process BM25 index over the first-aid knowledge base.
+
+The index is built from ``KNOWLEDGE_BASE_PATH`` (JSONL, one ``{"_id", "text",
+...}`` document per line, chunked like the vector store) or loaded from a
+prebuilt ``LEXICAL_INDEX_PATH`` written by ``python -m tools.build_lexical_index``.
+It is loaded by a warmup phase and swapped atomically when the source file
+changes (see :func:`refresh_if_changed`).
+
+Retrieval uses it two ways:
+
+* when the best lexical hit is strong and clearly ahead of the first result
+  that would not be served (:func:`is_decisive`), the lexical results are
+  served directly, skipping the embeddings call and the
+  vector search;
+* otherwise lexical and vector results are merged with reciprocal rank fusion
+  (:func:`fuse`).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..config import (
+    KNOWLEDGE_BASE_PATH,
+    LEXICAL_DECISIVE_MARGIN,
+    LEXICAL_INDEX_PATH,
+    LEXICAL_MIN_SCORE,
+)
+from ..utils import chunk_text
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+CHUNK_TOKENS = 400
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from has have how i if in into is it its "
+    "me my of on or our should so that the their them then there these they this to was we what "
+    "when where which while who will with you your".split()
+)
+
+RETRIEVALS = metrics.counter(
+    "firstaid_retrieval_total",
+    "Context retrievals by mode (lexical, hybrid, vector).",
+    ("mode",),
+)
+CALLS_AVOIDED = metrics.counter(
+    "firstaid_retrieval_calls_avoided_total",
+    "Upstream calls skipped because lexical results were decisive.",
+    ("call",),
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in _STOPWORDS:
+            continue
+        # Light plural folding so "burns" matches "burn".
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class Hit(NamedTuple):
+    score: float
+    document: Dict[str, Any]
+
+
+class BM25Index:
+    """Postings are per-term ``array('I')`` pairs of document ids and term frequencies."""
+
+    def __init__(
+        self,
+        documents: List[Dict[str, Any]],
+        doc_lengths: List[int],
+        postings: Dict[str, Tuple[array, array]],
+    ) -> None:
+        self.documents = documents
+        self.doc_lengths = doc_lengths
+        self.postings = postings
+        count = len(documents)
+        self.average_length = (sum(doc_lengths) / count) if count else 0.0
+        self.idf = {
+            term: math.log(1.0 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, documents: Iterable[Dict[str, Any]]) -> "BM25Index":
+        docs: List[Dict[str, Any]] = []
+        lengths: List[int] = []
+        postings: Dict[str, Tuple[array, array]] = {}
+        for document in documents:
+            doc_id = len(docs)
+            tokens = tokenize(document.get("text", ""))
+            docs.append(document)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array("I"), array("I"))
+                entry[0].append(doc_id)
+                entry[1].append(tf)
+        return cls(docs, lengths, postings)
+
+    def search(self, query: str, top_k: int = 4) -> List[Hit]:
+        if not self.documents:
+            return []
+        scores: Dict[int, float] = {}
+        lengths = self.doc_lengths
+        norm = BM25_K1 * (1 - BM25_B)
+        slope = BM25_K1 * BM25_B / (self.average_length or 1.0)
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in zip(*entry):
+                denominator = tf + norm + slope * lengths[doc_id]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / denominator
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [Hit(score, self.documents[doc_id]) for doc_id, score in ranked]
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "version": FORMAT_VERSION,
+            "documents": self.documents,
+            "doc_lengths": self.doc_lengths,
+            "postings": {term: [list(ids), list(tfs)] for term, (ids, tfs) in self.postings.items()},
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "BM25Index":
+        if payload.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported lexical index version {payload.get('version')}")
+        postings = {
+            term: (array("I", ids), array("I", tfs))
+            for term, (ids, tfs) in payload["postings"].items()
+        }
+        return cls(payload["documents"], payload["doc_lengths"], postings)
+
+
+def iter_knowledge_base(path: str) -> Iterable[Dict[str, Any]]:
+    """Yield chunked documents (``_id``, ``text`` plus source fields) from a JSONL file."""
+
+    with open(path, "r", encoding="utf-8") as handle:
+        for line_number, raw in enumerate(handle, 1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            record = json.loads(raw)
+            text = str(record.get("text") or "")
+            if not text:
+                continue
+            base_id = str(record.get("_id") or f"kb-{line_number}")
+            chunks = chunk_text(text, CHUNK_TOKENS)
+            for index, chunk in enumerate(chunks):
+                document = {k: v for k, v in record.items() if k not in ("text", "$vector", "embedding")}
+                document["_id"] = base_id if len(chunks) == 1 else f"{base_id}#{index}"
+                document["text"] = chunk
+                yield document
+
+
+def save(index: BM25Index, path: str) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as handle:
+        json.dump(index.to_payload(), handle, separators=(",", ":"))
+
+
+def load(path: str) -> BM25Index:
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        return BM25Index.from_payload(json.load(handle))
+
+
+_INDEX: Optional[BM25Index] = None
+_SOURCE_MTIME = 0.0
+_LOCK = threading.Lock()
+
+
+def _source_path() -> str:
+    if LEXICAL_INDEX_PATH and os.path.exists(LEXICAL_INDEX_PATH):
+        return LEXICAL_INDEX_PATH
+    return KNOWLEDGE_BASE_PATH
+
+
+def _load_source(path: str) -> BM25Index:
+    if path == LEXICAL_INDEX_PATH:
+        return load(path)
+    return BM25Index.build(iter_knowledge_base(path))
+
+
+def refresh_if_changed() -> bool:
+    """(Re)load the index when its source file is new or modified."""
+
+    global _INDEX, _SOURCE_MTIME
+    path = _source_path()
+    if not path:
+        return False
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+    if _INDEX is not None and mtime == _SOURCE_MTIME:
+        return False
+    with _LOCK:
+        if _INDEX is not None and mtime == _SOURCE_MTIME:
+            return False
+        try:
+            index = _load_source(path)
+        except (OSError, ValueError, KeyError) as exc:
+            LOGGER.warning("Unable to load lexical index from %s: %s", path, exc)
+            return False
+        _INDEX, _SOURCE_MTIME = index, mtime
+    LOGGER.info("Lexical index loaded from %s: %d chunks, %d terms", path, len(index), len(index.postings))
+    return True
+
+
+def get_index() -> Optional[BM25Index]:
+    return _INDEX
+
+
+def version() -> float:
+    """Modification time of the loaded source file (0 when no index is loaded)."""
+
+    return _SOURCE_MTIME if _INDEX is not None else 0.0
+
+
+def search(query: str, top_k: int = 4) -> List[Hit]:
+    """BM25 search; returns ``top_k + 1`` hits so callers can judge the margin."""
+
+    index = _INDEX
+    if index is None:
+        return []
+    return index.search(query, top_k + 1)
+
+
+def is_decisive(hits: List[Hit], top_k: int = 4) -> bool:
+    """True when the best hit is strong and clearly ahead of the first excluded one.
+
+    ``hits`` comes from :func:`search`, which returns one result beyond
+    ``top_k``; when nothing else matched, the served set is complete.
+    """
+
+    if not hits or hits[0].score < LEXICAL_MIN_SCORE:
+        return False
+    runner_up = hits[top_k].score if len(hits) > top_k else 0.0
+    return (hits[0].score - runner_up) / hits[0].score >= LEXICAL_DECISIVE_MARGIN
+
+
+def fuse(*rankings: List[Dict[str, Any]], top_k: int = 4) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion of ranked document lists, keyed by ``_id``."""
+
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = str(document.get("_id") or id(document))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            documents.setdefault(key, document)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [documents[key] for key in ordered]
+
+
+__all__ = [
+    "BM25Index",
+    "Hit",
+    "RETRIEVALS",
+    "CALLS_AVOIDED",
+    "tokenize",
+    "iter_knowledge_base",
+    "save",
+    "load",
+    "refresh_if_changed",
+    "get_index",
+    "version",
+    "search",
+    "is_decisive",
+    "fuse",
+]
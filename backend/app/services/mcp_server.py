@@ -1,16 +1,54 @@
 # services/mcp_server.py
 # Placeholder "MCP server" adapter for assignment: exposes tool-like functions.
 # In a real MCP server you'd run a separate process; here we simulate calls.
-import requests
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
 
-def get_emergency_numbers(country_code: str = "LK") -> dict:
-    # Placeholder: static map for demo; extend with a real API if needed.
-    defaults = {"POLICE": "119", "AMBULANCE": "1990", "FIRE": "110"}
-    return {"country": country_code, "numbers": defaults}
+from ..config import DEFAULT_COUNTRY_CODE, DEFAULT_LOCATION_LAT, DEFAULT_LOCATION_LNG, FACILITY_NEAREST_K
+from . import facility_index
+
+EMERGENCY_NUMBERS_PATH = Path(__file__).resolve().parent.parent / "data" / "emergency_numbers.json"
+
+
+@lru_cache(maxsize=1)
+def _emergency_directory() -> Dict[str, dict]:
+    # Loaded once and keyed by ISO country code; "" holds the fallback entry.
+    with EMERGENCY_NUMBERS_PATH.open("r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    directory = {"": {"numbers": dict(data["default"]), "source": "default"}}
+    for code, entry in data["countries"].items():
+        numbers = {service: number for service, number in entry.items() if service != "name"}
+        directory[code.upper()] = {"name": entry.get("name", code), "numbers": numbers, "source": "directory"}
+    return directory
+
+
+def get_emergency_numbers(country_code: str = DEFAULT_COUNTRY_CODE) -> dict:
+    code = (country_code or "").strip().upper()
+    directory = _emergency_directory()
+    return {"country": code, **directory.get(code, directory[""])}
+
+
+def get_location_from_maps(
+    query: str,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    k: int = FACILITY_NEAREST_K,
+) -> dict:
+    # Without a client location, fall back to the configured default (previously fixed coordinates).
+    located = lat is not None and lng is not None
+    if not located:
+        lat, lng = DEFAULT_LOCATION_LAT, DEFAULT_LOCATION_LNG
+    facilities = [facility._asdict() for facility in facility_index.nearest(lat, lng, k)]
+    return {
+        "query": query,
+        "lat": lat,
+        "lng": lng,
+        "confidence": 0.9 if located else 0.7,
+        "facilities": facilities,
+    }
 
-def get_location_from_maps(query: str) -> dict:
-    # Placeholder for a Maps API. Returns a fake, well-formed object.
-    return {"query": query, "lat": 6.9271, "lng": 79.8612, "confidence": 0.7}
 
 def call_other_api(name: str, payload: dict) -> dict:
     # Placeholder generic API
@@ -0,0 +1,305 @@
+"""In-process metrics registry rendered in the Prometheus text format.
+
+Counters, gauges and histograms are kept in plain dictionaries guarded by a
+lock, so recording a sample costs a dictionary lookup and a bisect. Nothing is
+pushed anywhere: ``/api/metrics`` renders the current values on demand.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; tuned for calls ranging from regex passes to 20s LLM generations.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names: Tuple[str, ...] = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        try:
+            return tuple(str(labels[name]) for name in self.label_names)
+        except KeyError as exc:
+            raise ValueError(f"Metric {self.name} requires label {exc.args[0]!r}") from None
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:  # pragma: no cover - overridden
+        return []
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from a callback at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+        kind: str = "gauge",
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.kind = kind
+        self._callback = callback
+
+    def _samples(self) -> List[str]:
+        try:
+            values = self._callback()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels: str) -> Tuple[int, float]:
+        """Return ``(count, sum)`` for one label set."""
+
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return 0, 0.0
+            return sum(series[0]), series[1][0]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        lines: List[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))  # type: ignore[return-value]
+
+
+def gauge(name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labels))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str,
+    help_text: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))  # type: ignore[return-value]
+
+
+def callback(
+    name: str,
+    help_text: str,
+    labels: Sequence[str],
+    fn: Callable[[], Dict[LabelValues, float]],
+    kind: str = "gauge",
+) -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, help_text, labels, fn, kind))  # type: ignore[return-value]
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Metrics shared across the pipeline.
+STAGE_SECONDS = histogram(
+    "firstaid_stage_seconds",
+    "Time spent in each stage of a conversation turn.",
+    ("stage",),
+)
+UPSTREAM_SECONDS = histogram(
+    "firstaid_upstream_request_seconds",
+    "Latency of upstream HTTP calls by provider, operation, status and attempt.",
+    ("provider", "operation", "status", "attempt"),
+)
+FALLBACKS = counter(
+    "firstaid_fallback_steps_total",
+    "Times deterministic fallback steps replaced an LLM answer (reason: error or shed).",
+    ("category", "reason"),
+)
+REJECTIONS = counter(
+    "firstaid_rejections_total",
+    "Requests rejected as out of scope or unsafe.",
+    ("stage",),
+)
+CACHE_EVENTS = counter(
+    "firstaid_cache_requests_total",
+    "Cache lookups by cache name and result (hit/miss).",
+    ("cache", "result"),
+)
+
+
+def stage_timer(stage: str):
+    """Context manager timing one pipeline stage."""
+
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "CallbackMetric",
+    "REGISTRY",
+    "CONTENT_TYPE",
+    "counter",
+    "gauge",
+    "histogram",
+    "callback",
+    "render",
+    "stage_timer",
+    "record_cache",
+    "STAGE_SECONDS",
+    "UPSTREAM_SECONDS",
+    "FALLBACKS",
+    "REJECTIONS",
+    "CACHE_EVENTS",
+]
@@ -0,0 +1,148 @@
+"""Speculative retrieval from draft user input (``POST /api/chat/prefetch``).
+
+While someone is still describing the emergency, the frontend sends the draft
+(debounced). The conversational agent classifies it cheaply and, when it looks
+in scope, ``instruction_agent.prefetch_context`` runs the retrieval the final
+turn would run (warming the embedding cache on the way) and stores the
+documents here under the exact search query ``generate`` will build. On
+submit, ``generate`` takes them instead of embedding and searching again.
+
+Bounds: entries expire after ``PREFETCH_TTL_SECONDS`` and at most
+``PREFETCH_CACHE_SIZE`` are kept (least recently used first out); each client
+(session id, else address) gets a token bucket of ``PREFETCH_RATE_PER_SECOND``
+with a burst of ``PREFETCH_BURST``; at most ``PREFETCH_MAX_IN_FLIGHT``
+prefetches run at once per worker.
+
+``firstaid_prefetch_lookups_total{result}`` counts submitted turns whose
+retrieval was (``hit``) or was not (``miss``) served from a prefetch.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from ..config import (
+    PREFETCH_BURST,
+    PREFETCH_CACHE_SIZE,
+    PREFETCH_MAX_IN_FLIGHT,
+    PREFETCH_RATE_PER_SECOND,
+    PREFETCH_TTL_SECONDS,
+)
+from . import metrics
+
+MAX_TRACKED_CLIENTS = 10000
+
+REQUESTS = metrics.counter(
+    "firstaid_prefetch_requests_total",
+    "Prefetch requests by result (warmed, cached, bundled, out_of_scope, too_short, rate_limited, busy, error).",
+    ("result",),
+)
+_LOOKUPS = metrics.counter(
+    "firstaid_prefetch_lookups_total",
+    "Submitted turns whose retrieval was served from a prefetch (hit) or not (miss).",
+    ("result",),
+)
+_ENTRIES = metrics.gauge("firstaid_prefetch_entries", "Prefetched retrieval results held by this worker.")
+
+
+class _Entry(NamedTuple):
+    documents: List[Dict]
+    expires_at: float
+
+
+_CACHE: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+_BUCKETS: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # client -> (tokens, updated)
+_LOCK = threading.Lock()
+_in_flight = 0
+
+
+def _key(search_query: str, top_k: int) -> Tuple[str, int]:
+    return " ".join(search_query.lower().split()), top_k
+
+
+def enabled() -> bool:
+    return PREFETCH_CACHE_SIZE > 0 and PREFETCH_TTL_SECONDS > 0
+
+
+def put(search_query: str, top_k: int, documents: List[Dict]) -> None:
+    if not enabled() or not documents:
+        return
+    key = _key(search_query, top_k)
+    with _LOCK:
+        _CACHE[key] = _Entry(list(documents), time.monotonic() + PREFETCH_TTL_SECONDS)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > PREFETCH_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+        _ENTRIES.set(len(_CACHE))
+
+
+def _get(key: Tuple[str, int]) -> Optional[List[Dict]]:
+    entry = _CACHE.get(key)
+    if entry is None:
+        return None
+    if entry.expires_at <= time.monotonic():
+        del _CACHE[key]
+        _ENTRIES.set(len(_CACHE))
+        return None
+    return entry.documents
+
+
+def peek(search_query: str, top_k: int) -> Optional[List[Dict]]:
+    """Prefetched documents for the query, without counting a lookup."""
+
+    with _LOCK:
+        return _get(_key(search_query, top_k))
+
+
+def take(search_query: str, top_k: int) -> Optional[List[Dict]]:
+    """Prefetched documents for a submitted turn's query (counted as hit or miss)."""
+
+    if not enabled():
+        return None
+    with _LOCK:
+        documents = _get(_key(search_query, top_k))
+    _LOOKUPS.inc(result="hit" if documents is not None else "miss")
+    return list(documents) if documents is not None else None
+
+
+def allow(client: str) -> bool:
+    """Token-bucket rate limit per client; False when the client must slow down."""
+
+    now = time.monotonic()
+    with _LOCK:
+        tokens, updated = _BUCKETS.pop(client, (float(PREFETCH_BURST), now))
+        tokens = min(float(PREFETCH_BURST), tokens + (now - updated) * PREFETCH_RATE_PER_SECOND)
+        allowed = tokens >= 1.0
+        _BUCKETS[client] = (tokens - 1.0 if allowed else tokens, now)
+        while len(_BUCKETS) > MAX_TRACKED_CLIENTS:
+            _BUCKETS.popitem(last=False)
+    return allowed
+
+
+def try_start() -> bool:
+    """Reserve one of the ``PREFETCH_MAX_IN_FLIGHT`` slots; pair with :func:`finish`."""
+
+    global _in_flight
+    with _LOCK:
+        if _in_flight >= PREFETCH_MAX_IN_FLIGHT:
+            return False
+        _in_flight += 1
+        return True
+
+
+def finish() -> None:
+    global _in_flight
+    with _LOCK:
+        _in_flight = max(0, _in_flight - 1)
+
+
+def clear() -> None:
+    with _LOCK:
+        _CACHE.clear()
+        _BUCKETS.clear()
+        _ENTRIES.set(0)
+
+
+__all__ = ["REQUESTS", "enabled", "put", "peek", "take", "allow", "try_start", "finish", "clear"]
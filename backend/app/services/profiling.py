@@ -0,0 +1,176 @@
+"""Opt-in CPU and memory profiling for individual chat requests.
+
+A request is profiled when it carries the configured ``X-Profile-Token``
+header or is picked by ``PROFILING_SAMPLE_RATE``. Profiled requests run under
+``cProfile`` plus a ``tracemalloc`` snapshot diff, and the text report is
+written to a bounded directory that ``/api/profiles`` can serve back. Requests
+that are not selected only pay for :func:`should_profile`.
+"""
+from __future__ import annotations
+
+import hmac
+import io
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
+if TYPE_CHECKING:  # profilers are imported only when a request is profiled
+    import cProfile
+    import tracemalloc
+
+from ..config import (
+    PROFILING_DIR,
+    PROFILING_MAX_REPORTS,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_TOKEN,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+REPORT_HEADER = "X-Profile-Id"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+_REPORT_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+# tracemalloc is process-wide, so only one request is profiled at a time.
+_ACTIVE = threading.Lock()
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """Return True when ``token`` equals the configured profiling token."""
+
+    return bool(token and PROFILING_TOKEN) and hmac.compare_digest(str(token), PROFILING_TOKEN)
+
+
+def should_profile(token: Optional[str]) -> bool:
+    """Decide whether the current request should be profiled."""
+
+    if token and token_matches(token):
+        return True
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+
+def _report_dir() -> Path:
+    path = Path(PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _prune(directory: Path) -> None:
+    reports = sorted(directory.glob("*.txt"))
+    for stale in reports[: max(0, len(reports) - max(1, PROFILING_MAX_REPORTS))]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+
+def _render_report(
+    label: str,
+    wall_seconds: float,
+    profiler: cProfile.Profile,
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+    peak_bytes: int,
+) -> str:
+    import pstats
+    import tracemalloc
+
+    out = io.StringIO()
+    out.write(f"request: {label}\n")
+    out.write(f"wall_seconds: {wall_seconds:.6f}\n")
+    out.write(f"traced_peak_bytes: {peak_bytes}\n\n")
+
+    out.write(f"== top {TOP_FUNCTIONS} functions by cumulative time ==\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+    out.write(f"\n== top {TOP_ALLOCATIONS} allocation sites (net during request) ==\n")
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    for entry in diff[:TOP_ALLOCATIONS]:
+        out.write(f"{entry}\n")
+    return out.getvalue()
+
+
+@contextmanager
+def profile_request(label: str) -> Iterator[Optional[str]]:
+    """Profile the enclosed block and yield the id of the report it will write.
+
+    Yields ``None`` (and profiles nothing) when another request is already
+    being profiled.
+    """
+
+    if not _ACTIVE.acquire(blocking=False):
+        yield None
+        return
+
+    import cProfile
+    import tracemalloc
+
+    report_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield report_id
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        try:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            directory = _report_dir()
+            report = _render_report(label, wall, profiler, before, after, peak)
+            (directory / f"{report_id}.txt").write_text(report, encoding="utf-8")
+            _prune(directory)
+        except Exception as exc:
+            LOGGER.warning("Unable to write profile report %s: %s", report_id, exc)
+        finally:
+            _ACTIVE.release()
+
+
+def list_reports() -> List[str]:
+    """Return stored report ids, newest first."""
+
+    directory = Path(PROFILING_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted((p.stem for p in directory.glob("*.txt")), reverse=True)
+
+
+def read_report(report_id: str) -> Optional[str]:
+    """Return the report text for ``report_id`` or None when it does not exist."""
+
+    if not _REPORT_ID.match(report_id or ""):
+        return None
+    path = Path(PROFILING_DIR) / f"{report_id}.txt"
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "REPORT_HEADER",
+    "token_matches",
+    "should_profile",
+    "profile_request",
+    "list_reports",
+    "read_report",
+]
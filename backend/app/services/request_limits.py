@@ -0,0 +1,157 @@
+"""Request size limits for the chat endpoints and the history window.
+
+``RequestLimitMiddleware`` runs before FastAPI reads the body, so an oversized
+request is refused with ``413`` before Pydantic builds a model from it or any
+guardrail regex scans it:
+
+* a ``Content-Length`` above ``CHAT_MAX_BODY_BYTES`` is refused without reading
+  the body; a chunked body is refused as soon as it grows past the limit;
+* a JSON body with more than ``CHAT_MAX_MESSAGES`` messages, or a message
+  (``messages[].content``, ``message`` or ``text``) longer than
+  ``CHAT_MAX_MESSAGE_CHARS``, is refused after one ``json.loads`` of at most
+  ``CHAT_MAX_BODY_BYTES``. Malformed bodies are passed on for FastAPI's ``422``.
+
+Within the limits, :func:`window` keeps the pipeline's work independent of
+the conversation length: ``handle_message`` (guardrails, triage, context
+features, retrieval and generation) is handed only the last
+``CHAT_HISTORY_WINDOW`` messages. Follow-up composition still reads the user
+turns of the whole conversation, which the limits above keep bounded.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, TypeVar
+
+from ..config import CHAT_HISTORY_WINDOW, CHAT_MAX_BODY_BYTES, CHAT_MAX_MESSAGE_CHARS, CHAT_MAX_MESSAGES
+from . import metrics
+
+LIMITED_PATHS = frozenset({"/api/chat", "/api/chat/continue", "/api/chat/prefetch"})
+_TEXT_FIELDS = ("message", "text")
+
+_REJECTED = metrics.counter(
+    "firstaid_oversized_requests_total",
+    "Chat requests refused with 413 by limit (body_bytes, messages, message_chars).",
+    ("limit",),
+)
+
+T = TypeVar("T")
+
+
+class PayloadTooLarge(Exception):
+    def __init__(self, limit: str, detail: str) -> None:
+        super().__init__(detail)
+        self.limit = limit
+        self.detail = detail
+
+
+def _body_limit_error() -> PayloadTooLarge:
+    return PayloadTooLarge("body_bytes", f"Request body exceeds {CHAT_MAX_BODY_BYTES} bytes.")
+
+
+def check_payload(body: bytes) -> None:
+    """Raise :class:`PayloadTooLarge` when a parsed body breaks the message limits."""
+
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return
+    if not isinstance(data, dict):
+        return
+    texts: List[Any] = [data.get(field) for field in _TEXT_FIELDS]
+    messages = data.get("messages")
+    if isinstance(messages, list):
+        if len(messages) > CHAT_MAX_MESSAGES:
+            raise PayloadTooLarge("messages", f"Too many messages (limit {CHAT_MAX_MESSAGES}).")
+        texts.extend(m.get("content") for m in messages if isinstance(m, dict))
+    for text in texts:
+        if isinstance(text, str) and len(text) > CHAT_MAX_MESSAGE_CHARS:
+            raise PayloadTooLarge("message_chars", f"A message exceeds {CHAT_MAX_MESSAGE_CHARS} characters.")
+
+
+def _content_length(scope: Dict) -> Optional[int]:
+    for name, value in scope.get("headers") or ():
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class RequestLimitMiddleware:
+    """ASGI middleware enforcing the limits on ``LIMITED_PATHS`` POST requests."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in LIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        try:
+            length = _content_length(scope)
+            if length is not None and length > CHAT_MAX_BODY_BYTES:
+                raise _body_limit_error()
+            body = await self._read_body(receive)
+            if body is None:
+                return  # the client went away mid-body: nothing to answer
+            check_payload(body)
+        except PayloadTooLarge as exc:
+            _REJECTED.inc(limit=exc.limit)
+            await self._reject(send, exc.detail)
+            return
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        """The whole body, or None when the client disconnects before sending it."""
+
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > CHAT_MAX_BODY_BYTES:
+                raise _body_limit_error()
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _reject(send, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def window(messages: Sequence[T]) -> List[T]:
+    """The last ``CHAT_HISTORY_WINDOW`` messages (all of them when it is 0)."""
+
+    if CHAT_HISTORY_WINDOW <= 0:
+        return list(messages)
+    return list(messages[-CHAT_HISTORY_WINDOW:])
+
+
+__all__ = ["LIMITED_PATHS", "PayloadTooLarge", "RequestLimitMiddleware", "check_payload", "window"]
@@ -3,10 +3,9 @@ from __future__ import annotations
 
 import logging
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
-
-import yaml
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional, Pattern
 
 LOGGER = logging.getLogger(__name__)
 GUARDRAILS_PATH = Path(__file__).resolve().parent.parent / "guardrails.yaml"
@@ -16,6 +15,9 @@ def _load_rules() -> Dict:
     if not GUARDRAILS_PATH.exists():
         LOGGER.warning("Guardrails config missing at %s; falling back to defaults", GUARDRAILS_PATH)
         return {}
+    # PyYAML is imported on first use so importing the app stays cheap.
+    import yaml
+
     try:
         with GUARDRAILS_PATH.open("r", encoding="utf-8") as handle:
             data = yaml.safe_load(handle) or {}
@@ -30,11 +32,53 @@ def _load_rules() -> Dict:
     return data
 
 
-RULES = _load_rules()
-DISALLOWED_TOPICS = {topic.lower() for topic in RULES.get("disallowed_topics", [])}
-APP_NAME = RULES.get("app_name", "first_aid_guide")
-PURPOSE = RULES.get("purpose", "")
-OUTPUT_RULES = RULES.get("output_rules", [])
+class _Policy(NamedTuple):
+    rules: Dict
+    disallowed_topics: FrozenSet[str]
+    app_name: str
+    purpose: str
+    output_rules: Any
+    topic_pattern: Optional[Pattern[str]]
+
+
+@lru_cache(maxsize=1)
+def load_policy() -> _Policy:
+    """Parse ``guardrails.yaml`` and compile its topic matcher (once)."""
+
+    rules = _load_rules()
+    topics = frozenset(topic.lower() for topic in rules.get("disallowed_topics", []) if topic)
+    pattern = None
+    if topics:
+        pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(t) for t in sorted(topics, key=len, reverse=True)) + r")\b"
+        )
+    return _Policy(
+        rules=rules,
+        disallowed_topics=topics,
+        app_name=rules.get("app_name", "first_aid_guide"),
+        purpose=rules.get("purpose", ""),
+        output_rules=rules.get("output_rules", []),
+        topic_pattern=pattern,
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "RULES": "rules",
+    "DISALLOWED_TOPICS": "disallowed_topics",
+    "APP_NAME": "app_name",
+    "PURPOSE": "purpose",
+    "OUTPUT_RULES": "output_rules",
+}
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps the historical module-level constants available without parsing
+    # the YAML file at import time.
+    field = _LAZY_ATTRIBUTES.get(name)
+    if field is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(load_policy(), field)
+
 
 _TOPIC_PATTERN = re.compile(r"[a-zA-Z0-9]+", re.IGNORECASE)
 
@@ -42,26 +86,24 @@ _TOPIC_PATTERN = re.compile(r"[a-zA-Z0-9]+", re.IGNORECASE)
 def policy_check(text: str) -> Dict[str, str]:
     """Return an allow/deny decision based on disallowed topics."""
 
+    policy = load_policy()
     lowered = (text or "").lower()
-    for topic in DISALLOWED_TOPICS:
-        if not topic:
-            continue
-        if re.search(rf"\b{re.escape(topic)}\b", lowered):
+    if policy.topic_pattern is not None:
+        match = policy.topic_pattern.search(lowered)
+        if match:
             return {
                 "allowed": False,
-                "reason": f"Topic '{topic}' is outside the scope of {APP_NAME}.",
+                "reason": f"Topic '{match.group(0)}' is outside the scope of {policy.app_name}.",
             }
 
     # Also check tokenized variants so multi-word phrases are caught even if punctuation differs.
     tokens = _TOPIC_PATTERN.findall(lowered)
     token_string = " ".join(tokens)
-    for topic in DISALLOWED_TOPICS:
-        if not topic:
-            continue
+    for topic in policy.disallowed_topics:
         if topic in token_string:
             return {
                 "allowed": False,
-                "reason": f"Topic '{topic}' is outside the scope of {APP_NAME}.",
+                "reason": f"Topic '{topic}' is outside the scope of {policy.app_name}.",
             }
 
     return {"allowed": True, "reason": ""}
@@ -73,6 +115,7 @@ def violates(text: str) -> bool:
 
 
 __all__ = [
+    "load_policy",
     "policy_check",
     "violates",
     "RULES",
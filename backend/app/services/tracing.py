@@ -0,0 +1,280 @@
+"""Lightweight request tracing exported to rotating local JSONL files.
+
+Each request opens a trace (tagged with ``session_id``) and every agent stage
+or upstream HTTP call inside it becomes a child span. Spans are handed to a
+bounded queue when they finish; a background thread serialises them, so the
+request path never touches the disk. Each line is an OTLP/JSON
+``ExportTraceServiceRequest`` holding one span (``resourceSpans`` ->
+``scopeSpans`` -> ``spans``, typed attribute values, numeric status codes), the
+format of the OpenTelemetry Collector's file exporter, so the files can be
+replayed into a collector (``otlpjsonfile`` receiver) or read with
+``tools/trace_report.py``.
+
+When ``TRACING_ENABLED`` is false, :func:`span` and :func:`start_trace` return
+a shared no-op object.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from ..config import (
+    TRACE_BACKUP_COUNT,
+    TRACE_DIR,
+    TRACE_MAX_BYTES,
+    TRACE_QUEUE_SIZE,
+    TRACING_ENABLED,
+)
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+SERVICE_NAME = "first-aid-guide"
+TRACE_FILE = "spans.jsonl"
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_DROPPED = metrics.counter(
+    "firstaid_trace_spans_dropped_total",
+    "Finished spans dropped because the export queue was full.",
+)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: str, name: str, attributes: Dict[str, Any]) -> None:
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_record(self) -> Dict[str, Any]:
+        """This span as an OTLP/JSON ``ExportTraceServiceRequest``."""
+
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL if self.parent_id else SPAN_KIND_SERVER,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": any_value(value)} for key, value in self.attributes.items() if value is not None
+            ],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [span]}],
+            }]
+        }
+
+
+def any_value(value: Any) -> Dict[str, Any]:
+    """An attribute value as an OTLP ``AnyValue``."""
+
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [any_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+class _NoopSpan:
+    trace_id = ""
+    span_id = ""
+
+    def set(self, **attributes: Any) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+_CURRENT: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("firstaid_span", default=None)
+
+
+class JsonlExporter:
+    """Background JSONL writer with size-based rotation (``spans.jsonl``, ``.1`` ...).
+
+    Also used for other off-request-path records (see ``services.usage``).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        backups: int,
+        queue_size: int,
+        filename: str = TRACE_FILE,
+        dropped: Optional[metrics.Counter] = None,
+        thread_name: str = "trace-exporter",
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.filename = filename
+        self.dropped = dropped or _DROPPED
+        self.thread_name = thread_name
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+    def _ensure_thread(self) -> None:
+        # Started lazily (and again after a fork) so workers own their writer.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _rotate(self, path: Path) -> None:
+        for index in range(self.backups - 1, 0, -1):
+            src = path.with_name(f"{path.name}.{index}")
+            if src.exists():
+                src.replace(path.with_name(f"{path.name}.{index + 1}"))
+        if self.backups > 0:
+            path.replace(path.with_name(f"{path.name}.1"))
+        else:
+            path.unlink()
+
+    def _run(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self.filename
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 512:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                payload = "".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in batch)
+                if path.exists() and path.stat().st_size + len(payload) > self.max_bytes:
+                    self._rotate(path)
+                with path.open("a", encoding="utf-8") as handle:
+                    handle.write(payload)
+            except Exception as exc:
+                LOGGER.warning("Unable to export %d records to %s: %s", len(batch), path, exc)
+
+    def flush(self, timeout: float = 2.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Give the writer a moment to finish the batch it already dequeued.
+        time.sleep(0.02)
+
+
+_EXPORTER = JsonlExporter(TRACE_DIR, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT, TRACE_QUEUE_SIZE)
+
+
+def enabled() -> bool:
+    return TRACING_ENABLED
+
+
+def current_span():
+    """Return the active span, or a no-op span when none is active."""
+
+    return _CURRENT.get() or NOOP_SPAN
+
+
+def current_trace_id() -> str:
+    active = _CURRENT.get()
+    return active.trace_id if active else ""
+
+
+@contextmanager
+def _run_span(active: Span) -> Iterator[Span]:
+    token = _CURRENT.set(active)
+    try:
+        yield active
+    except BaseException as exc:
+        active.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        active.end_ns = time.time_ns()
+        _CURRENT.reset(token)
+        _EXPORTER.submit(active.to_record())
+
+
+@contextmanager
+def _noop() -> Iterator[_NoopSpan]:
+    yield NOOP_SPAN
+
+
+def start_trace(name: str, session_id: Optional[str] = None, **attributes: Any):
+    """Open the root span of a new trace for one request."""
+
+    if not TRACING_ENABLED:
+        return _noop()
+    if session_id:
+        attributes["session_id"] = session_id
+    return _run_span(Span(secrets.token_hex(16), "", name, attributes))
+
+
+def span(name: str, **attributes: Any):
+    """Open a child span of the active trace (no-op outside a trace)."""
+
+    if not TRACING_ENABLED:
+        return _noop()
+    parent = _CURRENT.get()
+    if parent is None:
+        return _noop()
+    return _run_span(Span(parent.trace_id, parent.span_id, name, attributes))
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Wait briefly for queued spans to be written (used by tests and tools)."""
+
+    _EXPORTER.flush(timeout)
+
+
+__all__ = [
+    "JsonlExporter",
+    "Span",
+    "NOOP_SPAN",
+    "TRACE_FILE",
+    "enabled",
+    "current_span",
+    "current_trace_id",
+    "start_trace",
+    "span",
+    "flush",
+]
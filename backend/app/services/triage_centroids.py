@@ -0,0 +1,118 @@
+"""Nearest-centroid triage over precomputed example embeddings.
+
+``TRIAGE_CENTROIDS_PATH`` points at a compact ``.npz`` file built by
+``python -m tools.build_triage_centroids`` from labeled example messages. It
+holds one unit-normalised centroid per category (``labels``, ``centroids``)
+plus the embedding model the examples were embedded with. Scoring a query is
+a single matrix-vector product against that matrix.
+
+NumPy is optional and only imported when a model file is configured: without
+it, or without a model file, :func:`available` returns False and triage stays
+keyword-based.
+"""
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from ..config import (
+    EMBEDDING_MODEL,
+    TRIAGE_CENTROID_MIN_CONFIDENCE,
+    TRIAGE_CENTROID_TEMPERATURE,
+    TRIAGE_CENTROIDS_PATH,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CentroidModel(NamedTuple):
+    labels: Tuple[str, ...]
+    matrix: "np.ndarray"  # (categories, dimensions), rows unit-normalised, float32
+    embedding_model: str
+
+
+def _load(path: str) -> Optional[CentroidModel]:
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        labels = tuple(str(label) for label in data["labels"])
+        matrix = np.ascontiguousarray(data["centroids"], dtype=np.float32)
+        embedding_model = str(data["embedding_model"]) if "embedding_model" in data.files else ""
+    if matrix.ndim != 2 or matrix.shape[0] != len(labels) or not labels:
+        raise ValueError(f"malformed centroid file {path}")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+    return CentroidModel(labels, matrix, embedding_model)
+
+
+@lru_cache(maxsize=1)
+def load_model() -> Optional[CentroidModel]:
+    """Load the centroid file once; None when disabled or unusable."""
+
+    if not TRIAGE_CENTROIDS_PATH:
+        return None
+    try:
+        model = _load(TRIAGE_CENTROIDS_PATH)
+    except ImportError:
+        LOGGER.warning("TRIAGE_CENTROIDS_PATH is set but numpy is not installed; using keyword triage")
+        return None
+    except (OSError, KeyError, ValueError) as exc:
+        LOGGER.warning("Triage centroids unavailable (%s): %s", TRIAGE_CENTROIDS_PATH, exc)
+        return None
+    if model.embedding_model and model.embedding_model != EMBEDDING_MODEL:
+        LOGGER.warning(
+            "Triage centroids were built with %s but EMBEDDING_MODEL is %s; ignoring them",
+            model.embedding_model,
+            EMBEDDING_MODEL,
+        )
+        return None
+    return model
+
+
+def available() -> bool:
+    return load_model() is not None
+
+
+def predict(embedding: Optional[Sequence[float]]) -> Optional[Dict[str, object]]:
+    """Return ``{"category", "confidence", "similarity", "margin"}`` or None when unsure.
+
+    ``margin`` is how much closer the query is to the winning centroid than to
+    the ``out_of_scope`` centroid (or to the runner-up when the model has none).
+    """
+
+    model = load_model()
+    if model is None or not embedding:
+        return None
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype=np.float32)
+    if vector.shape != (model.matrix.shape[1],):
+        return None
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        return None
+
+    similarities = model.matrix @ (vector / norm)
+    scaled = (similarities - similarities.max()) / TRIAGE_CENTROID_TEMPERATURE
+    weights = np.exp(scaled)
+    best = int(similarities.argmax())
+    confidence = float(weights[best] / weights.sum())
+    if confidence < TRIAGE_CENTROID_MIN_CONFIDENCE:
+        return None
+    if "out_of_scope" in model.labels and model.labels[best] != "out_of_scope":
+        rival = float(similarities[model.labels.index("out_of_scope")])
+    else:
+        rival = float(np.partition(similarities, -2)[-2]) if len(similarities) > 1 else -1.0
+    return {
+        "category": model.labels[best],
+        "confidence": round(confidence, 3),
+        "similarity": round(float(similarities[best]), 4),
+        "margin": round(float(similarities[best]) - rival, 4),
+    }
+
+
+__all__ = ["CentroidModel", "load_model", "available", "predict"]
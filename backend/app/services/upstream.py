@@ -0,0 +1,162 @@
+"""Thin wrapper around outbound HTTP calls to model and vector providers.
+
+Every call to OpenAI, Groq or Astra goes through :func:`post` so latency,
+status and attempt number are recorded in one place. Calls share one pooled
+``requests.Session`` (created on first use, and again in forked workers) so
+keep-alive connections are reused across requests.
+
+Calls made for an abandoned request (see :mod:`.cancellation`) are skipped,
+and the connection of one in flight is bound to the request's cancel token
+while it is checked out of the pool, so cancelling shuts its socket down.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from ..config import UPSTREAM_POOL_SIZE
+from . import cancellation, metrics, tracing
+
+if TYPE_CHECKING:
+    import requests
+
+_SESSION: Optional["requests.Session"] = None
+_SESSION_LOCK = threading.Lock()
+# Smoothed latency of successful calls per (provider, operation), used to
+# estimate the time saved by cancelling one.
+_TYPICAL_SECONDS: Dict[Tuple[str, str], float] = {}
+_TYPICAL_WEIGHT = 0.2
+
+
+class _CancellablePoolMixin:
+    """Binds each checked-out connection to the calling thread's cancel token."""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        token = cancellation.current()
+        if token is not None:
+            token.bind(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        token = cancellation.current()
+        if token is not None and conn is not None:
+            token.unbind(conn)
+        return super()._put_conn(conn)
+
+
+def _cancellable_pool_classes() -> Dict[str, type]:
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    return {
+        "http": type("CancellableHTTPConnectionPool", (_CancellablePoolMixin, HTTPConnectionPool), {}),
+        "https": type("CancellableHTTPSConnectionPool", (_CancellablePoolMixin, HTTPSConnectionPool), {}),
+    }
+
+
+def session() -> "requests.Session":
+    """Return the shared pooled session, creating it on first use."""
+
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                # ``requests`` is imported lazily; it is a noticeable share of import time.
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                pooled = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=UPSTREAM_POOL_SIZE)
+                adapter.poolmanager.pool_classes_by_scheme = _cancellable_pool_classes()
+                pooled.mount("https://", adapter)
+                pooled.mount("http://", adapter)
+                _SESSION = pooled
+    return _SESSION
+
+
+def reset_session() -> None:
+    """Drop the shared session (connections must not be shared across a fork)."""
+
+    global _SESSION
+    _SESSION = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_session)
+
+
+def prime(url: str, timeout: float = 2.0) -> Optional[int]:
+    """Open a pooled connection to ``url``'s host; returns the status or None."""
+
+    try:
+        return session().head(url, timeout=timeout, allow_redirects=False).status_code
+    except Exception:
+        return None
+
+
+def post(provider: str, operation: str, url: str, *, attempt: int = 1, **kwargs: Any) -> "requests.Response":
+    """POST to ``url`` and record the call under ``provider``/``operation``."""
+
+    import requests
+
+    token = cancellation.current()
+    if token is not None and token.cancelled:
+        _count_cancelled(provider, operation, "skipped", 0.0)
+        raise cancellation.Cancelled()
+    status = "error"
+    payload = kwargs.get("json") if isinstance(kwargs.get("json"), dict) else {}
+    attributes = {"provider": provider, "operation": operation, "attempt": attempt}
+    if payload.get("model"):
+        attributes["model"] = payload["model"]
+    start = time.perf_counter()
+    with tracing.span(f"upstream.{provider}.{operation}", **attributes) as span:
+        try:
+            response = session().post(url, **kwargs)
+        except requests.Timeout:
+            status = "timeout"
+            raise
+        except Exception as exc:
+            if token is not None and token.cancelled:
+                status = "cancelled"
+                raise _aborted(provider, operation, start) from exc
+            raise
+        else:
+            if token is not None and token.cancelled:  # the body may have been cut short
+                status = "cancelled"
+                raise _aborted(provider, operation, start)
+            status = str(response.status_code)
+            if response.ok:
+                _observe_typical(provider, operation, time.perf_counter() - start)
+            return response
+        finally:
+            span.set(**{"http.status_code": status})
+            metrics.UPSTREAM_SECONDS.observe(
+                time.perf_counter() - start,
+                provider=provider,
+                operation=operation,
+                status=status,
+                attempt=str(attempt),
+            )
+
+
+def _observe_typical(provider: str, operation: str, seconds: float) -> None:
+    key = (provider, operation)
+    previous = _TYPICAL_SECONDS.get(key)
+    _TYPICAL_SECONDS[key] = seconds if previous is None else previous + _TYPICAL_WEIGHT * (seconds - previous)
+
+
+def _count_cancelled(provider: str, operation: str, phase: str, elapsed: float) -> None:
+    cancellation.UPSTREAM_CANCELLED.inc(provider=provider, operation=operation, phase=phase)
+    saved = _TYPICAL_SECONDS.get((provider, operation), 0.0) - elapsed
+    if saved > 0:
+        cancellation.SECONDS_SAVED.inc(saved, provider=provider, operation=operation)
+
+
+def _aborted(provider: str, operation: str, start: float) -> cancellation.Cancelled:
+    _count_cancelled(provider, operation, "aborted", time.perf_counter() - start)
+    return cancellation.Cancelled()
+
+
+__all__ = ["session", "reset_session", "prime", "post"]
@@ -0,0 +1,202 @@
+"""Token, latency and cost accounting for upstream model calls.
+
+Callers report each embeddings or chat-completions call with :func:`record`
+(tokens from the provider's ``usage`` block, or an estimate from the prompt
+and completion sizes when it is missing). Calls are attributed to the
+pipeline stage, the provider/model, and the triage category and session bound
+to the current request with :func:`scope` / :func:`label` (context
+variables, so concurrent requests never mix).
+
+Totals per stage, provider/model and category are exported on
+``/api/metrics``; sessions are unbounded, so per-session detail only goes to
+the usage ledger, a rotating JSONL file (one line per call) written by a
+background thread and summarised by ``python -m tools.usage_report``.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from ..config import (
+    USAGE_BACKUP_COUNT,
+    USAGE_DIR,
+    USAGE_LEDGER_ENABLED,
+    USAGE_MAX_BYTES,
+    USAGE_PRICES,
+)
+from . import metrics, tracing
+
+LOGGER = logging.getLogger(__name__)
+
+USAGE_FILE = "usage.jsonl"
+CHARS_PER_TOKEN = 4.0
+
+# USD per million tokens as (input, output); override or extend with USAGE_PRICES.
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+TOKENS = metrics.counter(
+    "firstaid_tokens_total",
+    "Upstream tokens by stage, provider, model, triage category and kind (prompt, completion, embedding).",
+    ("stage", "provider", "model", "category", "kind"),
+)
+COST = metrics.counter(
+    "firstaid_upstream_cost_usd_total",
+    "Estimated upstream spend in USD by stage, provider, model and triage category.",
+    ("stage", "provider", "model", "category"),
+)
+CALL_SECONDS = metrics.histogram(
+    "firstaid_usage_call_seconds",
+    "Upstream model call latency by stage, triage category and prompt shape.",
+    ("stage", "category", "shape"),
+)
+PROMPT_TOKENS = metrics.histogram(
+    "firstaid_prompt_tokens",
+    "Prompt tokens per upstream call by stage and prompt shape.",
+    ("stage", "shape"),
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+_DROPPED = metrics.counter(
+    "firstaid_usage_records_dropped_total",
+    "Usage ledger records dropped because the export queue was full.",
+)
+
+_SCOPE: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("firstaid_usage_scope", default=None)
+_LEDGER = tracing.JsonlExporter(
+    USAGE_DIR,
+    USAGE_MAX_BYTES,
+    USAGE_BACKUP_COUNT,
+    queue_size=10000,
+    filename=USAGE_FILE,
+    dropped=_DROPPED,
+    thread_name="usage-ledger",
+)
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    if USAGE_PRICES:
+        try:
+            for model, pair in json.loads(USAGE_PRICES).items():
+                prices[model] = (float(pair[0]), float(pair[1]) if len(pair) > 1 else 0.0)
+        except (ValueError, TypeError, IndexError, AttributeError) as exc:
+            LOGGER.warning("Ignoring malformed USAGE_PRICES: %s", exc)
+    return prices
+
+
+PRICES = _load_prices()
+
+
+@contextmanager
+def scope(**labels: Optional[str]) -> Iterator[Dict[str, str]]:
+    """Attribute upstream calls made inside the block to ``labels`` (e.g. ``session_id``)."""
+
+    token = _SCOPE.set({key: str(value) for key, value in labels.items() if value})
+    try:
+        yield _SCOPE.get()
+    finally:
+        _SCOPE.reset(token)
+
+
+def label(**labels: Optional[str]) -> None:
+    """Add labels (e.g. the triage ``category``) to the active scope; no-op outside one."""
+
+    current = _SCOPE.get()
+    if current is not None:
+        current.update({key: str(value) for key, value in labels.items() if value})
+
+
+def estimate_tokens(chars: int) -> int:
+    return int(round(chars / CHARS_PER_TOKEN))
+
+
+def cost(model: str, input_tokens: int, output_tokens: int = 0) -> float:
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def record(
+    stage: str,
+    provider: str,
+    model: str,
+    *,
+    seconds: float,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    embedding_tokens: Optional[int] = None,
+    prompt_chars: int = 0,
+    completion_chars: int = 0,
+    shape: str = "",
+) -> Dict[str, object]:
+    """Account one upstream call; returns the ledger record."""
+
+    labels = _SCOPE.get() or {}
+    category = labels.get("category", "unknown").lower()
+    shape = shape or "default"
+    estimated = False
+    if embedding_tokens is None and stage == "embedding":
+        embedding_tokens, estimated = estimate_tokens(prompt_chars), True
+    if prompt_tokens is None and stage != "embedding":
+        prompt_tokens, estimated = estimate_tokens(prompt_chars), True
+    if completion_tokens is None and completion_chars:
+        completion_tokens, estimated = estimate_tokens(completion_chars), True
+    prompt_tokens = prompt_tokens or 0
+    completion_tokens = completion_tokens or 0
+    embedding_tokens = embedding_tokens or 0
+
+    for kind, tokens in (("prompt", prompt_tokens), ("completion", completion_tokens), ("embedding", embedding_tokens)):
+        if tokens:
+            TOKENS.inc(tokens, stage=stage, provider=provider, model=model, category=category, kind=kind)
+    spend = cost(model, prompt_tokens + embedding_tokens, completion_tokens)
+    COST.inc(spend, stage=stage, provider=provider, model=model, category=category)
+    CALL_SECONDS.observe(seconds, stage=stage, category=category, shape=shape)
+    PROMPT_TOKENS.observe(prompt_tokens + embedding_tokens, stage=stage, shape=shape)
+
+    entry = {
+        "ts": round(time.time(), 3),
+        "stage": stage,
+        "provider": provider,
+        "model": model,
+        "category": category,
+        "session_id": labels.get("session_id", ""),
+        "shape": shape,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "embedding_tokens": embedding_tokens,
+        "prompt_chars": prompt_chars,
+        "estimated": estimated,
+        "seconds": round(seconds, 4),
+        "cost_usd": round(spend, 8),
+        "trace_id": tracing.current_trace_id(),
+    }
+    if USAGE_LEDGER_ENABLED:
+        _LEDGER.submit(entry)
+    return entry
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Wait briefly for queued ledger records to be written (used by tests and tools)."""
+
+    _LEDGER.flush(timeout)
+
+
+__all__ = [
+    "USAGE_FILE",
+    "PRICES",
+    "scope",
+    "label",
+    "estimate_tokens",
+    "cost",
+    "record",
+    "flush",
+]
@@ -1,9 +1,10 @@
 # services/vector_db.py
 # Minimal Astra DB Vector integration via REST Data API
-import requests, json
+import json
 import logging
 from typing import List, Dict, Any
 from . import rules_guardrails as guardrails
+from . import context_bundles, upstream
 from ..config import (
     ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_DATABASE,
     ASTRA_DB_COLLECTION, ASTRA_DB_APPLICATION_TOKEN, has_astra
@@ -25,11 +26,12 @@ def upsert_documents(docs: List[Dict[str, Any]]):
     for d in docs:
         try:
             payload = {"document": d}
-            r = requests.post(url, headers=HEADERS, data=json.dumps(payload), timeout=10)
+            r = upstream.post("astra", "upsert", url, headers=HEADERS, data=json.dumps(payload), timeout=10)
             resps.append((r.status_code, r.text))
         except Exception as exc:
             logging.warning("Astra upsert failed: %s", exc)
             resps.append((0, str(exc)))
+    context_bundles.mark_stale()
     return resps
 
 def similarity_search(embedding: List[float], top_k: int = 4) -> List[Dict[str, Any]]:
@@ -39,7 +41,7 @@ def similarity_search(embedding: List[float], top_k: int = 4) -> List[Dict[str,
     try:
         url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}/vector-search"
         payload = {"topK": top_k, "vector": embedding, "includeSimilarity": True}
-        r = requests.post(url, headers=HEADERS, data=json.dumps(payload), timeout=15)
+        r = upstream.post("astra", "vector_search", url, headers=HEADERS, data=json.dumps(payload), timeout=15)
         if r.status_code != 200:
             return []
         data = r.json()
@@ -0,0 +1,121 @@
+"""Startup warmup phases and readiness state.
+
+Modules register warmup phases (precompiling matchers, loading indexes,
+priming connection pools ...). :func:`run` executes them in order, records how
+long each took, and flips the process to ready once every phase has run, so
+``/api/ready`` only admits traffic to a warmed-up worker. A failing phase is
+logged and reported but does not block readiness; the code it warms still
+works lazily.
+
+Under the pre-fork server (``app.serve``) the parent calls :func:`run_shared`
+before forking, so read-only structures are built once and shared
+copy-on-write; phases registered with ``per_worker=True`` (connection pools,
+anything holding sockets or threads) are left for each worker's :func:`run`.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+_PHASES: List[Tuple[int, str, Callable[[], object]]] = []
+_PER_WORKER: Set[str] = set()
+_DONE: Set[str] = set()
+_TIMINGS: Dict[str, float] = {}
+_ERRORS: Dict[str, str] = {}
+_READY = threading.Event()
+_STARTED = threading.Event()
+
+_PHASE_SECONDS = metrics.gauge(
+    "firstaid_startup_phase_seconds",
+    "Duration of each startup phase in seconds.",
+    ("phase",),
+)
+
+
+def register(name: str, fn: Callable[[], object], order: int = 50, per_worker: bool = False) -> None:
+    """Register a warmup phase; lower ``order`` runs first.
+
+    ``per_worker`` phases never run in a pre-fork parent (see :func:`run_shared`).
+    """
+
+    if any(existing == name for _, existing, _ in _PHASES):
+        return
+    if per_worker:
+        _PER_WORKER.add(name)
+    _PHASES.append((order, name, fn))
+    _PHASES.sort(key=lambda item: item[0])
+
+
+def record(name: str, seconds: float) -> None:
+    """Record a phase that ran outside :func:`run` (e.g. module import)."""
+
+    _TIMINGS[name] = seconds
+    _PHASE_SECONDS.set(seconds, phase=name)
+
+
+def _run_phases(include_per_worker: bool) -> None:
+    for _, name, fn in list(_PHASES):
+        if name in _DONE or (name in _PER_WORKER and not include_per_worker):
+            continue
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as exc:
+            _ERRORS[name] = str(exc)
+            LOGGER.warning("Warmup phase %s failed: %s", name, exc)
+        _DONE.add(name)
+        record(name, time.perf_counter() - start)
+
+
+def run_shared() -> Dict[str, float]:
+    """Run the phases that are safe to share across a fork, without marking ready."""
+
+    total = time.perf_counter()
+    _run_phases(include_per_worker=False)
+    record("warmup_shared_total", time.perf_counter() - total)
+    return dict(_TIMINGS)
+
+
+def run() -> Dict[str, float]:
+    """Run every remaining phase once and mark the process ready."""
+
+    if _STARTED.is_set():
+        _READY.wait()
+        return dict(_TIMINGS)
+    _STARTED.set()
+    total = time.perf_counter()
+    _run_phases(include_per_worker=True)
+    record("warmup_total", time.perf_counter() - total)
+    LOGGER.info(
+        "Warmup finished: %s",
+        ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in _TIMINGS.items()),
+    )
+    _READY.set()
+    return dict(_TIMINGS)
+
+
+def run_in_background() -> threading.Thread:
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    return _READY.is_set()
+
+
+def status() -> Dict[str, object]:
+    return {
+        "ready": _READY.is_set(),
+        "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in _TIMINGS.items()},
+        "errors": dict(_ERRORS),
+    }
+
+
+__all__ = ["register", "record", "run_shared", "run", "run_in_background", "is_ready", "status"]
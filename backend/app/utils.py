@@ -14,6 +14,14 @@ FIRST_AID_KEYWORDS = {
     "poison", "poisoning", "stroke", "heart", "cardiac", "cpr",
 }
 
+# One alternation instead of a regex per keyword; longest first so that
+# "bleeding" is tried before "bleed" at the same position.
+_FIRST_AID_KEYWORD_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(k) for k in sorted(FIRST_AID_KEYWORDS, key=len, reverse=True))
+    + r")\b"
+)
+
 GENERIC_TRIAGE_CATEGORIES = {
     "", "unknown", "concern", "issue", "situation", "emergency",
     "medical emergency", "non-urgent",
@@ -58,7 +66,7 @@ def is_first_aid_related(user_text: str, triage: Optional[Dict]) -> bool:
     """Return True if the text appears to describe a first-aid concern."""
 
     lowered = (user_text or "").lower()
-    if any(re.search(rf"\b{re.escape(keyword)}\b", lowered) for keyword in FIRST_AID_KEYWORDS):
+    if _FIRST_AID_KEYWORD_RE.search(lowered):
         return True
 
     if isinstance(triage, dict):
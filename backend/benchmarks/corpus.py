@@ -0,0 +1,108 @@
+"""Deterministic synthetic corpus of first-aid conversations for benchmarks.
+
+Conversations are assembled from realistic opening complaints, follow-up
+updates and closing remarks so each benchmark sees a mix of categories,
+severities, trends, typos, recovery cues and off-topic turns. The same seed
+always yields the same corpus, which keeps baseline comparisons meaningful.
+"""
+from __future__ import annotations
+
+import random
+from typing import Dict, List
+
+OPENINGS = [
+    "My hand is bleeding a lot after I cut it on a kitchen knife",
+    "I burned my arm on the stove and there are blisters forming",
+    "My son is choking on a grape and can't breathe properly",
+    "I think I twisted my ankle playing with the kids, it is swelling",
+    "I fell off my bike and I think my wrist might be broken",
+    "She has hives all over her face after eating peanuts, allergic reaction maybe",
+    "I feel dizzy and lightheaded, almost fainted in the shower",
+    "Terrible headache behind my eyes since this morning",
+    "Got a deep gash on my knee from the fence, blood everywhere",
+    "Spilled boiling water on my foot, skin is red and painful",
+    "I have a bruse on my thigh that is really dark",
+    "My dad says his chest hurts and his left arm feels numb",
+    "Bee sting on my neck and the swelling is spreading",
+    "My toddler swallowed some cleaning liquid, is that poisoning?",
+]
+
+UPDATES = [
+    "It's getting worse, the bleeding is heavier now",
+    "The pain is about the same, no change really",
+    "It looks a bit better, less swelling than before",
+    "Where should I put the ice pack, on the wrist or the elbow?",
+    "It's on the back of my hand near the finger",
+    "Should I take ibuprofen for the pain?",
+    "The blisters are about the size of a coin",
+    "He is coughing now but still looks scared",
+    "There is more numbness in my fingers now",
+    "I can't put weight on my foot without sharp pain",
+    "My skin around the burn is turning white",
+    "Still spreading up my neck, increasing redness",
+    "Is it ok to keep pressure on it with a towel?",
+    "The swelling is stable but it still hurts when I move it",
+]
+
+CLOSINGS = [
+    "I'm feeling better now, thanks",
+    "The bleeding has stopped",
+    "yes",
+    "thank you",
+    "Pain is gone, all good now",
+    "No change, what else can I do?",
+    "It's worse again, should I go to the hospital?",
+]
+
+OFF_TOPIC = [
+    "Can you recommend a good movie tonight?",
+    "What stocks should I invest in this year?",
+    "Help me with my programming homework",
+]
+
+ASSISTANT_REPLY = (
+    "I’m here to help.\n\n🩺 What I’m seeing\n• Concern type: {category}\n• Severity: moderate\n\n"
+    "✅ Trusted first-aid steps\n1) Apply steady pressure with a clean cloth.\n"
+    "2) Elevate the injured area above heart level if possible.\n\n"
+    "Is the bleeding slowing down, staying the same, or getting heavier despite pressure?"
+)
+
+CONVERSATION_LENGTHS = (1, 2, 3, 5, 8, 12)
+
+
+def build_corpus(size: int = 120, seed: int = 1234) -> List[List[Dict[str, str]]]:
+    """Return ``size`` conversations, each a list of chat messages ending with a user turn."""
+
+    rng = random.Random(seed)
+    corpus: List[List[Dict[str, str]]] = []
+    for index in range(size):
+        user_turns = CONVERSATION_LENGTHS[index % len(CONVERSATION_LENGTHS)]
+        if index % 17 == 0:
+            turns = [rng.choice(OFF_TOPIC)]
+        else:
+            turns = [rng.choice(OPENINGS)]
+        for turn in range(1, user_turns):
+            pool = CLOSINGS if turn == user_turns - 1 and rng.random() < 0.4 else UPDATES
+            turns.append(rng.choice(pool))
+
+        messages: List[Dict[str, str]] = []
+        for turn_index, text in enumerate(turns):
+            if turn_index:
+                messages.append({"role": "assistant", "content": ASSISTANT_REPLY.format(category="bleeding")})
+            messages.append({"role": "user", "content": text})
+        corpus.append(messages)
+    return corpus
+
+
+def latest_user_texts(corpus: List[List[Dict[str, str]]]) -> List[str]:
+    return [conversation[-1]["content"] for conversation in corpus]
+
+
+def joined_user_context(corpus: List[List[Dict[str, str]]]) -> List[str]:
+    return [
+        " \n".join(m["content"] for m in conversation if m["role"] == "user")
+        for conversation in corpus
+    ]
+
+
+__all__ = ["build_corpus", "latest_user_texts", "joined_user_context"]
@@ -0,0 +1,107 @@
+"""Benchmark for the memory-mapped nearest-facility index.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.facilities --facilities 100000 --queries 5000
+
+Generates a seeded synthetic facility set clustered around random population
+centres, writes the index to a temporary file, maps it, and times
+k-nearest queries from points near those centres. A sample of queries is
+checked against a brute-force scan.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from app.services import facility_index
+
+from .run import _percentile
+
+
+def synthetic_facilities(count: int, seed: int = 7, centres: int = 400) -> Tuple[List[Dict], List[Tuple[float, float]]]:
+    rng = random.Random(seed)
+    hubs = [(rng.uniform(-55.0, 70.0), rng.uniform(-180.0, 180.0)) for _ in range(centres)]
+    weights = [rng.paretovariate(1.2) for _ in hubs]
+    records = []
+    for number, (lat, lng) in enumerate(rng.choices(hubs, weights, k=count)):
+        records.append({
+            "name": f"Facility {number}",
+            "kind": rng.choice(facility_index.KINDS),
+            "lat": max(-90.0, min(90.0, rng.gauss(lat, 0.6))),
+            "lng": (rng.gauss(lng, 0.8) + 180.0) % 360.0 - 180.0,
+        })
+    return records, hubs
+
+
+def brute_force(records: Sequence[Dict], lat: float, lng: float, k: int) -> List[str]:
+    phi = math.radians(lat)
+
+    def distance(record: Dict) -> float:
+        dphi = math.radians(record["lat"]) - phi
+        dlam = math.radians(record["lng"] - lng)
+        a = math.sin(dphi / 2) ** 2 + math.cos(phi) * math.cos(math.radians(record["lat"])) * math.sin(dlam / 2) ** 2
+        return a
+
+    return [record["name"] for record in sorted(records, key=distance)[:k]]
+
+
+def main(argv: Sequence[str] = ()) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facilities", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--leaf-size", type=int, default=facility_index.DEFAULT_LEAF_SIZE)
+    parser.add_argument("--check", type=int, default=50, help="queries verified against a brute-force scan")
+    args = parser.parse_args(list(argv) or None)
+
+    records, hubs = synthetic_facilities(args.facilities)
+    rng = random.Random(11)
+    points = []
+    for _ in range(args.queries):
+        lat, lng = rng.choice(hubs)
+        points.append((rng.gauss(lat, 1.5), (rng.gauss(lng, 1.5) + 180.0) % 360.0 - 180.0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "facilities.idx")
+        start = time.perf_counter()
+        facility_index.write(records, path, args.leaf_size)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        index = facility_index.FacilityIndex(path)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        for lat, lng in points[: args.check]:
+            got = [facility.name for facility in index.nearest(lat, lng, args.k)]
+            if got != brute_force(records, lat, lng, args.k):
+                print(f"mismatch at {lat:.4f},{lng:.4f}: {got}")
+                return 1
+
+        timings = []
+        clock = time.perf_counter_ns
+        for lat, lng in points:
+            begin = clock()
+            index.nearest(lat, lng, args.k)
+            timings.append((clock() - begin) / 1000.0)
+        timings.sort()
+        size_kib = os.path.getsize(path) / 1024
+        index.close()
+
+    print(f"facilities {args.facilities}, leaf size {args.leaf_size}, file {size_kib:.0f} KiB")
+    print(f"build {build_seconds:.2f}s, map {open_ms:.2f} ms, {args.check} queries match brute force")
+    print(
+        f"nearest k={args.k}: mean {statistics.fmean(timings):.1f} us, median {_percentile(timings, 0.5):.1f} us, "
+        f"p95 {_percentile(timings, 0.95):.1f} us, p99 {_percentile(timings, 0.99):.1f} us"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
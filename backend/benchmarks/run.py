@@ -0,0 +1,182 @@
+"""Microbenchmarks for the deterministic agent stack.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.15
+
+Each benchmark runs its target over the synthetic corpus ``--repeat`` times,
+timing every call. Caches are cleared before each repeat so results reflect a
+cold pass over fresh text. ``--compare`` exits with status 1 when any
+benchmark's median is slower than the baseline by more than ``--threshold``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from app.agents import conversational_agent, emergency_classifier, instruction_agent, recovery_agent, security_agent
+from app.main import ChatMessage, _compose_assistant_message
+from app.services import conversation_features
+from app.utils import is_first_aid_related
+
+from .corpus import build_corpus, joined_user_context, latest_user_texts
+from .stubs import stubbed_providers
+
+Benchmark = Tuple[str, Callable[[Any], Any], Sequence[Any]]
+
+DEFAULT_OUTPUT = "benchmarks/baseline.json"
+
+
+def reset_caches() -> None:
+    """Clear process-level caches so every repeat starts cold."""
+
+    conversation_features._extract_lowered.cache_clear()
+    instruction_agent._EMBED_CACHE.clear()
+    instruction_agent._GENERATION_CACHE.clear()
+
+
+def _build_benchmarks(corpus: List[List[Dict[str, str]]]) -> List[Benchmark]:
+    latest = latest_user_texts(corpus)
+    contexts = joined_user_context(corpus)
+    histories = [(conversation[:-1], conversation[-1]["content"]) for conversation in corpus]
+    triaged = [(text, emergency_classifier.classify(text)) for text in latest]
+
+    with stubbed_providers():
+        composed = []
+        for conversation in corpus:
+            user_text = conversation[-1]["content"]
+            result = conversational_agent.handle_message(user_text, history=conversation)
+            if result.get("rejected") or result.get("error"):
+                continue
+            messages = [ChatMessage(**m) for m in conversation]
+            composed.append((result, user_text, messages, result.get("recovery")))
+
+    return [
+        ("security.safety_screen", security_agent.safety_screen, latest),
+        ("security.protect", security_agent.protect, contexts),
+        ("classifier.classify_text", emergency_classifier.classify_text, latest),
+        ("classifier.classify", emergency_classifier.classify, latest),
+        ("utils.is_first_aid_related", lambda item: is_first_aid_related(*item), triaged),
+        ("recovery.detect", lambda item: recovery_agent.detect(*item), histories),
+        (
+            "conversational.detect_clarification_prompt",
+            conversational_agent._detect_clarification_prompt,
+            latest,
+        ),
+        ("main.compose_assistant_message", lambda item: _compose_assistant_message(*item), composed),
+        (
+            "conversational.handle_message",
+            lambda conversation: conversational_agent.handle_message(
+                conversation[-1]["content"], history=conversation
+            ),
+            corpus,
+        ),
+    ]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(fn: Callable[[Any], Any], items: Sequence[Any], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    clock = time.perf_counter_ns
+    for _ in range(repeat):
+        reset_caches()
+        for item in items:
+            start = clock()
+            fn(item)
+            timings.append((clock() - start) / 1000.0)
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "mean_us": round(statistics.fmean(timings), 3) if timings else 0.0,
+        "median_us": round(_percentile(timings, 0.5), 3),
+        "p95_us": round(_percentile(timings, 0.95), 3),
+        "min_us": round(timings[0], 3) if timings else 0.0,
+    }
+
+
+def run_suite(corpus_size: int, repeat: int, only: str = "") -> Dict[str, Any]:
+    corpus = build_corpus(corpus_size)
+    results: Dict[str, Dict[str, float]] = {}
+    with stubbed_providers():
+        for name, fn, items in _build_benchmarks(corpus):
+            if only and only not in name:
+                continue
+            results[name] = run_benchmark(fn, items, repeat)
+            print(f"{name:<45} median {results[name]['median_us']:>10.1f} us  p95 {results[name]['p95_us']:>10.1f} us")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus_size": corpus_size,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return the names of benchmarks whose median regressed beyond ``threshold``."""
+
+    regressions: List[str] = []
+    base_results = baseline.get("results", {})
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, stats in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base or not base.get("median_us"):
+            print(f"{name:<45} {'-':>10} {stats['median_us']:>10.1f} {'new':>8}")
+            continue
+        change = stats["median_us"] / base["median_us"] - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<45} {base['median_us']:>10.1f} {stats['median_us']:>10.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Sequence[str] = ()) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=None, help=f"write results as JSON (e.g. {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", default=None, help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed median slowdown (0.15 = 15%%)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus-size", type=int, default=120)
+    parser.add_argument("--only", default="", help="run benchmarks whose name contains this text")
+    args = parser.parse_args(list(argv) or None)
+
+    logging.disable(logging.WARNING)
+    current = run_suite(args.corpus_size, args.repeat, args.only)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,83 @@
+"""In-process provider stubs so benchmarks measure our code, not the network.
+
+:func:`stubbed_providers` swaps :func:`app.services.upstream.post` for a fake
+that answers embeddings, chat-completion and Astra vector-search calls with
+canned payloads, and marks every provider as configured.
+"""
+from __future__ import annotations
+
+import hashlib
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List
+from unittest import mock
+
+EMBEDDING_DIMENSIONS = 1536
+
+STUB_STEPS = (
+    "1) Apply firm, steady pressure with a clean cloth.\n"
+    "2) Keep the injured area raised above heart level.\n"
+    "3) Do not remove the cloth if blood soaks through; add more layers.\n"
+    "4) Call emergency services if bleeding does not slow within 10 minutes."
+)
+
+STUB_DOCUMENTS: List[Dict[str, Any]] = [
+    {"_id": f"kb-{i}", "text": f"First-aid guide excerpt {i}: pressure, elevation and when to call for help.", "$similarity": 0.9 - i * 0.05}
+    for i in range(4)
+]
+
+
+class StubResponse:
+    def __init__(self, payload: Dict[str, Any], status_code: int = 200) -> None:
+        self._payload = payload
+        self.status_code = status_code
+        self.text = ""
+
+    def json(self) -> Dict[str, Any]:
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+def _embedding_for(text: str) -> List[float]:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    seed = int.from_bytes(digest, "little")
+    return [((seed >> (i % 64)) & 0xFF) / 255.0 for i in range(EMBEDDING_DIMENSIONS)]
+
+
+def fake_post(provider: str, operation: str, url: str, **kwargs: Any) -> StubResponse:
+    payload = kwargs.get("json") or {}
+    if operation == "embeddings":
+        inputs = payload.get("input")
+        texts = inputs if isinstance(inputs, list) else [inputs or ""]
+        return StubResponse({
+            "data": [{"index": i, "embedding": _embedding_for(t)} for i, t in enumerate(texts)],
+            "usage": {"prompt_tokens": sum(len(t.split()) for t in texts), "total_tokens": 0},
+        })
+    if operation == "chat_completions":
+        return StubResponse({
+            "choices": [{"message": {"role": "assistant", "content": STUB_STEPS}}],
+            "usage": {"prompt_tokens": 250, "completion_tokens": 80, "total_tokens": 330},
+        })
+    if operation == "vector_search":
+        return StubResponse({"documents": STUB_DOCUMENTS})
+    return StubResponse({}, status_code=200)
+
+
+@contextmanager
+def stubbed_providers() -> Iterator[None]:
+    """Route every upstream call to :func:`fake_post` for the duration of the block."""
+
+    from app.agents import instruction_agent
+    from app.services import upstream, vector_db
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(upstream, "post", fake_post))
+        stack.enter_context(mock.patch.object(instruction_agent, "has_openai", lambda: True))
+        stack.enter_context(mock.patch.object(instruction_agent, "OPENAI_API_KEY", "stub"))
+        stack.enter_context(mock.patch.object(instruction_agent, "GROQ_API_KEY", "stub"))
+        stack.enter_context(mock.patch.object(vector_db, "has_astra", lambda: True))
+        yield
+
+
+__all__ = ["stubbed_providers", "fake_post", "StubResponse", "STUB_STEPS"]
@@ -0,0 +1,153 @@
+"""Closed-loop load generator for ``/api/chat/continue``.
+
+Usage (from ``backend/``)::
+
+    python -m loadtest.loadgen --url http://127.0.0.1:8000 --concurrency 16 --duration 60
+
+Each worker thread replays multi-turn conversations from the synthetic
+benchmark corpus: it posts the history, takes the returned messages (which
+include the assistant reply) and appends the next user turn, exactly as the
+frontend does. The report lists throughput, status codes and p50/p95/p99
+latency per request.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from benchmarks.corpus import build_corpus
+
+
+class Results:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.conversations = 0
+
+    def add(self, latency: float, status: str) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+
+    def conversation_done(self) -> None:
+        with self._lock:
+            self.conversations += 1
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _user_turns(conversation: List[Dict[str, str]]) -> List[str]:
+    return [m["content"] for m in conversation if m["role"] == "user"]
+
+
+def _worker(
+    worker_id: int,
+    base_url: str,
+    corpus: List[List[Dict[str, str]]],
+    deadline: float,
+    results: Results,
+    timeout: float,
+    stop: threading.Event,
+) -> None:
+    session = requests.Session()
+    url = f"{base_url.rstrip('/')}/api/chat/continue"
+    index = worker_id
+    while not stop.is_set() and time.monotonic() < deadline:
+        conversation = corpus[index % len(corpus)]
+        index += 1
+        messages: List[Dict[str, Any]] = []
+        session_id = uuid.uuid4().hex
+        for turn in _user_turns(conversation):
+            if stop.is_set() or time.monotonic() >= deadline:
+                return
+            messages.append({"role": "user", "content": turn})
+            start = time.perf_counter()
+            try:
+                response = session.post(url, json={"messages": messages, "session_id": session_id}, timeout=timeout)
+                status = str(response.status_code)
+            except requests.RequestException as exc:
+                results.add(time.perf_counter() - start, type(exc).__name__)
+                break
+            results.add(time.perf_counter() - start, status)
+            if response.status_code != 200:
+                # Out-of-scope turns end the conversation, as they would for a user.
+                break
+            messages = response.json().get("messages", messages)
+        results.conversation_done()
+
+
+def run(base_url: str, concurrency: int, duration: float, timeout: float, corpus_size: int) -> Dict[str, Any]:
+    corpus = build_corpus(corpus_size)
+    results = Results()
+    stop = threading.Event()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=_worker,
+            args=(i, base_url, corpus, deadline, results, timeout, stop),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(results.latencies)
+    ok = results.statuses.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "conversations": results.conversations,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "ok_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "statuses": dict(results.statuses),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max": round((latencies[-1] if latencies else 0.0) * 1000, 1),
+        },
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--corpus-size", type=int, default=120)
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.concurrency, args.duration, args.timeout, args.corpus_size)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Worker scaling and memory report for the pre-fork server (``app.serve``).
+
+Usage (from ``backend/``, with providers pointed at ``loadtest.standins``)::
+
+    python -m loadtest.prefork --workers 1 2 4 --concurrency 16 --duration 30
+
+For each worker count it starts ``python -m app.serve`` on a free port, waits
+for ``/api/ready``, drives ``/api/chat/continue`` with :mod:`loadtest.loadgen`,
+and reads ``/proc/<pid>/smaps_rollup`` of every worker after the run:
+``rss`` counts shared pages in full, ``pss`` divides them between the
+processes sharing them, and ``private`` (USS) is what each extra worker
+really costs. Linux only.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from . import loadgen
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as handle:
+            return [int(child) for child in handle.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """Rss, Pss and private (USS) kilobytes of one process."""
+
+    fields: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _wait_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/api/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+def measure(workers: int, concurrency: int, duration: float, timeout: float) -> Dict[str, Any]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--log-level", "warning"],
+    )
+    try:
+        _wait_ready(url, 60)
+        time.sleep(1.0)  # let every worker finish its own warmup
+        report = loadgen.run(url, concurrency, duration, timeout, corpus_size=120)
+        pids = _children(server.pid)
+        memory = [memory_kb(pid) for pid in pids]
+        parent = memory_kb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    per_worker = {key: round(sum(m[key] for m in memory) / max(1, len(memory)) / 1024, 1) for key in ("rss", "pss", "private")}
+    return {
+        "workers": workers,
+        "throughput_rps": report["throughput_rps"],
+        "latency_ms": report["latency_ms"],
+        "statuses": report["statuses"],
+        "worker_mb": per_worker,
+        "parent_mb": {key: round(value / 1024, 1) for key, value in parent.items()},
+        "total_pss_mb": round((sum(m["pss"] for m in memory) + parent["pss"]) / 1024, 1),
+    }
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the reports to this file")
+    args = parser.parse_args(argv)
+
+    print(f"available CPUs: {len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()}")
+    reports = []
+    for workers in args.workers:
+        report = measure(workers, args.concurrency, args.duration, args.timeout)
+        reports.append(report)
+        mb = report["worker_mb"]
+        print(
+            f"workers={workers:<3} rps={report['throughput_rps']:<8} p50={report['latency_ms']['p50']}ms "
+            f"p99={report['latency_ms']['p99']}ms  per worker: rss={mb['rss']}MB pss={mb['pss']}MB "
+            f"private={mb['private']}MB  total pss={report['total_pss_mb']}MB"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(reports, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""Local stand-ins for the OpenAI, Groq and Astra APIs used by the backend.
+
+Run (from ``backend/``)::
+
+    python -m loadtest.standins --port 9100 --chat-latency lognormal:800:0.4 --error-rate 0.01
+
+then start the API against it::
+
+    OPENAI_API_BASE=http://127.0.0.1:9100/openai/v1 \\
+    GROQ_API_BASE=http://127.0.0.1:9100/groq/openai/v1 \\
+    ASTRA_DB_API_ENDPOINT=http://127.0.0.1:9100/astra \\
+    uvicorn app.main:app
+
+Served routes (any prefix): ``.../chat/completions`` (JSON or SSE when the
+request sets ``"stream": true``), ``.../embeddings`` and
+``.../collections/<name>/vector-search``.
+
+The stand-in is also the network key-value service for ``CACHE_BACKEND=http``
+(``CACHE_URL=http://127.0.0.1:9100/cache``): ``/cache/kv/<key>`` and
+``/cache/lease/<key>`` as described in ``app.services.cache.HttpBackend``,
+held in memory and bounded by ``--kv-max-bytes``.
+
+Latency specs are ``fixed:MS``, ``uniform:LO_MS:HI_MS``, ``normal:MEAN_MS:SD_MS``
+or ``lognormal:MEDIAN_MS:SIGMA``.
+
+Record/replay: ``--record cassette.jsonl`` proxies every request to the real
+provider (``/openai`` -> ``--openai-upstream``, ``/groq`` -> ``--groq-upstream``,
+``/astra`` -> ``--astra-upstream``) and stores the response keyed by method,
+path and body. ``--replay cassette.jsonl`` serves those stored responses so a
+run can be reproduced offline; unknown requests fall back to synthetic
+answers unless ``--replay-strict`` is given.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+
+EMBEDDING_DIMENSIONS = 1536
+
+SYNTHETIC_STEPS = (
+    "1) Make sure the area is safe and stay calm.\n"
+    "2) Apply firm pressure with a clean cloth or cool the area under running water as appropriate.\n"
+    "3) Keep the injured part still and raised if possible.\n"
+    "4) Call emergency services if symptoms are severe or getting worse."
+)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Return a sampler (seconds) for a latency spec such as ``lognormal:800:0.4``."""
+
+    kind, _, rest = (spec or "fixed:0").partition(":")
+    args = [float(part) for part in rest.split(":") if part]
+    if kind == "fixed":
+        value = (args[0] if args else 0.0) / 1000.0
+        return lambda: value
+    if kind == "uniform":
+        low, high = args[0] / 1000.0, args[1] / 1000.0
+        return lambda: random.uniform(low, high)
+    if kind == "normal":
+        mean, sd = args[0] / 1000.0, args[1] / 1000.0
+        return lambda: max(0.0, random.gauss(mean, sd))
+    if kind == "lognormal":
+        mu, sigma = math.log(max(args[0], 1e-3) / 1000.0), args[1]
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def _embedding_for(text: str) -> list:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    seed = int.from_bytes(digest, "little")
+    return [((seed >> (i % 64)) & 0xFF) / 255.0 - 0.5 for i in range(EMBEDDING_DIMENSIONS)]
+
+
+class Cassette:
+    """JSONL store of recorded upstream responses keyed by request identity."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def key(method: str, path: str, body: bytes) -> str:
+        try:
+            normalized = json.dumps(json.loads(body or b"{}"), sort_keys=True)
+        except ValueError:
+            normalized = body.decode("utf-8", "replace")
+        return hashlib.sha256(f"{method} {path} {normalized}".encode("utf-8")).hexdigest()
+
+    def load(self) -> "Cassette":
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry
+        return self
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def record(self, key: str, path: str, status: int, content_type: str, body: bytes) -> None:
+        entry = {
+            "key": key,
+            "path": path,
+            "status": status,
+            "content_type": content_type,
+            "body": body.decode("utf-8", "replace"),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+
+
+class KeyValueStore:
+    """In-memory key-value service with TTLs, leases and a byte-bounded LRU."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._leases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1] - now
+
+    def put(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._drop(key)
+            if len(key) + len(value) > self.max_bytes or ttl <= 0:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self.bytes += len(key) + len(value)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(key) + len(entry[0])
+
+    def lease(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._leases.get(key, 0.0) > now:
+                return False
+            self._leases[key] = now + ttl
+            return True
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._leases.pop(key, None)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._leases.clear()
+            self.bytes = 0
+
+
+class StandInConfig:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.latency = {
+            "chat": parse_latency(args.chat_latency),
+            "embeddings": parse_latency(args.embed_latency),
+            "vector_search": parse_latency(args.search_latency),
+        }
+        self.error_rate = args.error_rate
+        self.token_delay = args.token_delay_ms / 1000.0
+        self.upstreams = {
+            "openai": args.openai_upstream.rstrip("/"),
+            "groq": args.groq_upstream.rstrip("/"),
+            "astra": (args.astra_upstream or "").rstrip("/"),
+        }
+        self.record: Optional[Cassette] = Cassette(args.record) if args.record else None
+        self.replay: Optional[Cassette] = Cassette(args.replay).load() if args.replay else None
+        self.replay_strict = args.replay_strict
+        self.kv = KeyValueStore(args.kv_max_bytes)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = "FirstAidStandIn/1.0"
+    protocol_version = "HTTP/1.1"
+    config: StandInConfig
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - signature from base class
+        return
+
+    # -- helpers ---------------------------------------------------------
+    def _send(self, status: int, payload: Any, content_type: str = "application/json") -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> str:
+        if self.path.endswith("/chat/completions"):
+            return "chat"
+        if self.path.endswith("/embeddings"):
+            return "embeddings"
+        if self.path.endswith("/vector-search"):
+            return "vector_search"
+        return ""
+
+    def _upstream_for(self) -> Tuple[str, str]:
+        prefix, _, rest = self.path.lstrip("/").partition("/")
+        base = self.config.upstreams.get(prefix, "")
+        return base, "/" + rest
+
+    def _cache_request(self, method: str, body: bytes) -> bool:
+        """Serve ``/cache/...`` key-value requests; False for other paths."""
+
+        parts = urlsplit(self.path)
+        if not parts.path.startswith("/cache/"):
+            return False
+        kind, _, key = parts.path[len("/cache/"):].partition("/")
+        key = unquote(key)
+        ttl = float((parse_qs(parts.query).get("ttl") or ["0"])[0])
+        kv = self.config.kv
+        if kind == "kv" and method == "GET":
+            hit = kv.get(key)
+            if hit is None:
+                self._send(404, {"error": {"message": "not found"}})
+                return True
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(hit[0])))
+            self.send_header("X-Expires-In", f"{hit[1]:.3f}")
+            self.end_headers()
+            self.wfile.write(hit[0])
+        elif kind == "kv" and method == "PUT":
+            kv.put(key, body, ttl)
+            self._send(204, b"")
+        elif kind == "kv" and method == "DELETE":
+            kv.delete(key)
+            self._send(204, b"")
+        elif kind == "lease" and method == "POST":
+            acquired = kv.lease(key, ttl)
+            self._send(201 if acquired else 409, {"acquired": acquired})
+        elif kind == "lease" and method == "DELETE":
+            kv.release(key)
+            self._send(204, b"")
+        elif kind == "flush" and method == "POST":
+            kv.flush()
+            self._send(204, b"")
+        else:
+            self._send(404, {"error": {"message": f"no cache route for {method} {self.path}"}})
+        return True
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    # -- request handling --------------------------------------------------
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        if not self._cache_request("GET", b""):
+            self._send(200, {"object": "list", "data": []})
+
+    def do_PUT(self) -> None:  # noqa: N802 - http.server naming
+        body = self._body()
+        if not self._cache_request("PUT", body):
+            self._send(405, {"error": {"message": "method not allowed"}})
+
+    def do_DELETE(self) -> None:  # noqa: N802 - http.server naming
+        if not self._cache_request("DELETE", self._body()):
+            self._send(405, {"error": {"message": "method not allowed"}})
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server naming
+        body = self._body()
+        if self._cache_request("POST", body):
+            return
+        route = self._route()
+        key = Cassette.key("POST", self.path, body)
+
+        if self.config.replay is not None:
+            entry = self.config.replay.get(key)
+            if entry is not None:
+                self._send(entry["status"], entry["body"].encode("utf-8"), entry["content_type"])
+                return
+            if self.config.replay_strict:
+                self._send(404, {"error": {"message": "request not found in cassette"}})
+                return
+
+        if self.config.record is not None:
+            self._proxy(key, body)
+            return
+
+        if route:
+            time.sleep(self.config.latency[route]())
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            status = random.choice((429, 500, 503))
+            self._send(status, {"error": {"message": "stand-in injected failure", "code": status}})
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        if route == "chat":
+            if payload.get("stream"):
+                self._stream_chat(payload)
+            else:
+                self._send(200, self._chat_payload(payload))
+        elif route == "embeddings":
+            inputs = payload.get("input")
+            texts = inputs if isinstance(inputs, list) else [inputs or ""]
+            self._send(200, {
+                "object": "list",
+                "model": payload.get("model", "stand-in"),
+                "data": [{"object": "embedding", "index": i, "embedding": _embedding_for(t)} for i, t in enumerate(texts)],
+                "usage": {"prompt_tokens": sum(max(1, len(t) // 4) for t in texts), "total_tokens": sum(max(1, len(t) // 4) for t in texts)},
+            })
+        elif route == "vector_search":
+            top_k = int(payload.get("topK") or 4)
+            self._send(200, {"documents": [
+                {"_id": f"standin-{i}", "text": f"Stand-in first-aid guide passage {i}.", "$similarity": round(0.95 - i * 0.03, 3)}
+                for i in range(top_k)
+            ]})
+        else:
+            self._send(404, {"error": {"message": f"no stand-in for {self.path}"}})
+
+    @staticmethod
+    def _chat_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+        max_tokens = payload.get("max_tokens")
+        content = SYNTHETIC_STEPS
+        if max_tokens:
+            content = content[: max(16, int(max_tokens) * 4)]
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "model": payload.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_chars // 4 + len(content) // 4,
+            },
+        }
+
+    def _stream_chat(self, payload: Dict[str, Any]) -> None:
+        full = self._chat_payload(payload)
+        content = full["choices"][0]["message"]["content"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: str) -> None:
+            raw = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(raw):x}\r\n".encode("ascii") + raw + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for piece in content.split(" "):
+                delta = {"choices": [{"index": 0, "delta": {"content": piece + " "}, "finish_reason": None}]}
+                chunk(json.dumps(delta))
+                if self.config.token_delay:
+                    time.sleep(self.config.token_delay)
+            final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": full["usage"]}
+            chunk(json.dumps(final))
+            chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream (e.g. a cancelled request).
+            self.close_connection = True
+
+    def _proxy(self, key: str, body: bytes) -> None:
+        base, path = self._upstream_for()
+        if not base:
+            self._send(502, {"error": {"message": f"no upstream configured for {self.path}"}})
+            return
+        headers = {
+            name: value
+            for name, value in self.headers.items()
+            if name.lower() in {"authorization", "content-type", "x-cassandra-token", "token"}
+        }
+        try:
+            upstream = requests.post(base + path, data=body, headers=headers, timeout=60)
+        except requests.RequestException as exc:
+            self._send(502, {"error": {"message": f"upstream failed: {exc}"}})
+            return
+        content_type = upstream.headers.get("Content-Type", "application/json")
+        assert self.config.record is not None
+        self.config.record.record(key, self.path, upstream.status_code, content_type, upstream.content)
+        self._send(upstream.status_code, upstream.content, content_type)
+
+
+def build_server(args: argparse.Namespace) -> ThreadingHTTPServer:
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {"config": StandInConfig(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--chat-latency", default="lognormal:700:0.35")
+    parser.add_argument("--embed-latency", default="lognormal:120:0.3")
+    parser.add_argument("--search-latency", default="lognormal:60:0.3")
+    parser.add_argument("--token-delay-ms", type=float, default=15.0, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/5xx")
+    parser.add_argument("--record", default=None, help="proxy to real providers and append responses to this cassette")
+    parser.add_argument("--replay", default=None, help="serve responses from this cassette")
+    parser.add_argument("--replay-strict", action="store_true", help="404 on cassette misses instead of synthesizing")
+    parser.add_argument("--openai-upstream", default="https://api.openai.com")
+    parser.add_argument("--groq-upstream", default="https://api.groq.com")
+    parser.add_argument("--astra-upstream", default="", help="real ASTRA_DB_API_ENDPOINT when recording")
+    parser.add_argument("--kv-max-bytes", type=int, default=256 * 1024 * 1024, help="budget of the /cache key-value store")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = build_parser().parse_args(argv)
+    server = build_server(args)
+    mode = "record" if args.record else "replay" if args.replay else "synthetic"
+    print(f"stand-ins listening on http://{args.host}:{server.server_address[1]} ({mode} mode)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, Overloaded
+
+
+def test_queued_requests_are_admitted_by_severity_and_low_is_shed():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, shed_after=0.05)
+        order = []
+        release = asyncio.Event()
+
+        async def request(severity):
+            async with controller.admit(severity) as ticket:
+                order.append((severity, ticket.degraded))
+                if severity == "first":
+                    await release.wait()
+
+        holder = asyncio.create_task(request("first"))
+        await asyncio.sleep(0)
+        low = asyncio.create_task(request("low"))
+        medium = asyncio.create_task(request("medium"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with controller.admit("medium"):
+                pass
+        high = asyncio.create_task(request("high"))
+
+        await asyncio.sleep(0.1)  # the low-severity waiter passes the shed threshold
+        release.set()
+        await asyncio.gather(holder, low, medium, high)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order == [("first", False), ("low", True), ("high", False), ("medium", False)]
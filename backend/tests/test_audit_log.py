@@ -0,0 +1,73 @@
+import time
+
+from app.services import audit_log
+
+
+def _record(category, severity, ts_ms, in_scope=True):
+    return {
+        "ts_ms": ts_ms,
+        "category": category,
+        "severity": severity,
+        "in_scope": in_scope,
+        "verification_passed": True,
+        "steps": f"{category} steps",
+    }
+
+
+def test_writer_appends_segments_and_scan_filters_on_headers(tmp_path):
+    writer = audit_log._Writer(str(tmp_path), segment_bytes=400, queue_size=100)
+    now = int(time.time() * 1000)
+    records = [
+        _record("bleeding", "high", now - 8 * 86400_000),
+        _record("bleeding", "high", now - 1000),
+        _record("bleeding", "medium", now - 900),
+        _record("burn", "high", now - 800),
+        _record("out_of_scope", "low", now - 700, in_scope=False),
+    ] * 3
+    for record in records:
+        assert writer.submit(record, block=0.1)
+        writer.flush()
+
+    assert len(audit_log.segments(str(tmp_path))) > 1  # rotated by size
+    week = now - 7 * 86400_000
+    matches = list(audit_log.scan(str(tmp_path), since_ms=week, severities=["high"], category="bleeding"))
+    assert [(r["category"], r["severity"], r["steps"]) for r in matches] == [("bleeding", "high", "bleeding steps")] * 3
+    headers = list(audit_log.scan(str(tmp_path), in_scope=False, decode=False))
+    assert len(headers) == 3 and all(h["category"] == "out_of_scope" for h in headers)
+
+
+def test_scan_stops_at_a_torn_tail(tmp_path):
+    frame = audit_log.encode(_record("burn", "medium", 1))
+    (tmp_path / "audit-0000000000001-1.seg").write_bytes(frame + frame[:-5])
+    assert len(list(audit_log.scan(str(tmp_path)))) == 1
+
+
+def test_full_queue_drops_after_blocking_briefly():
+    writer = audit_log._Writer("/nonexistent", segment_bytes=1024, queue_size=1)
+    writer._thread, writer._pid = object(), __import__("os").getpid()  # no writer draining the queue
+    assert writer.submit({}, block=0.01)
+    started = time.monotonic()
+    assert not writer.submit({}, block=0.05)
+    assert time.monotonic() - started >= 0.05
+
+
+def test_failed_writes_close_their_segment(tmp_path, monkeypatch):
+    writer = audit_log._Writer(str(tmp_path), segment_bytes=1 << 20, queue_size=100)
+    opened = []
+    open_segment = writer._open_segment
+
+    def tracking_open_segment():
+        open_segment()
+        opened.append(writer._handle)
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer, "_open_segment", tracking_open_segment)
+    monkeypatch.setattr(audit_log, "AUDIT_FSYNC", True)
+    monkeypatch.setattr(audit_log.os, "fsync", failing_fsync)
+    for ts in range(3):
+        assert writer.submit(_record("burn", "medium", ts), block=0.1)
+        writer.flush()
+
+    assert len(opened) == 3 and all(handle.closed for handle in opened)
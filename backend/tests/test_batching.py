@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_one_request_and_get_their_own_result():
+    sent = []
+
+    def send(items):
+        sent.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher("test", send, window=0.05, max_batch=16)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit(f"t{i % 4}")))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sent) == 1
+    assert sorted(sent[0]) == ["t0", "t1", "t2", "t3"]  # duplicates sent once
+    assert all(results[i] == (f"T{i % 4}", 8) for i in range(8))
+
+
+def test_batch_errors_reach_every_caller():
+    def send(items):
+        raise RuntimeError("upstream down")
+
+    batcher = MicroBatcher("test_errors", send, window=0.001, max_batch=4)
+    with pytest.raises(RuntimeError):
+        batcher.submit("x")
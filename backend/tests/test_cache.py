@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import cache, idempotency
+from loadtest import standins
+
+
+def test_memory_backend_evicts_by_bytes_and_expires():
+    backend = cache.MemoryBackend(3 * (1000 + 1 + cache.ENTRY_OVERHEAD_BYTES))
+    for key in "abc":
+        backend.set(key, b"x" * 1000, 60)
+    backend.get("a")  # most recently used now
+    backend.set("d", b"x" * 1000, 60)
+    assert backend.get("b") is None and backend.get("a") is not None and len(backend) == 3
+    backend.set("huge", b"x" * 10000, 60)
+    assert backend.get("huge") is None and len(backend) == 3
+    backend.set("short", b"v", 0.05)
+    time.sleep(0.1)
+    assert backend.get("short") is None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = cache.SqliteBackend(path, 4096), cache.SqliteBackend(path, 4096)
+    first.set("k", b"value", 60)
+    value, ttl = second.get("k")
+    assert value == b"value" and 59 < ttl <= 60
+    assert first.lease("k", 60) and not second.lease("k", 60)
+    first.release("k")
+    assert second.lease("k", 60)
+    for i in range(20):
+        second.set(f"fill-{i}", b"x" * 500, 60)
+    assert first._db().execute("SELECT bytes FROM usage").fetchone()[0] <= 4096
+    assert first.get("fill-19") is not None and first.get("k") is None
+
+
+@pytest.fixture
+def kv_url():
+    args = standins.build_parser().parse_args(["--port", "0", "--kv-max-bytes", "100000"])
+    server = standins.build_server(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/cache"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_backend_against_the_standin(kv_url):
+    backend = cache.HttpBackend(kv_url, 2.0)
+    assert backend.get("embedding:abc") is None
+    backend.set("embedding:abc", b"\x00\x01vector", 30)
+    value, ttl = backend.get("embedding:abc")
+    assert value == b"\x00\x01vector" and 29 < ttl <= 30
+    assert backend.lease("embedding:abc", 5) and not backend.lease("embedding:abc", 5)
+    backend.release("embedding:abc")
+    backend.clear()
+    assert backend.get("embedding:abc") is None
+
+
+def test_concurrent_misses_compute_once_within_and_across_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    # Two "workers": separate Cache objects over the same SQLite file.
+    workers = [cache.Cache("generation", 60, cache.SqliteBackend(path, 1 << 20)) for _ in range(2)]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"steps": "1. Apply pressure."}
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda i: workers[i % 2].get_or_compute("bleeding", compute), range(8)))
+
+    assert len(calls) == 1
+    assert results == [{"steps": "1. Apply pressure."}] * 8
+    assert workers[1].get("bleeding") == {"steps": "1. Apply pressure."}
+
+
+def test_waiting_workers_take_over_when_the_lease_holder_fails(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    holder, waiter = (cache.Cache("generation", 60, cache.SqliteBackend(path, 1 << 20)) for _ in range(2))
+    leased = threading.Event()
+
+    def failing():
+        leased.set()
+        time.sleep(0.3)
+        raise ValueError("no usable content")
+
+    def run_holder():
+        with pytest.raises(ValueError):
+            holder.get_or_compute("k", failing)
+
+    thread = threading.Thread(target=run_holder)
+    thread.start()
+    leased.wait(2)
+    started = time.monotonic()
+    assert waiter.get_or_compute("k", lambda: "computed") == "computed"
+    thread.join()
+    assert time.monotonic() - started < 1.0  # not CACHE_LEASE_SECONDS
+
+
+def test_slow_computations_are_not_repeated_when_they_outlast_the_lease(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_LEASE_SECONDS", 0.2)
+    path = str(tmp_path / "cache.sqlite3")
+    workers = [cache.Cache("generation", 60, cache.SqliteBackend(path, 1 << 20)) for _ in range(2)]
+    calls = []
+
+    def slow_generation():
+        calls.append(1)
+        time.sleep(0.8)  # well past the lease, within the call's own timeout
+        return "1. Apply pressure."
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(
+            lambda i: workers[i % 2].get_or_compute("bleeding", slow_generation, timeout=1.5), range(6)
+        ))
+
+    assert len(calls) == 1 and results == ["1. Apply pressure."] * 6
+
+
+def test_failures_are_not_cached_and_backend_errors_are_misses():
+    memory = cache.Cache("generation", 60, cache.MemoryBackend(1 << 20))
+
+    def failing():
+        raise ValueError("no usable content")
+
+    with pytest.raises(ValueError):
+        memory.get_or_compute("k", failing)
+    assert memory.get_or_compute("k", lambda: "ok") == "ok"
+
+    broken = cache.Cache("generation", 60, cache.HttpBackend("http://127.0.0.1:9", 0.2))
+    assert broken.get_or_compute("k", lambda: "computed") == "computed"
+
+
+def test_idempotent_results_replay_on_another_worker(tmp_path):
+    shared = cache.SqliteBackend(str(tmp_path / "cache.sqlite3"), 1 << 20)
+    stores = [idempotency.IdempotencyStore(60, 100, cache.Cache("idempotency", 60, shared)) for _ in range(2)]
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        return {"ok": True}, {"x-trace-id": "t1"}
+
+    async def scenario():
+        first = await stores[0].run("key:s:k", "fp", compute)
+        second = await stores[1].run("key:s:k", "fp", compute)
+        with pytest.raises(idempotency.Conflict):
+            await stores[1].run("key:s:k", "other", compute)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert runs == [1]
+    assert first[1] == "miss" and second[1] == "replay"
+    assert list(second[0]) == [{"ok": True}, {"x-trace-id": "t1"}]
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import main
+from app.services import cancellation, idempotency, upstream
+
+
+class _SlowProvider(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(2.0)
+        body = b'{"choices": []}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_provider():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowProvider)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    server.shutdown()
+    server.server_close()
+
+
+async def _post(body, disconnect_after=None, headers=()):
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "path": "/api/chat/continue", "raw_path": b"/api/chat/continue", "query_string": b"",
+        "root_path": "", "scheme": "http", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"application/json")] + list(headers),
+    }
+    await main.app(scope, receive, send)
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def _pipeline_calling(url, monkeypatch):
+    calls = []
+
+    def fake_continue(req, degraded=False, on_event=None):
+        started = time.monotonic()
+        try:
+            upstream.post("openai", "chat_completions", url, json={"model": "m"}, timeout=10)
+        except cancellation.Cancelled:
+            calls.append(("cancelled", time.monotonic() - started))
+            raise
+        calls.append(("completed", time.monotonic() - started))
+        return {"ok": True, "messages": [m.dict() for m in req.messages], "result": {}}
+
+    monkeypatch.setattr(main, "_continue_conversation", fake_continue)
+    monkeypatch.setattr(upstream, "_TYPICAL_SECONDS", {("openai", "chat_completions"): 2.0})
+    return calls
+
+
+def test_disconnect_aborts_the_inflight_upstream_call(slow_provider, monkeypatch):
+    calls = _pipeline_calling(slow_provider, monkeypatch)
+    aborted = cancellation.UPSTREAM_CANCELLED.value(provider="openai", operation="chat_completions", phase="aborted")
+    abandoned = cancellation.ABANDONED.value(endpoint="/api/chat/continue", stage="running")
+    saved = cancellation.SECONDS_SAVED.value(provider="openai", operation="chat_completions")
+    body = {"messages": [{"role": "user", "content": "my hand is bleeding"}]}
+
+    async def scenario():
+        started = time.monotonic()
+        status, _ = await _post(body, disconnect_after=0.3)
+        responded = time.monotonic() - started
+        while not calls:
+            await asyncio.sleep(0.02)
+        return status, responded
+
+    status, responded = asyncio.run(scenario())
+    assert status == main.CLIENT_CLOSED_REQUEST and responded < 1.0
+    assert calls[0][0] == "cancelled" and calls[0][1] < 1.0  # not the provider's 2 s
+    assert cancellation.ABANDONED.value(endpoint="/api/chat/continue", stage="running") == abandoned + 1
+    assert cancellation.UPSTREAM_CANCELLED.value(
+        provider="openai", operation="chat_completions", phase="aborted"
+    ) == aborted + 1
+    assert cancellation.SECONDS_SAVED.value(provider="openai", operation="chat_completions") > saved + 1.0
+
+
+def test_work_survives_while_a_retry_waits_for_it(slow_provider, monkeypatch):
+    calls = _pipeline_calling(slow_provider, monkeypatch)
+    monkeypatch.setattr(idempotency, "_STORE", idempotency.IdempotencyStore(60.0, 100))
+    shared = cancellation.ABANDONED.value(endpoint="/api/chat/continue", stage="shared")
+    body = {"messages": [{"role": "user", "content": "my hand is bleeding"}]}
+    key = [(b"idempotency-key", b"retry-1")]
+
+    async def scenario():
+        original = asyncio.ensure_future(_post(body, disconnect_after=0.3, headers=key))
+        await asyncio.sleep(0.1)
+        retry = await _post(body, headers=key)
+        return await original, retry
+
+    original, retry = asyncio.run(scenario())
+    assert original[0] == main.CLIENT_CLOSED_REQUEST
+    assert retry[0] == 200
+    assert [outcome for outcome, _ in calls] == ["completed"]
+    assert cancellation.ABANDONED.value(endpoint="/api/chat/continue", stage="shared") == shared + 1
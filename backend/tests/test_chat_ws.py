@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+from app import main
+
+
+def _run_socket(monkeypatch, incoming):
+    def fake_continue(req, degraded=False, on_event=None):
+        on_event("triage", {"triage": {"category": "burn", "severity": "medium"}, "in_scope": True})
+        on_event("steps", {"instructions": {"steps": "Cool the burn."}, "verification": {"passed": True}})
+        reply = main.ChatMessage(role="assistant", content=f"reply {len(req.messages)}")
+        result = {"triage": {"category": "burn", "severity": "medium"}, "conversation": {"in_scope": True}}
+        return {"ok": True, "messages": [m.dict() for m in req.messages + [reply]], "result": result}
+
+    monkeypatch.setattr(main, "_continue_conversation", fake_continue)
+    monkeypatch.setattr(main, "_estimate_severity", lambda messages: "medium")
+
+    async def scenario():
+        inbox = asyncio.Queue()
+        sent = []
+        await inbox.put({"type": "websocket.connect"})
+        for text in incoming:
+            await inbox.put({"type": "websocket.receive", "text": text})
+
+        async def receive():
+            if inbox.empty() and sum(e["type"] in ("message", "error") for e in sent) >= len(incoming):
+                return {"type": "websocket.disconnect", "code": 1000}
+            try:
+                return await asyncio.wait_for(inbox.get(), 0.05)
+            except asyncio.TimeoutError:
+                return await receive()
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                sent.append(json.loads(message["text"]))
+
+        scope = {"type": "websocket", "path": "/api/chat/ws", "query_string": b"session_id=s1", "headers": []}
+        await asyncio.wait_for(main.app(scope, receive, send), 5)
+        return sent
+
+    return asyncio.run(scenario())
+
+
+def test_socket_streams_partial_results_and_keeps_history(monkeypatch):
+    events = _run_socket(monkeypatch, [
+        json.dumps({"type": "user", "content": "I burned my hand on the stove"}),
+        json.dumps({"type": "user", "content": "it is blistering now"}),
+    ])
+
+    assert events[0] == {"type": "ready", "session_id": "s1"}
+    first_turn = [e["type"] for e in events if e.get("turn") == 1]
+    assert first_turn == ["triage", "steps", "follow_up", "message"]
+    messages = [e for e in events if e["type"] == "message"]
+    assert [m["content"] for m in messages] == ["reply 1", "reply 3"]
+
+
+def test_socket_reports_bad_and_oversized_messages(monkeypatch):
+    monkeypatch.setattr(main, "WS_MAX_MESSAGE_BYTES", 64)
+    events = _run_socket(monkeypatch, ["not json", json.dumps({"type": "user", "content": "x" * 100})])
+
+    assert [(e["type"], e.get("status")) for e in events[1:]] == [("error", 400), ("error", 413)]
@@ -0,0 +1,28 @@
+from app.agents import emergency_classifier, instruction_agent
+from app.services import context_bundles
+
+
+def _retrieve(query, top_k=8):
+    category = query.replace(" first aid", "")
+    return [
+        {"_id": f"{category}-1", "text": f"Guide for {category}."},
+        {"_id": f"{category}-1", "text": f"Guide for {category}."},
+        {"_id": f"{category}-copy", "text": f"guide  for {category}."},
+        {"_id": f"{category}-2", "text": f"When to seek care for {category}."},
+    ]
+
+
+def test_bundles_are_deduplicated_and_used_for_generic_queries(monkeypatch):
+    for name, value in (("_BUNDLES", {}), ("_CATEGORIES", {}), ("_RETRIEVE", None)):
+        monkeypatch.setattr(context_bundles, name, value)
+    context_bundles.configure(emergency_classifier.CATEGORY_KEYWORDS, _retrieve)
+    assert context_bundles.refresh_all() == len(emergency_classifier.CATEGORY_KEYWORDS)
+
+    bundle = context_bundles.lookup("burn", "I burned my hand, it hurts")
+    assert bundle is not None
+    assert bundle.sources == ["burn-1", "burn-2"]
+    assert context_bundles.lookup("burn", "hot cooking oil splashed on my forearm and neck") is None
+
+    monkeypatch.setattr(instruction_agent, "retrieve_context", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    result = instruction_agent.generate("I burned my hand", category="burn", use_llm=True)
+    assert result["sources"] == ["burn-1", "burn-2"]
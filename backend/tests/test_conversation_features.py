@@ -0,0 +1,60 @@
+import re
+
+from app.agents import recovery_agent
+from app.main import _detect_location_known, _detect_trend
+from app.services.conversation_features import (
+    BODY_PART_KEYWORDS,
+    RECOVERY_PATTERNS,
+    TREND_PATTERNS,
+    extract_features,
+)
+
+SAMPLES = [
+    "",
+    "My hand is bleeding and it's getting worse",
+    "the burn on my arm looks better, less pain now",
+    "Swelling is about the same, no change since this morning",
+    "it is stable but spreading up the leg",
+    "I'm feeling better now, bleeding has stopped",
+    "not painful anymore",
+    "my backpack fell on my toes",
+    "Pain is gone. All good now!",
+    "more numbness in the fingers, lighter bleeding though",
+]
+
+
+def _legacy_trend(text):
+    lowered = text.lower()
+    for label, patterns in TREND_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, lowered):
+                return label
+    return None
+
+
+def test_features_match_individual_pattern_scans():
+    for text in SAMPLES:
+        lowered = text.lower()
+        features = extract_features(text)
+
+        assert features.trend == (_legacy_trend(text) if text else None), text
+        assert features.location_known == any(
+            re.search(rf"\b{re.escape(part)}\b", lowered) for part in BODY_PART_KEYWORDS
+        ), text
+        assert list(features.recovery_matches) == [
+            p for p in RECOVERY_PATTERNS if re.search(p, lowered)
+        ], text
+
+
+def test_helpers_delegate_to_extractor():
+    assert _detect_trend("It is getting worse") == "worse"
+    assert _detect_location_known("cut on my wrist") is True
+    assert _detect_location_known("cut on my wristband") is False
+
+    history = [
+        {"role": "user", "content": "the bleeding has stopped"},
+        {"role": "assistant", "content": "Great"},
+    ]
+    result = recovery_agent.detect(history, "yes")
+    assert result["recovered"] is True
+    assert recovery_agent.detect(history, "it still hurts")["recovered"] is False
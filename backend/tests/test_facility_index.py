@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+from app.services import facility_index, mcp_server
+
+
+def _great_circle_order(records, lat, lng):
+    def haversine(record):
+        dphi = math.radians(record["lat"] - lat)
+        dlam = math.radians(record["lng"] - lng)
+        return (
+            math.sin(dphi / 2) ** 2
+            + math.cos(math.radians(lat)) * math.cos(math.radians(record["lat"])) * math.sin(dlam / 2) ** 2
+        )
+
+    return [record["name"] for record in sorted(records, key=haversine)]
+
+
+def test_nearest_matches_brute_force_including_poles_and_date_line(tmp_path):
+    rng = random.Random(3)
+    records = [
+        {"name": f"f{i}", "kind": "hospital", "lat": rng.uniform(-89.9, 89.9), "lng": rng.uniform(-180, 180)}
+        for i in range(2000)
+    ]
+    records.append({"name": "east", "kind": "urgent care", "lat": 10.0, "lng": 179.99})
+    records.append({"name": "west", "kind": "unknown", "lat": 10.0, "lng": -179.99})
+    path = str(tmp_path / "facilities.idx")
+    assert facility_index.write(records, path, leaf_size=4) == len(records)
+
+    index = facility_index.FacilityIndex(path)
+    queries = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(40)] + [(89.99, 0.0), (-45.0, -179.9)]
+    for lat, lng in queries:
+        got = [facility.name for facility in index.nearest(lat, lng, k=5)]
+        assert got == _great_circle_order(records, lat, lng)[:5]
+
+    east, west = index.nearest(10.0, 180.0, k=2)
+    assert {east.name, west.name} == {"east", "west"}
+    assert {east.kind, west.kind} == {"urgent_care", "other"}
+    assert east.distance_km < 2.0
+    assert index.nearest(10.0, 180.0, k=5, max_km=5.0) == [east, west]
+    index.close()
+
+
+def test_truncated_index_is_refused_cleanly(tmp_path, monkeypatch):
+    records = [{"name": f"f{i}", "kind": "hospital", "lat": i * 0.5, "lng": i * 0.5} for i in range(100)]
+    path = tmp_path / "facilities.idx"
+    facility_index.write(records, str(path))
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) // 2])
+
+    with pytest.raises(ValueError, match="truncated"):
+        facility_index.FacilityIndex(str(path))
+    monkeypatch.setattr(facility_index, "FACILITY_INDEX_PATH", str(path))
+    facility_index.get_index.cache_clear()
+    try:
+        assert facility_index.get_index() is None
+        assert facility_index.nearest(1.0, 1.0) == []
+    finally:
+        facility_index.get_index.cache_clear()
+
+
+def test_emergency_numbers_directory_with_default_fallback():
+    sri_lanka = mcp_server.get_emergency_numbers("lk")
+    assert sri_lanka["numbers"]["AMBULANCE"] == "1990"
+    assert sri_lanka["source"] == "directory"
+    assert mcp_server.get_emergency_numbers("US")["numbers"]["POLICE"] == "911"
+    unknown = mcp_server.get_emergency_numbers("ZZ")
+    assert unknown["source"] == "default" and unknown["numbers"]["AMBULANCE"] == "112"
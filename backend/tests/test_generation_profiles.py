@@ -0,0 +1,74 @@
+from app.agents import instruction_agent
+from app.services import context_bundles, generation_profiles
+
+PROFILES = """
+profiles:
+  critical: {model: {groq: fast-model, openai: fast-model}, max_tokens: 200, context_chars: 60, top_k: 2, timeout: 5}
+  detailed: {model: rich-model, max_tokens: 800, top_k: 6, timeout: 20}
+rules:
+  - categories: [choking]
+    profile: critical
+  - severities: [high]
+    profile: critical
+  - severities: [low]
+    profile: detailed
+  - severities: [low]
+    profile: missing
+default: detailed
+"""
+
+
+class _Response:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": "1. Act now."}}], "usage": {}}
+
+
+def _use_profiles(monkeypatch, tmp_path):
+    path = tmp_path / "profiles.yaml"
+    path.write_text(PROFILES, encoding="utf-8")
+    monkeypatch.setattr(generation_profiles, "GENERATION_PROFILES_PATH", str(path))
+    generation_profiles.load_profiles.cache_clear()
+
+
+def test_profiles_are_selected_by_category_then_severity(monkeypatch, tmp_path):
+    _use_profiles(monkeypatch, tmp_path)
+    try:
+        assert generation_profiles.select("low", "choking").name == "critical"
+        assert generation_profiles.select("high", "burn").name == "critical"
+        assert generation_profiles.select("medium", "sprain").name == "detailed"
+        assert len(generation_profiles.load_profiles().rules) == 3
+    finally:
+        generation_profiles.load_profiles.cache_clear()
+
+
+def test_generate_applies_profile_limits(monkeypatch, tmp_path):
+    _use_profiles(monkeypatch, tmp_path)
+    calls = {}
+
+    def fake_post(provider, operation, url, headers=None, json=None, timeout=None):
+        calls.update(json=json, timeout=timeout)
+        return _Response()
+
+    def fake_retrieve(query, embedding=None, top_k=4):
+        calls["top_k"] = top_k
+        return [{"_id": "d1", "text": "Give back blows. " * 5}, {"_id": "d2", "text": "Call for help."}]
+
+    monkeypatch.setattr(context_bundles, "lookup", lambda category, query: None)
+    monkeypatch.setattr(instruction_agent, "retrieve_context", fake_retrieve)
+    monkeypatch.setattr(instruction_agent.upstream, "post", fake_post)
+    monkeypatch.setattr(instruction_agent, "GROQ_API_KEY", "key")
+    monkeypatch.setattr(instruction_agent, "OPENAI_API_KEY", "key")
+    try:
+        result = instruction_agent.generate("my child is choking", category="choking", severity="high")
+    finally:
+        generation_profiles.load_profiles.cache_clear()
+
+    assert result["profile"] == "critical"
+    assert calls["top_k"] == 2 and calls["timeout"] == 5
+    assert calls["json"]["model"] == "fast-model" and calls["json"]["max_tokens"] == 200
+    user_prompt = calls["json"]["messages"][1]["content"]
+    assert "Call for help." not in user_prompt
+    assert generation_profiles.fit_context("a\n\nb", 0) == "a\n\nb"
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from app import main
+from app.services import context_bundles, guides
+
+
+async def _get(path, headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "scheme": "http", "client": ("test", 1), "server": ("test", 80), "headers": list(headers),
+    }
+    await main.app(scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return sent[0]["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_guides_are_cacheable_and_revalidate_with_etag():
+    guides.render_all()
+    status, headers, body = asyncio.run(_get("/api/guides/Allergic-Reaction"))
+    guide = json.loads(body)
+    assert status == 200 and guide["category"] == "allergic reaction" and guide["verified"]
+    assert guide["call_emergency_services"] and guide["steps"][0].startswith("Ask if the person")
+    assert headers["etag"].startswith('"') and "max-age=" in headers["cache-control"]
+
+    status, again, body = asyncio.run(_get("/api/guides/anaphylaxis", [(b"if-none-match", headers["etag"].encode())]))
+    assert status == 200  # a different guide, so a different ETag
+    status, again, body = asyncio.run(_get("/api/guides/allergic_reaction", [(b"if-none-match", headers["etag"].encode())]))
+    assert (status, body, again["etag"]) == (304, b"", headers["etag"])
+    assert asyncio.run(_get("/api/guides/gardening"))[0] == 404
+
+    listing = json.loads(asyncio.run(_get("/api/guides"))[2])["guides"]
+    assert {"burn", "poisoning", "scald", "broken bone"} <= {g["category"] for g in listing}
+
+
+def test_rerender_keeps_unchanged_etags_and_withholds_unverified(monkeypatch):
+    guides.render_all()
+    before = guides.get("burn").etag
+    assert guides.render_all() and guides.get("burn").etag == before
+
+    monkeypatch.setattr(context_bundles, "_BUNDLES", {"burn": context_bundles.Bundle("burn", "Cool it.", ["kb-7"], 0.0)})
+    monkeypatch.setattr(guides, "_VERIFY", lambda text: {"passed": "Heimlich" not in text, "policy_flags": []})
+    try:
+        guides.render_all()
+        assert json.loads(guides.get("burn").body)["sources"] == ["kb-7"]
+        assert guides.get("burn").etag != before
+        assert guides.get("choking") is None
+    finally:
+        monkeypatch.undo()
+        guides.render_all()
+
+
+def test_emergency_flag_agrees_with_the_steps():
+    guides.render_all()
+    rendered = {c: guides.get(c) for c in guides._CATEGORIES}
+    assert rendered and all(r is not None for r in rendered.values())
+    for category, guide in rendered.items():
+        guide = json.loads(guide.body)
+        says_call = any("call emergency services" in step.lower() for step in guide["steps"])
+        assert guide["call_emergency_services"] == (says_call or guide["severity"] in {"high", "severe"}), category
+    assert json.loads(guides.get("poisoning").body)["call_emergency_services"]
+    assert json.loads(guides.get("overdose").body)["call_emergency_services"]
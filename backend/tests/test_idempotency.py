@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+import time
+
+from app import main
+from app.services import idempotency
+
+
+async def _post(body, headers=()):
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()  # the client stays connected until the response
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "path": "/api/chat/continue", "raw_path": b"/api/chat/continue", "query_string": b"",
+        "root_path": "", "scheme": "http", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"application/json")] + list(headers),
+    }
+    await main.app(scope, receive, send)
+    headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return sent[0]["status"], headers, json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+
+
+def _count_pipeline_runs(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_continue(req, degraded=False, on_event=None):
+        with lock:
+            calls.append(req.session_id)
+            run = len(calls)
+        time.sleep(0.1)
+        return {"ok": True, "messages": [m.dict() for m in req.messages], "result": {"run": run}}
+
+    monkeypatch.setattr(main, "_continue_conversation", fake_continue)
+    monkeypatch.setattr(idempotency, "_STORE", idempotency.IdempotencyStore(60.0, 100))
+    return calls
+
+
+def test_retries_share_one_pipeline_run(monkeypatch):
+    calls = _count_pipeline_runs(monkeypatch)
+    body = {"session_id": "s1", "messages": [{"role": "user", "content": "my hand is bleeding"}]}
+
+    async def scenario():
+        concurrent = await asyncio.gather(*(_post(body) for _ in range(3)))
+        later = await _post(body)
+        other = await _post(dict(body, session_id="s2"))
+        return concurrent, later, other
+
+    concurrent, later, other = asyncio.run(scenario())
+    assert calls == ["s1", "s2"]
+    assert [payload["result"]["run"] for _, _, payload in concurrent + [later]] == [1, 1, 1, 1]
+    assert sorted(h.get("idempotent-replayed", "") for _, h, _ in concurrent) == ["", "true", "true"]
+    assert later[1]["idempotent-replayed"] == "true"
+    assert other[2]["result"]["run"] == 2
+
+
+def test_reused_key_with_different_messages_conflicts(monkeypatch):
+    calls = _count_pipeline_runs(monkeypatch)
+    key = [(b"idempotency-key", b"retry-1")]
+    first = {"messages": [{"role": "user", "content": "my hand is bleeding"}]}
+    second = {"messages": [{"role": "user", "content": "I burned my arm"}]}
+
+    async def scenario():
+        return await _post(first, key), await _post(first, key), await _post(second, key)
+
+    original, retry, reused = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert original[0] == retry[0] == 200 and retry[2] == original[2]
+    assert reused[0] == 422
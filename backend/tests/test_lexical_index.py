@@ -0,0 +1,50 @@
+from app.agents import instruction_agent
+from app.services import lexical_index
+
+
+DOCUMENTS = [
+    {"_id": "burns", "text": "Second degree burn: cool the burn under running water for 20 minutes, do not pop blisters."},
+    {"_id": "nosebleed", "text": "Nosebleed: lean forward and pinch the soft part of the nose for ten minutes."},
+    {"_id": "sting", "text": "Bee sting: scrape the sting out sideways and apply a cold pack."},
+] + [
+    {"_id": f"general-{i}", "text": "Stay calm, check the scene is safe and call emergency services if unsure."}
+    for i in range(20)
+]
+
+
+def _use_index(monkeypatch, documents=DOCUMENTS):
+    monkeypatch.setattr(lexical_index, "_INDEX", lexical_index.BM25Index.build(documents))
+
+
+def test_decisive_lexical_match_skips_embedding_and_vector_search(monkeypatch):
+    _use_index(monkeypatch)
+    calls = []
+    monkeypatch.setattr(instruction_agent, "embed", lambda text: calls.append("embed") or [0.1])
+    monkeypatch.setattr(instruction_agent.vector_db, "similarity_search", lambda *a, **k: calls.append("search") or [])
+
+    docs = instruction_agent.retrieve_context("burn second degree blisters")
+
+    assert docs[0]["_id"] == "burns"
+    assert calls == []
+
+
+def test_ambiguous_query_is_fused_with_vector_results(monkeypatch):
+    _use_index(monkeypatch)
+    vector_docs = [{"_id": "sting", "text": "..."}, {"_id": "vector-only", "text": "..."}]
+    monkeypatch.setattr(instruction_agent, "embed", lambda text: [0.1])
+    monkeypatch.setattr(instruction_agent.vector_db, "similarity_search", lambda *a, **k: vector_docs)
+
+    docs = instruction_agent.retrieve_context("calm safe")
+
+    ids = [d["_id"] for d in docs]
+    assert "vector-only" in ids
+    assert len(ids) == 4
+
+
+def test_prebuilt_index_round_trips(tmp_path):
+    index = lexical_index.BM25Index.build(DOCUMENTS)
+    path = tmp_path / "lexical.json.gz"
+    lexical_index.save(index, str(path))
+
+    loaded = lexical_index.load(str(path))
+    assert [h.document["_id"] for h in loaded.search("bee sting")] == [h.document["_id"] for h in index.search("bee sting")]
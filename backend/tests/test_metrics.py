@@ -0,0 +1,30 @@
+from app.agents import conversational_agent
+from app.main import metrics_endpoint
+from app.services import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("test_latency_seconds", "Test histogram.", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(3.0, stage="a")
+
+    lines = hist.render()
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="a"} 3' in lines
+
+
+def test_pipeline_stages_exposed_on_metrics_endpoint():
+    before = {stage: metrics.STAGE_SECONDS.snapshot(stage=stage)[0] for stage in ("classification_gate", "triage")}
+    conversational_agent.handle_message("my hand is bleeding badly")
+    assert {stage: metrics.STAGE_SECONDS.snapshot(stage=stage)[0] - count for stage, count in before.items()} == {
+        "classification_gate": 1,
+        "triage": 1,
+    }
+
+    body = metrics_endpoint().body.decode()
+    assert "# TYPE firstaid_stage_seconds histogram" in body
+    assert 'firstaid_stage_seconds_count{stage="triage"}' in body
+    assert 'firstaid_stage_seconds_count{stage="verification"}' in body
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from app import main
+from app.agents import conversational_agent, instruction_agent
+from app.services import prefetch
+
+
+def test_prefetched_retrieval_is_used_by_the_submitted_turn(monkeypatch):
+    prefetch.clear()
+    retrievals = []
+
+    def fake_retrieve(query, embedding=None, top_k=4):
+        retrievals.append(query)
+        return [{"_id": "kb-burn", "text": "Cool the burn under running water."}]
+
+    monkeypatch.setattr(instruction_agent, "retrieve_context", fake_retrieve)
+    monkeypatch.setattr(instruction_agent, "GROQ_API_KEY", "")
+    monkeypatch.setattr(instruction_agent, "OPENAI_API_KEY", "")
+    draft = "boiling water splashed on my forearm and it burned"
+
+    assert conversational_agent.prefetch(draft) == "warmed"
+    assert conversational_agent.prefetch(draft) == "cached"
+    assert conversational_agent.prefetch("what's a good stock to buy") == "out_of_scope"
+    assert len(retrievals) == 1
+
+    hits = prefetch._LOOKUPS.value(result="hit")
+    result = instruction_agent.generate(draft, category="burn", severity="medium")
+    assert result["sources"] == ["kb-burn"] and len(retrievals) == 1
+    assert prefetch._LOOKUPS.value(result="hit") == hits + 1
+
+    instruction_agent.generate("my cat scratched my arm and it burned a bit", category="burn", severity="low")
+    assert len(retrievals) == 2
+    prefetch.clear()
+
+
+def test_prefetch_endpoint_is_rate_limited(monkeypatch):
+    prefetch.clear()
+    warmed = []
+    monkeypatch.setattr(conversational_agent, "prefetch", lambda text, session_id=None: warmed.append(text) or "warmed")
+    monkeypatch.setattr(prefetch, "PREFETCH_BURST", 2)
+    monkeypatch.setattr(prefetch, "PREFETCH_RATE_PER_SECOND", 0.001)
+
+    async def post(body):
+        sent = []
+        messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "path": "/api/chat/prefetch", "raw_path": b"/api/chat/prefetch", "query_string": b"",
+            "root_path": "", "scheme": "http", "client": ("test", 1), "server": ("test", 80),
+            "headers": [(b"content-type", b"application/json")],
+        }
+        await main.app(scope, receive, send)
+        return sent[0]["status"], json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+
+    async def scenario():
+        body = {"session_id": "s1", "text": "my hand is bleeding a lot"}
+        results = [await post(body) for _ in range(3)]
+        results.append(await post({"session_id": "s1", "text": "cut"}))
+        await asyncio.gather(*main._prefetch_tasks)
+        return results
+
+    results = asyncio.run(scenario())
+    assert [(status, body.get("status")) for status, body in results] == [
+        (202, "accepted"), (202, "accepted"), (429, None), (202, "too_short"),
+    ]
+    assert warmed == ["my hand is bleeding a lot"] * 2
+    prefetch.clear()
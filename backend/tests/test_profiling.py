@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from app import main
+from app.services import profiling
+
+
+def _configure(monkeypatch, tmp_path, **settings):
+    options = {"PROFILING_TOKEN": "secret", "PROFILING_SAMPLE_RATE": 0.0, "PROFILING_MAX_REPORTS": 3}
+    options.update(settings)
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    for name, value in options.items():
+        monkeypatch.setattr(profiling, name, value)
+
+
+async def _get(path, headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "scheme": "http", "client": ("test", 1), "server": ("test", 80), "headers": list(headers),
+    }
+    await main.app(scope, receive, send)
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_sampling_decision(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path)
+    assert profiling.should_profile("secret")
+    assert not profiling.should_profile("wrong") and not profiling.should_profile(None)
+
+    _configure(monkeypatch, tmp_path, PROFILING_TOKEN="", PROFILING_SAMPLE_RATE=0.25)
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.3)
+    assert not profiling.token_matches("") and not profiling.should_profile("")
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.1)
+    assert profiling.should_profile(None)
+
+
+def _allocate():
+    return [str(i) * 10 for i in range(20000)]
+
+
+def test_profiled_request_writes_a_cpu_and_memory_report(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path)
+    with profiling.profile_request("/api/chat/continue") as report_id:
+        with profiling.profile_request("nested") as nested_id:
+            kept = _allocate()
+    assert report_id and nested_id is None and kept
+
+    report = profiling.read_report(report_id)
+    assert report.startswith("request: /api/chat/continue\nwall_seconds: ")
+    assert "traced_peak_bytes: " in report
+    top_functions, allocations = report.split("== top 20 allocation sites (net during request) ==")
+    assert "== top 30 functions by cumulative time ==" in top_functions and "_allocate" in top_functions
+    assert "test_profiling.py" in allocations
+    assert profiling.list_reports() == [report_id]
+    assert profiling.read_report("../" + report_id) is None
+
+
+def test_old_reports_are_pruned(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, PROFILING_MAX_REPORTS=2)
+    for stale in ("20200101T000000-00000001", "20200101T000000-00000002", "20200101T000000-00000003"):
+        (tmp_path / f"{stale}.txt").write_text("old report")
+    with profiling.profile_request("/api/chat/continue") as report_id:
+        pass
+    assert profiling.list_reports() == [report_id, "20200101T000000-00000003"]
+
+
+def test_profile_endpoints_require_the_token(monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path)
+    with profiling.profile_request("/api/chat/continue") as report_id:
+        pass
+
+    assert asyncio.run(_get("/api/profiles"))[0] == 403
+    assert asyncio.run(_get("/api/profiles", [(b"x-profile-token", b"wrong")]))[0] == 403
+    assert asyncio.run(_get(f"/api/profiles/{report_id}"))[0] == 403
+
+    token = [(b"x-profile-token", b"secret")]
+    status, body = asyncio.run(_get("/api/profiles", token))
+    assert status == 200 and json.loads(body) == {"ok": True, "reports": [report_id]}
+    status, body = asyncio.run(_get(f"/api/profiles/{report_id}", token))
+    assert status == 200 and body.decode().startswith("request: /api/chat/continue")
+    assert asyncio.run(_get("/api/profiles/20200101T000000-deadbeef", token))[0] == 404
+
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "")
+    assert asyncio.run(_get("/api/profiles", [(b"x-profile-token", b"")]))[0] == 403
@@ -0,0 +1,67 @@
+import json
+from collections import Counter
+
+from tools import replay_conversations
+
+_OPENERS = ["I burned my hand on the stove", "My friend is choking", "I cut my finger with a knife", "I think my ankle is broken"]
+
+
+def _archive(path, conversations):
+    with open(path, "w", encoding="utf-8") as handle:
+        for i in range(conversations):
+            messages = [
+                {"role": "user", "content": _OPENERS[i % len(_OPENERS)]},
+                {"role": "assistant", "content": "Stay calm. What happened exactly?"},
+                {"role": "user", "content": "What should I do next?"},
+            ]
+            handle.write(json.dumps({"session_id": f"s{i}", "messages": messages}) + "\n")
+        handle.write("\n")  # blank lines carry no turns but still advance the watermark
+
+
+def _replay(capsys, archive, output, *extra):
+    replay_conversations.main([str(archive), "--output", str(output), "--workers", "2", "--json", *extra])
+    return json.loads(capsys.readouterr().out)
+
+
+def test_interrupted_run_resumes_and_replays_every_turn_once(tmp_path, capsys):
+    archive, output = tmp_path / "archive.jsonl", tmp_path / "after.jsonl"
+    checkpoint = str(output) + replay_conversations.CHECKPOINT_SUFFIX
+    _archive(archive, 10)
+
+    _replay(capsys, archive, output, "--limit", "3")
+    early = replay_conversations.read_checkpoint(str(output))
+    assert early["line"] == 3
+
+    # Simulate a crash: results for lines 4-6 were written, the checkpoint
+    # still says 3, and the last result line was torn mid-write.
+    _replay(capsys, archive, output, "--resume", "--limit", "6", "--checkpoint-every", "100")
+    with open(checkpoint, "w", encoding="utf-8") as handle:
+        json.dump(early, handle)
+    with open(output, "a", encoding="utf-8") as handle:
+        handle.write('{"key": "s6:0", "line": 7, "categ')
+
+    summary = _replay(capsys, archive, output, "--resume")
+    assert summary["turns"] == 8  # lines 7-10 only
+    assert replay_conversations.read_checkpoint(str(output))["line"] == 11
+
+    keys = Counter(r["key"] for r in replay_conversations.iter_results(str(output)))
+    assert keys == Counter({f"s{i}:{index}": 1 for i in range(10) for index in (0, 2)})
+    assert not any("error" in r for r in replay_conversations.iter_results(str(output)))
+
+
+def test_baseline_diff_reports_changed_turns(tmp_path, capsys):
+    archive, baseline, output = tmp_path / "archive.jsonl", tmp_path / "before.jsonl", tmp_path / "after.jsonl"
+    _archive(archive, 4)
+    _replay(capsys, archive, baseline)
+
+    records = list(replay_conversations.iter_results(str(baseline)))
+    edited = next(r for r in records if r["key"] == "s0:0")
+    original = edited["category"]
+    edited["category"], edited["in_scope"] = "gardening", False
+    baseline.write_text("".join(json.dumps(r) + "\n" for r in records if r["key"] != "s3:2"))
+
+    diff = _replay(capsys, archive, output, "--baseline", str(baseline))["diff"]
+    assert diff["compared"] == 7 and diff["not_in_baseline"] == 1
+    assert diff["changed"] == {"category": 1, "in_scope": 1, "verification_passed": 0}
+    assert diff["category_transitions"] == {f"gardening -> {original}": 1}
+    assert diff["examples"]["category"] == ["s0:0"]
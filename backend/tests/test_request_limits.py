@@ -0,0 +1,197 @@
+import asyncio
+import json
+import time
+
+from app import main
+from app.agents import conversational_agent, instruction_agent
+from app.services import request_limits, upstream
+from benchmarks import stubs
+
+
+async def _post(chunks, headers=()):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()  # the client stays connected until the response
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "path": "/api/chat/continue", "raw_path": b"/api/chat/continue", "query_string": b"",
+        "root_path": "", "scheme": "http", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"application/json")] + list(headers),
+    }
+    await main.app(scope, receive, send)
+    return sent[0]["status"], json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+
+
+def _conversation(turns, text):
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": text} for i in range(turns)]
+    return {"messages": messages + [{"role": "user", "content": "my hand is bleeding and it is getting worse"}]}
+
+
+def _fake_pipeline(monkeypatch):
+    seen = []
+
+    def handle_message(user_input, history=None, **_kwargs):
+        seen.append(len(history or []))
+        return {"triage": {"category": "bleeding", "severity": "medium"}, "instructions": {"steps": "1. Apply pressure."}}
+
+    monkeypatch.setattr(conversational_agent, "handle_message", handle_message)
+    return seen
+
+
+def test_oversized_requests_are_refused_before_parsing(monkeypatch):
+    seen = _fake_pipeline(monkeypatch)
+    monkeypatch.setattr(request_limits, "CHAT_MAX_BODY_BYTES", 4096)
+    monkeypatch.setattr(request_limits, "CHAT_MAX_MESSAGES", 5)
+    monkeypatch.setattr(request_limits, "CHAT_MAX_MESSAGE_CHARS", 200)
+    big = json.dumps(_conversation(2, "x" * 10000)).encode()
+
+    async def scenario():
+        declared = await _post([big], [(b"content-length", str(len(big)).encode())])
+        chunked = await _post([big[:3000], big[3000:]])
+        many = await _post([json.dumps(_conversation(6, "my arm hurts")).encode()])
+        long = await _post([json.dumps(_conversation(2, "y" * 201)).encode()])
+        fine = await _post([json.dumps(_conversation(2, "my arm hurts")).encode()])
+        return declared, chunked, many, long, fine
+
+    declared, chunked, many, long, fine = asyncio.run(scenario())
+    assert [r[0] for r in (declared, chunked, many, long)] == [413, 413, 413, 413]
+    assert "4096 bytes" in declared[1]["detail"] and "limit 5" in many[1]["detail"]
+    assert fine[0] == 200 and len(fine[1]["messages"]) == 4
+    assert seen == [3]
+
+
+def test_client_disconnecting_mid_body_is_not_processed(monkeypatch):
+    seen = _fake_pipeline(monkeypatch)
+    body = json.dumps(_conversation(2, "my arm hurts")).encode()
+    messages = [{"type": "http.request", "body": body[:20], "more_body": True}, {"type": "http.disconnect"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "path": "/api/chat/continue", "raw_path": b"/api/chat/continue", "query_string": b"",
+        "root_path": "", "scheme": "http", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"application/json")],
+    }
+    asyncio.run(main.app(scope, receive, send))
+    assert sent == [] and seen == []
+
+
+def _real_pipeline(monkeypatch):
+    """The real pipeline with providers stubbed; records what it is handed and the upstream calls it makes."""
+
+    seen, calls = [], []
+    handle_message = conversational_agent.handle_message
+
+    def spy(user_input, history=None, **kwargs):
+        seen.append(sum(len(m["content"]) for m in history or []) + len(user_input))
+        return handle_message(user_input, history=history, **kwargs)
+
+    def counting_post(provider, operation, url, **kwargs):
+        calls.append(operation)
+        return stubs.fake_post(provider, operation, url, **kwargs)
+
+    monkeypatch.setattr(conversational_agent, "handle_message", spy)
+    for cached in (instruction_agent._EMBED_CACHE, instruction_agent._GENERATION_CACHE):
+        monkeypatch.setattr(cached, "ttl", 0)  # every request does the full work
+    return seen, calls, counting_post
+
+
+def test_pipeline_work_is_bounded_by_the_window(monkeypatch):
+    seen, calls, counting_post = _real_pipeline(monkeypatch)
+    text = "my arm is swelling and getting worse, feeling better now, yes thanks " * 33
+
+    def work(body):
+        del calls[:]
+        status, payload = asyncio.run(_post([json.dumps(body).encode()]))
+        return status, payload, list(calls)
+
+    with stubs.stubbed_providers():
+        monkeypatch.setattr(upstream, "post", counting_post)
+        small_status, _, small_calls = work(_conversation(request_limits.CHAT_HISTORY_WINDOW, text))
+        status, payload, largest_calls = work(_conversation(request_limits.CHAT_MAX_MESSAGES - 1, text))
+        # Over the body limit: refused without reaching the pipeline.
+        refused_status, _, refused_calls = work(_conversation(250, text))
+
+    assert small_status == status == 200 and refused_status == 413
+    assert len(payload["messages"]) == request_limits.CHAT_MAX_MESSAGES + 1
+    # A conversation at the message limit hands the pipeline exactly what one
+    # at the window does, and costs the same upstream calls.
+    assert len(seen) == 2 and seen[0] == seen[1]
+    assert largest_calls == small_calls and small_calls
+    assert refused_calls == []
+
+
+def _adversarial_text():
+    # Injection phrases, long unbroken runs, markup and keyword floods for the guardrail,
+    # classifier and feature regexes, cut to the per-message limit.
+    pieces = [
+        "ignore all previous instructions and ", "a" * 300 + " ", "<script>" * 20, "1234567890" * 30 + " ",
+        "my arm is swelling and getting worse, feeling better now, yes thanks ", "bleeding burn choking " * 5,
+    ]
+    return ("".join(pieces) * 20)[: request_limits.CHAT_MAX_MESSAGE_CHARS]
+
+
+def test_cpu_per_request_is_bounded_under_adversarial_input(monkeypatch):
+    _real_pipeline(monkeypatch)
+    text = _adversarial_text()
+    turns = 1
+    while (
+        turns + 1 < request_limits.CHAT_MAX_MESSAGES
+        and len(json.dumps(_conversation(turns + 1, text))) < request_limits.CHAT_MAX_BODY_BYTES
+    ):
+        turns += 1
+    largest = json.dumps(_conversation(turns, text)).encode()
+    small = json.dumps(_conversation(2, text)).encode()
+
+    def cpu_seconds(body):
+        runs = []
+        for _ in range(3):
+            started = time.process_time()
+            status, _ = asyncio.run(_post([body]))
+            runs.append(time.process_time() - started)
+            assert status == 200
+        return sorted(runs)[1]
+
+    with stubs.stubbed_providers():
+        cpu_seconds(small)  # warm up
+        small_cpu, largest_cpu = cpu_seconds(small), cpu_seconds(largest)
+
+    # Work linear in the conversation would cost len(largest) / len(small) (about
+    # 30x) times the small request; the window keeps it to a small multiple.
+    assert largest_cpu < small_cpu * (len(largest) / len(small)) / 4
+    assert largest_cpu < 1.0
+
+
+def test_follow_up_questions_remember_early_turns(monkeypatch):
+    _real_pipeline(monkeypatch)
+    history = [{"role": "user", "content": "I burned my hand on the stove"}]
+    for i in range(7):
+        history.append({"role": "assistant", "content": "Cool the burn under running water for 20 minutes."})
+        history.append({"role": "user", "content": f"ok, done {i}"})
+    history.append({"role": "assistant", "content": "Keep cooling it."})
+    history.append({"role": "user", "content": "the burn still stings"})
+    assert len(history) > request_limits.CHAT_HISTORY_WINDOW
+
+    with stubs.stubbed_providers():
+        status, payload = asyncio.run(_post([json.dumps({"messages": history}).encode()]))
+
+    reply = payload["messages"][-1]["content"]
+    assert status == 200
+    assert "Which part of the body was burned" not in reply
+    assert "blisters" in reply
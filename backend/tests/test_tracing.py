@@ -0,0 +1,103 @@
+import asyncio
+import io
+import json
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services import tracing
+from tools import trace_report
+
+
+def _exporter(tmp_path, monkeypatch, **kwargs):
+    options = {"max_bytes": 1 << 20, "backups": 2, "queue_size": 100}
+    options.update(kwargs)
+    exporter = tracing.JsonlExporter(str(tmp_path), **options)
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "_EXPORTER", exporter)
+    return exporter
+
+
+def test_spans_in_the_threadpool_are_children_of_the_request_trace(tmp_path, monkeypatch):
+    exporter = _exporter(tmp_path, monkeypatch)
+
+    def pipeline():
+        with tracing.span("triage", category="burn", confidence=0.8, cached=False):
+            with tracing.span("embedding", batch_size=3):
+                pass
+        try:
+            with tracing.span("generation"):
+                raise TimeoutError("provider too slow")
+        except TimeoutError:
+            pass
+
+    async def request():
+        with tracing.start_trace("POST /api/chat/continue", session_id="s-1") as root:
+            await run_in_threadpool(pipeline)
+            return root.trace_id
+
+    trace_id = asyncio.run(request())
+    exporter.flush()
+
+    line = json.loads((tmp_path / tracing.TRACE_FILE).read_text().splitlines()[0])
+    resource = line["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "first-aid-guide"}}]
+    otlp_span = resource["scopeSpans"][0]["spans"][0]
+    assert otlp_span["name"] == "embedding" and otlp_span["kind"] == tracing.SPAN_KIND_INTERNAL
+    assert otlp_span["attributes"] == [{"key": "batch_size", "value": {"intValue": "3"}}]
+    assert otlp_span["status"] == {"code": tracing.STATUS_OK}
+    assert isinstance(otlp_span["startTimeUnixNano"], str)
+
+    spans = {s["name"]: s for s in trace_report.load_trace(str(tmp_path), trace_id)}
+    root = spans["POST /api/chat/continue"]
+    assert root["parentSpanId"] == "" and root["kind"] == tracing.SPAN_KIND_SERVER
+    assert root["attributes"] == {"session_id": "s-1"}
+    assert spans["triage"]["parentSpanId"] == root["spanId"]
+    assert spans["embedding"]["parentSpanId"] == spans["triage"]["spanId"]
+    assert spans["triage"]["attributes"] == {"category": "burn", "confidence": 0.8, "cached": False}
+    assert spans["generation"]["status"] == {"code": "ERROR", "message": "TimeoutError: provider too slow"}
+
+
+def test_exporter_rotates_by_size_and_counts_drops(tmp_path):
+    exporter = tracing.JsonlExporter(str(tmp_path), max_bytes=300, backups=2, queue_size=100)
+    for i in range(30):
+        exporter.submit({"n": i, "padding": "x" * 40})
+        exporter.flush()
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ["spans.jsonl", "spans.jsonl.1", "spans.jsonl.2"]
+    assert all(p.stat().st_size <= 300 for p in tmp_path.iterdir())
+    newest = [json.loads(line)["n"] for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert newest[-1] == 29
+
+    stalled = tracing.JsonlExporter(str(tmp_path / "stalled"), max_bytes=300, backups=0, queue_size=2)
+    stalled._thread, stalled._pid = object(), os.getpid()  # no writer draining the queue
+    dropped = tracing._DROPPED.value()
+    for i in range(5):
+        stalled.submit({"n": i})
+    assert tracing._DROPPED.value() == dropped + 3
+
+
+def _span(name, span_id, parent, start_ms, end_ms, error=None, **attributes):
+    record = tracing.Span("t" * 32, parent, name, attributes)
+    record.span_id, record.start_ns, record.end_ns, record.error = span_id, start_ms * 10**6, end_ms * 10**6, error
+    return json.dumps(record.to_record())
+
+
+def test_trace_report_prints_the_critical_path(tmp_path):
+    lines = [
+        _span("POST /api/chat/continue", "root", "", 0, 100, session_id="s-9"),
+        _span("triage", "a", "root", 0, 30),
+        _span("generation", "b", "root", 30, 95, model="m"),
+        _span("upstream", "c", "b", 35, 90, error="ReadTimeout: slow", attempt=2),
+        _span("prefetch", "d", "root", 5, 20),  # overlapped by triage: off the path
+    ]
+    (tmp_path / "spans.jsonl").write_text("\n".join(lines) + "\n")
+
+    assert trace_report.last_trace_id(str(tmp_path)) == "t" * 32
+    out = io.StringIO()
+    trace_report.print_critical_path(trace_report.load_trace(str(tmp_path), "t" * 32), out=out)
+    report = out.getvalue().splitlines()
+    assert report[0] == f"trace {'t' * 32}  session s-9  total 100.0 ms"
+    assert [line.split()[0] for line in report[1:]] == ["POST", "triage", "generation", "upstream"]
+    assert "65.0 ms" in report[3] and "model=m" in report[3]
+    assert "[ERROR]" in report[4] and "attempt=2" in report[4]
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.agents import emergency_classifier
+from app.services import triage_centroids
+from tools.build_triage_centroids import build
+
+
+@pytest.fixture
+def centroid_file(tmp_path, monkeypatch):
+    rng = np.random.default_rng(7)
+    anchors = {name: rng.normal(size=64) for name in ("bleeding", "burn", "out_of_scope")}
+    examples = tmp_path / "examples.jsonl"
+    with examples.open("w") as handle:
+        for name, anchor in anchors.items():
+            for _ in range(6):
+                vector = anchor + rng.normal(scale=0.2, size=64)
+                handle.write(json.dumps({"category": name, "embedding": vector.tolist()}) + "\n")
+
+    labels, matrix, counts, _ = build(str(examples), embed=lambda text: [], min_examples=5)
+    path = tmp_path / "centroids.npz"
+    np.savez_compressed(path, labels=np.array(labels), centroids=matrix.astype("float16"), counts=np.array(counts))
+
+    monkeypatch.setattr(triage_centroids, "TRIAGE_CENTROIDS_PATH", str(path))
+    triage_centroids.load_model.cache_clear()
+    yield anchors
+    triage_centroids.load_model.cache_clear()
+
+
+def test_centroid_prediction_overrides_weak_keyword_triage(centroid_file):
+    query = (centroid_file["bleeding"] + np.random.default_rng(1).normal(scale=0.2, size=64)).tolist()
+
+    keyword = emergency_classifier.classify("it keeps oozing from my palm")
+    local = emergency_classifier.classify("it keeps oozing from my palm", embedding=query)
+
+    assert keyword["category"] in {"out_of_scope", "unknown"}
+    assert emergency_classifier.needs_local_triage(keyword)
+    assert local["category"] == "bleeding"
+    assert local["source"] == "centroid"
+    assert local["severity"] == "medium"
+
+
+def test_keyword_rules_remain_the_fallback(centroid_file):
+    wrong_dimensions = [0.1] * 8
+
+    assert emergency_classifier.classify("I burned my hand", embedding=wrong_dimensions)["category"] == "burn"
+    assert emergency_classifier.classify("I burned my hand", embedding=None).get("source") is None
+
+
+def _agent_with_embedding(monkeypatch, vector):
+    from app.agents import conversational_agent, instruction_agent
+
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return vector
+
+    monkeypatch.setattr(instruction_agent, "embed", embed)
+    return conversational_agent, embedded
+
+
+def test_centroids_only_reconsider_borderline_rejections_by_a_margin(centroid_file, monkeypatch):
+    from benchmarks import stubs
+
+    bleeding = (centroid_file["bleeding"] + np.random.default_rng(2).normal(scale=0.2, size=64)).tolist()
+    agent, embedded = _agent_with_embedding(monkeypatch, bleeding)
+    prediction = triage_centroids.predict(bleeding)
+    assert prediction["category"] == "bleeding" and prediction["margin"] > 0.5
+    borderline = triage_centroids.predict((centroid_file["bleeding"] + 0.9 * centroid_file["out_of_scope"]).tolist())
+    assert borderline is None or borderline["margin"] < prediction["margin"] / 2
+
+    with stubs.stubbed_providers():
+        assert agent.handle_message("write python code")["rejected"]
+        assert embedded == []  # no weak cues: the keyword rejection stands without an embedding
+
+        result = agent.handle_message("my palm keeps oozing")
+        assert not result.get("rejected") and result["triage"]["category"] == "bleeding"
+        assert embedded[0] == "my palm keeps oozing"
+
+        monkeypatch.setattr(emergency_classifier, "TRIAGE_CENTROID_MIN_MARGIN", prediction["margin"] + 0.01)
+        assert agent.handle_message("my palm keeps oozing")["rejected"]
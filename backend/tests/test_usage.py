@@ -0,0 +1,30 @@
+import json
+
+from app.services import tracing, usage
+from tools.usage_report import summarise
+
+
+def test_calls_are_attributed_to_scope_and_written_to_the_ledger(tmp_path, monkeypatch):
+    ledger = tracing.JsonlExporter(str(tmp_path), 1 << 20, 1, 100, filename=usage.USAGE_FILE)
+    monkeypatch.setattr(usage, "_LEDGER", ledger)
+    labels = dict(stage="generation", provider="openai", model="gpt-4o-mini", category="burn")
+    before = usage.TOKENS.value(kind="prompt", **labels)
+
+    with usage.scope(session_id="s-1"):
+        usage.label(category="Burn")
+        exact = usage.record("generation", "openai", "gpt-4o-mini", seconds=0.2, prompt_tokens=1000,
+                             completion_tokens=200, shape="bundle")
+        guessed = usage.record("generation", "openai", "gpt-4o-mini", seconds=0.1, prompt_chars=400,
+                               completion_chars=80)
+    outside = usage.record("embedding", "openai", "text-embedding-3-small", seconds=0.01, prompt_chars=40)
+    ledger.flush()
+
+    assert exact["cost_usd"] == round((1000 * 0.15 + 200 * 0.60) / 1e6, 8)
+    assert (guessed["prompt_tokens"], guessed["completion_tokens"], guessed["estimated"]) == (100, 20, True)
+    assert (outside["category"], outside["session_id"], outside["embedding_tokens"]) == ("unknown", "", 10)
+    assert usage.TOKENS.value(kind="prompt", **labels) - before == 1100
+
+    entries = [json.loads(line) for line in (tmp_path / usage.USAGE_FILE).read_text().splitlines()]
+    assert [e["session_id"] for e in entries] == ["s-1", "s-1", ""]
+    by_session = dict(summarise(entries, ["session_id"]))
+    assert by_session[("s-1",)]["calls"] == 2 and by_session[("s-1",)]["estimated"] == 1
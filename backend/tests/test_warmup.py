@@ -0,0 +1,19 @@
+import threading
+
+from app.services import warmup
+
+
+def test_shared_phases_run_once_and_per_worker_phases_wait_for_the_worker(monkeypatch):
+    for name, value in (
+        ("_PHASES", []), ("_PER_WORKER", set()), ("_DONE", set()), ("_TIMINGS", {}), ("_ERRORS", {}),
+        ("_READY", threading.Event()), ("_STARTED", threading.Event()),
+    ):
+        monkeypatch.setattr(warmup, name, value)
+    calls = []
+    warmup.register("index", lambda: calls.append("index"), order=10)
+    warmup.register("connections", lambda: calls.append("connections"), order=90, per_worker=True)
+
+    warmup.run_shared()
+    assert calls == ["index"] and not warmup.is_ready()
+    warmup.run()
+    assert calls == ["index", "connections"] and warmup.is_ready()
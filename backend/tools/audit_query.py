@@ -0,0 +1,89 @@
+"""Query the conversation audit log.
+
+Usage (from ``backend/``)::
+
+    python -m tools.audit_query --since 7d --severity high --category bleeding
+    python -m tools.audit_query --since 24h --count
+    python -m tools.audit_query --since 2024-05-01 --until 2024-05-08 --out-of-scope
+
+Reads the segment files in ``--dir`` (defaults to ``AUDIT_LOG_DIR``) through
+memory maps. Time, severity, category and scope filters are applied to the
+record headers, so only matching records are decompressed; ``--count`` and
+``--summary`` never decompress. Matching records are printed as JSONL.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.config import AUDIT_LOG_DIR
+from app.services import audit_log
+
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value: Optional[str]) -> Optional[int]:
+    """Unix milliseconds from ``7d``/``12h``-style offsets, ISO dates or raw ms."""
+
+    if not value:
+        return None
+    match = _RELATIVE.match(value)
+    if match:
+        return int((time.time() - float(match.group(1)) * _UNIT_SECONDS[match.group(2)]) * 1000)
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=AUDIT_LOG_DIR)
+    parser.add_argument("--since", help="e.g. 7d, 12h, 2024-05-01 or unix ms")
+    parser.add_argument("--until")
+    parser.add_argument("--severity", action="append", choices=audit_log.SEVERITIES, help="repeatable")
+    parser.add_argument("--category")
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--in-scope", dest="in_scope", action="store_const", const=True)
+    scope.add_argument("--out-of-scope", dest="in_scope", action="store_const", const=False)
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--count", action="store_true", help="print the number of matching turns")
+    output.add_argument("--summary", action="store_true", help="counts by category and severity")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many records")
+    args = parser.parse_args(argv)
+
+    records = audit_log.scan(
+        args.dir,
+        since_ms=parse_time(args.since),
+        until_ms=parse_time(args.until),
+        severities=args.severity,
+        category=args.category,
+        in_scope=args.in_scope,
+        decode=not (args.count or args.summary),
+    )
+    if args.count:
+        print(sum(1 for _ in records))
+        return 0
+    if args.summary:
+        counts = Counter((r["category"] or "-", r["severity"]) for r in records)
+        for (category, severity), count in counts.most_common():
+            print(f"{category:<20} {severity:<8} {count:>8}")
+        return 0
+    for number, record in enumerate(records, 1):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if args.limit and number >= args.limit:
+            break
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
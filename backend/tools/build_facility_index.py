@@ -0,0 +1,45 @@
+"""Build the memory-mapped nearest-facility index used by ``mcp_server``.
+
+Usage (from ``backend/``)::
+
+    python -m tools.build_facility_index facilities.csv --output facilities.idx
+
+The input is a CSV with ``name``, ``lat``/``latitude``, ``lng``/``lon``/
+``longitude`` and ``kind`` columns, or JSONL with ``name``, ``lat``, ``lng``
+and ``kind`` fields (``kind`` is one of hospital, urgent_care, clinic,
+other). Set ``FACILITY_INDEX_PATH`` to the output file.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from app.services import facility_index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("facilities", help="CSV or JSONL facility list")
+    parser.add_argument("--output", required=True, help="destination index file")
+    parser.add_argument(
+        "--leaf-size",
+        type=int,
+        default=facility_index.DEFAULT_LEAF_SIZE,
+        help="facilities scanned linearly per tree leaf (default %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = facility_index.write(facility_index.iter_records(args.facilities), args.output, args.leaf_size)
+    print(
+        f"wrote {args.output}: {count} facilities, "
+        f"{os.path.getsize(args.output) / 1024:.1f} KiB in {time.perf_counter() - start:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
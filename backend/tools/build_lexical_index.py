@@ -0,0 +1,39 @@
+"""Prebuild the BM25 lexical index so workers load it instead of tokenizing.
+
+Usage (from ``backend/``)::
+
+    python -m tools.build_lexical_index knowledge_base.jsonl --output lexical_index.json.gz
+
+Set ``LEXICAL_INDEX_PATH`` to the output file. The input is the same JSONL
+knowledge base accepted by ``KNOWLEDGE_BASE_PATH`` (one ``{"_id", "text"}``
+document per line); documents are chunked the same way at build time.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from app.services import lexical_index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("knowledge_base", help="JSONL knowledge base")
+    parser.add_argument("--output", required=True, help="destination .json.gz file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = lexical_index.BM25Index.build(lexical_index.iter_knowledge_base(args.knowledge_base))
+    lexical_index.save(index, args.output)
+    print(
+        f"wrote {args.output}: {len(index)} chunks, {len(index.postings)} terms, "
+        f"{os.path.getsize(args.output) / 1024:.1f} KiB in {time.perf_counter() - start:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Build the nearest-centroid triage file used by ``TRIAGE_CENTROIDS_PATH``.
+
+Usage (from ``backend/``)::
+
+    python -m tools.build_triage_centroids examples.jsonl --output app/data/triage_centroids.npz
+
+Each input line is one labeled example::
+
+    {"text": "my hand won't stop bleeding", "category": "bleeding"}
+
+Categories should use the classifier's names (``bleeding``, ``burn``,
+``choking`` ...); include ``out_of_scope`` examples so off-topic messages have
+a centroid of their own. A line may carry a precomputed ``"embedding"``;
+otherwise the text is embedded with ``instruction_agent.embed`` (the same
+``EMBEDDING_MODEL`` used at request time). Examples are streamed, unit
+normalised and averaged per category, so memory stays at one vector per
+category. Requires numpy.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def build(path: str, embed, min_examples: int = 1):
+    sums: Dict[str, np.ndarray] = {}
+    counts: Dict[str, int] = {}
+    skipped = 0
+    with open(path, "r", encoding="utf-8") as handle:
+        for raw in handle:
+            raw = raw.strip()
+            if not raw:
+                continue
+            example = json.loads(raw)
+            category = str(example.get("category") or "").strip().lower()
+            vector = example.get("embedding") or embed(str(example.get("text") or ""))
+            if not category or not vector:
+                skipped += 1
+                continue
+            vector = np.asarray(vector, dtype=np.float64)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                skipped += 1
+                continue
+            if category in sums and sums[category].shape != vector.shape:
+                raise ValueError(f"embedding dimensions differ within category {category!r}")
+            sums[category] = sums.get(category, 0) + vector / norm
+            counts[category] = counts.get(category, 0) + 1
+
+    labels = sorted(c for c in sums if counts[c] >= min_examples)
+    if not labels:
+        raise ValueError("no categories with enough examples")
+    matrix = np.stack([sums[c] / counts[c] for c in labels])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return labels, matrix, [counts[c] for c in labels], skipped
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("examples", help="JSONL file of {text, category[, embedding]} examples")
+    parser.add_argument("--output", required=True, help="destination .npz file")
+    parser.add_argument("--dtype", choices=("float16", "float32"), default="float16", help="storage precision")
+    parser.add_argument("--min-examples", type=int, default=5, help="drop categories with fewer examples")
+    args = parser.parse_args(argv)
+
+    from app.agents import instruction_agent
+    from app.config import EMBEDDING_MODEL
+
+    labels, matrix, counts, skipped = build(args.examples, instruction_agent.embed, args.min_examples)
+    np.savez_compressed(
+        args.output,
+        labels=np.array(labels),
+        centroids=matrix.astype(args.dtype),
+        counts=np.array(counts, dtype=np.int32),
+        embedding_model=np.array(EMBEDDING_MODEL),
+    )
+    print(f"wrote {args.output}: {len(labels)} categories x {matrix.shape[1]} dims ({args.dtype}), {skipped} examples skipped")
+    for label, count in zip(labels, counts):
+        print(f"  {label:<20} {count:>6} examples")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
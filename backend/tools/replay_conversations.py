@@ -0,0 +1,348 @@
+"""Replay logged conversations through the agent pipeline and diff the outcome.
+
+Usage (from ``backend/``)::
+
+    python -m tools.replay_conversations archive.jsonl --output before.jsonl
+    # ... change a classifier or guardrail ...
+    python -m tools.replay_conversations archive.jsonl --output after.jsonl --baseline before.jsonl
+
+The archive is read line by line; each line is one conversation::
+
+    {"session_id": "abc", "messages": [{"role": "user", "content": "..."}, ...]}
+
+Every user turn is replayed through ``conversational_agent.handle_message``
+with the history that preceded it, fanned out over a process pool (one worker
+per core by default). Providers are stubbed in-process (``--providers stub``)
+or answered from a ``loadtest.standins`` cassette (``--providers cassette
+--cassette FILE``), so runs are offline and repeatable.
+
+Results are appended to ``--output`` as they finish, and a checkpoint next to
+it records how far the archive has been fully replayed; ``--resume`` continues
+an interrupted run from there. With ``--baseline`` the summary reports how
+many turns changed triage category, scope or verification outcome.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from unittest import mock
+from urllib.parse import urlparse
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+COMPARED_FIELDS = ("category", "in_scope", "verification_passed")
+
+# Cassette paths are recorded behind the stand-in server's provider prefixes.
+_CASSETTE_PREFIXES = {"openai": "/openai", "groq": "/groq", "astra": "/astra"}
+
+_WORKER_STACK: Optional[ExitStack] = None
+
+
+# -- worker side ---------------------------------------------------------------
+
+def _cassette_post(cassette: Any, strict: bool):
+    from benchmarks.stubs import StubResponse, fake_post
+
+    from loadtest.standins import Cassette
+
+    def post(provider: str, operation: str, url: str, **kwargs: Any):
+        path = _CASSETTE_PREFIXES.get(provider, "") + urlparse(url).path
+        data = kwargs.get("data")
+        body = data.encode("utf-8") if isinstance(data, str) else data or json.dumps(kwargs.get("json") or {}).encode("utf-8")
+        entry = cassette.get(Cassette.key("POST", path, body))
+        if entry is None:
+            if strict:
+                raise RuntimeError(f"{provider} {operation} request not found in cassette")
+            return fake_post(provider, operation, url, **kwargs)
+        return StubResponse(json.loads(entry["body"] or "{}"), status_code=entry["status"])
+
+    return post
+
+
+def _init_worker(providers: str, cassette_path: Optional[str], strict: bool) -> None:
+    global _WORKER_STACK
+    logging.disable(logging.WARNING)
+    from benchmarks.stubs import stubbed_providers
+
+    from app.services import upstream
+
+    _WORKER_STACK = ExitStack()
+    _WORKER_STACK.enter_context(stubbed_providers())
+    if providers == "cassette":
+        from loadtest.standins import Cassette
+
+        cassette = Cassette(cassette_path).load()
+        _WORKER_STACK.enter_context(mock.patch.object(upstream, "post", _cassette_post(cassette, strict)))
+
+
+def _summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" in result:
+        return {"error": result.get("details") or result["error"]}
+    triage = result.get("triage") or {}
+    conversation = result.get("conversation") or {}
+    verification = result.get("verification") or {}
+    return {
+        "category": triage.get("category"),
+        "severity": triage.get("severity"),
+        "in_scope": bool(conversation.get("in_scope")) and not result.get("rejected"),
+        "verification_passed": None if verification.get("skipped") else verification.get("passed"),
+    }
+
+
+def replay_turn(task: Tuple[str, int, str, str, List[Dict[str, str]]]) -> Dict[str, Any]:
+    key, line, session_id, text, history = task
+    from app.agents import conversational_agent
+
+    start = time.perf_counter()
+    try:
+        outcome = _summarize(conversational_agent.handle_message(text, history=history, session_id=session_id or None))
+    except Exception as exc:  # keep the run going; the turn is reported as an error
+        outcome = {"error": f"{type(exc).__name__}: {exc}"}
+    outcome.update(key=key, line=line, elapsed_ms=round((time.perf_counter() - start) * 1000, 3))
+    return outcome
+
+
+# -- archive and checkpoint ----------------------------------------------------
+
+def iter_archive(path: str, start_offset: int = 0, start_line: int = 0) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """Yield ``(line_number, end_offset, record)`` without loading the file."""
+
+    with open(path, "rb") as handle:
+        handle.seek(start_offset)
+        line_number = start_line
+        for raw in iter(handle.readline, b""):
+            offset = handle.tell()
+            line_number += 1
+            raw = raw.strip()
+            if not raw:
+                yield line_number, offset, {}
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                record = {}
+            yield line_number, offset, record if isinstance(record, dict) else {}
+
+
+def turns_of(line: int, record: Dict[str, Any]) -> List[Tuple[str, int, str, str, List[Dict[str, str]]]]:
+    messages = [
+        {"role": str(m.get("role")), "content": str(m.get("content", ""))}
+        for m in record.get("messages") or []
+        if isinstance(m, dict)
+    ]
+    conversation_id = str(record.get("session_id") or record.get("id") or f"line-{line}")
+    tasks = []
+    for index, message in enumerate(messages):
+        if message["role"] == "user":
+            key = f"{conversation_id}:{index}"
+            tasks.append((key, line, conversation_id, message["content"], messages[: index + 1]))
+    return tasks
+
+
+def read_checkpoint(output: str) -> Dict[str, int]:
+    try:
+        with open(output + CHECKPOINT_SUFFIX, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {"line": 0, "offset": 0}
+
+
+def write_checkpoint(output: str, line: int, offset: int) -> None:
+    tmp = output + CHECKPOINT_SUFFIX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as handle:
+        json.dump({"line": line, "offset": offset}, handle)
+    os.replace(tmp, output + CHECKPOINT_SUFFIX)
+
+
+def iter_results(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as handle:
+        for raw in handle:
+            try:
+                yield json.loads(raw)
+            except ValueError:
+                continue  # a torn final line from an interrupted run
+
+
+def _terminate_last_line(path: str) -> None:
+    """Make sure appended results do not join a line torn by an interruption."""
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as handle:
+        handle.seek(-1, os.SEEK_END)
+        if handle.read(1) != b"\n":
+            handle.write(b"\n")
+
+
+def done_after_checkpoint(output: str, line: int) -> Set[str]:
+    """Keys already written past the checkpoint (results finish out of order)."""
+
+    if not os.path.exists(output):
+        return set()
+    return {r["key"] for r in iter_results(output) if r.get("line", 0) > line}
+
+
+# -- driver ----------------------------------------------------------------------
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    checkpoint = read_checkpoint(args.output) if args.resume else {"line": 0, "offset": 0}
+    skip = done_after_checkpoint(args.output, checkpoint["line"]) if args.resume else set()
+    if not args.resume:
+        open(args.output, "w").close()
+    else:
+        _terminate_last_line(args.output)
+
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = args.max_in_flight or workers * 4
+    pending_by_line: Dict[int, int] = {}
+    line_offsets: Dict[int, int] = {}
+    watermark, watermark_offset = checkpoint["line"], checkpoint["offset"]
+    in_flight: Set[Future] = set()
+    completed = errors = 0
+    started = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(args.providers, args.cassette, args.strict),
+    ) as pool:
+
+        def advance_watermark() -> None:
+            nonlocal watermark, watermark_offset
+            next_line = watermark + 1
+            while next_line in line_offsets and pending_by_line.get(next_line, 0) == 0:
+                pending_by_line.pop(next_line, None)
+                watermark, watermark_offset = next_line, line_offsets.pop(next_line)
+                next_line += 1
+                if watermark % args.checkpoint_every == 0:
+                    out.flush()
+                    write_checkpoint(args.output, watermark, watermark_offset)
+
+        def drain(block_until: int) -> None:
+            nonlocal completed, errors
+            while len(in_flight) > block_until:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    in_flight.discard(future)
+                    outcome = future.result()
+                    out.write(json.dumps(outcome) + "\n")
+                    completed += 1
+                    errors += "error" in outcome
+                    pending_by_line[outcome["line"]] -= 1
+                advance_watermark()
+
+        for line, offset, record in iter_archive(args.archive, checkpoint["offset"], checkpoint["line"]):
+            tasks = [t for t in turns_of(line, record) if t[0] not in skip]
+            pending_by_line[line] = len(tasks)
+            line_offsets[line] = offset
+            for task in tasks:
+                in_flight.add(pool.submit(replay_turn, task))
+                drain(max_in_flight - 1)
+            if not tasks:
+                advance_watermark()
+            if args.limit and line >= args.limit:
+                break
+        drain(0)
+        advance_watermark()
+        out.flush()
+        write_checkpoint(args.output, watermark, watermark_offset)
+
+    elapsed = time.perf_counter() - started
+    summary: Dict[str, Any] = {
+        "turns": completed,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "turns_per_second": round(completed / elapsed, 2) if elapsed else 0.0,
+        "workers": workers,
+    }
+    if args.baseline:
+        summary["diff"] = diff_results(args.baseline, args.output)
+    return summary
+
+
+def diff_results(baseline_path: str, current_path: str, examples: int = 5) -> Dict[str, Any]:
+    baseline = {
+        r["key"]: tuple(r.get(field) for field in COMPARED_FIELDS)
+        for r in iter_results(baseline_path)
+        if "key" in r
+    }
+    changed: Counter = Counter()
+    transitions: Counter = Counter()
+    samples: Dict[str, List[str]] = {field: [] for field in COMPARED_FIELDS}
+    compared = missing = 0
+    for record in iter_results(current_path):
+        before = baseline.get(record.get("key"))
+        if before is None:
+            missing += 1
+            continue
+        compared += 1
+        for field, old in zip(COMPARED_FIELDS, before):
+            new = record.get(field)
+            if old != new:
+                changed[field] += 1
+                if len(samples[field]) < examples:
+                    samples[field].append(record["key"])
+                if field == "category":
+                    transitions[f"{old} -> {new}"] += 1
+    return {
+        "compared": compared,
+        "not_in_baseline": missing,
+        "changed": {field: changed[field] for field in COMPARED_FIELDS},
+        "category_transitions": dict(transitions.most_common(20)),
+        "examples": samples,
+    }
+
+
+def print_summary(summary: Dict[str, Any], out=sys.stdout) -> None:
+    print(
+        f"replayed {summary['turns']} turns in {summary['seconds']:.1f}s "
+        f"({summary['turns_per_second']:.1f} turns/s, {summary['workers']} workers, {summary['errors']} errors)",
+        file=out,
+    )
+    diff = summary.get("diff")
+    if not diff:
+        return
+    print(f"compared {diff['compared']} turns with baseline ({diff['not_in_baseline']} new)", file=out)
+    for field, count in diff["changed"].items():
+        rate = count / diff["compared"] if diff["compared"] else 0.0
+        examples = ", ".join(diff["examples"][field])
+        print(f"  {field:<20} {count:>7} changed ({rate:.2%}){'  e.g. ' + examples if examples else ''}", file=out)
+    for transition, count in diff["category_transitions"].items():
+        print(f"    {transition:<40} {count:>7}", file=out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archive", help="JSONL file, one conversation per line")
+    parser.add_argument("--output", required=True, help="JSONL file receiving one result per user turn")
+    parser.add_argument("--baseline", default=None, help="earlier --output file to diff against")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint next to --output")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: one per core)")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="turns submitted ahead of completion (default: 4 per worker)")
+    parser.add_argument("--providers", choices=("stub", "cassette"), default="stub")
+    parser.add_argument("--cassette", default=None, help="loadtest.standins cassette used with --providers cassette")
+    parser.add_argument("--strict", action="store_true", help="fail cassette misses instead of stubbing them")
+    parser.add_argument("--checkpoint-every", type=int, default=500, help="archive lines between checkpoints")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many archive lines")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+    if args.providers == "cassette" and not args.cassette:
+        parser.error("--providers cassette needs --cassette FILE")
+
+    summary = run(args)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
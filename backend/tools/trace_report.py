@@ -0,0 +1,165 @@
+"""Print the critical path of a recorded trace.
+
+Usage (from ``backend/``)::
+
+    python -m tools.trace_report <trace-id>          # one trace
+    python -m tools.trace_report --last              # most recent trace
+    python -m tools.trace_report --session <id>      # list traces of a session
+
+Reads ``spans.jsonl`` and its rotated siblings (OTLP/JSON, one export request
+per line) from ``--dir`` (defaults to ``TRACE_DIR``). The critical path is found by walking backwards from the end
+of each span and following the child that finished last, which is the chain
+of work that determined the request's latency.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_DIR = os.getenv("TRACE_DIR", "/tmp/firstaid-traces")
+TRACE_FILE = "spans.jsonl"
+
+
+def _plain_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_plain_value(item) for item in value["arrayValue"].get("values", [])]
+    for kind in ("stringValue", "boolValue", "doubleValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+def _flatten(span: Dict[str, Any]) -> Dict[str, Any]:
+    """An OTLP span with integer timestamps, a plain attribute dict and a status name."""
+
+    code = (span.get("status") or {}).get("code", 0)
+    return {
+        **span,
+        "startTimeUnixNano": int(span["startTimeUnixNano"]),
+        "endTimeUnixNano": int(span["endTimeUnixNano"]),
+        "attributes": {a["key"]: _plain_value(a.get("value") or {}) for a in span.get("attributes") or []},
+        "status": {**(span.get("status") or {}), "code": "ERROR" if code == 2 else "OK"},
+    }
+
+
+def iter_spans(directory: str) -> Iterator[Dict[str, Any]]:
+    base = Path(directory)
+    files = sorted(base.glob(f"{TRACE_FILE}*"), key=lambda p: p.stat().st_mtime)
+    for path in files:
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                for resource_spans in request.get("resourceSpans", []):
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        for span in scope_spans.get("spans", []):
+                            yield _flatten(span)
+
+
+def load_trace(directory: str, trace_id: str) -> List[Dict[str, Any]]:
+    return [s for s in iter_spans(directory) if s.get("traceId") == trace_id]
+
+
+def last_trace_id(directory: str) -> Optional[str]:
+    latest: Optional[Dict[str, Any]] = None
+    for record in iter_spans(directory):
+        if not record.get("parentSpanId"):
+            if latest is None or record["endTimeUnixNano"] >= latest["endTimeUnixNano"]:
+                latest = record
+    return latest["traceId"] if latest else None
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return spans on the critical path (root first), each annotated with ``depth``."""
+
+    by_parent: Dict[str, List[Dict[str, Any]]] = {}
+    roots = []
+    ids = {s["spanId"] for s in spans}
+    for record in spans:
+        parent = record.get("parentSpanId") or ""
+        if parent and parent in ids:
+            by_parent.setdefault(parent, []).append(record)
+        else:
+            roots.append(record)
+    if not roots:
+        return []
+    root = max(roots, key=lambda s: s["endTimeUnixNano"] - s["startTimeUnixNano"])
+
+    path: List[Dict[str, Any]] = []
+
+    def walk(node: Dict[str, Any], depth: int) -> None:
+        path.append({**node, "depth": depth})
+        children = sorted(by_parent.get(node["spanId"], []), key=lambda s: s["endTimeUnixNano"], reverse=True)
+        chain: List[Dict[str, Any]] = []
+        horizon = node["endTimeUnixNano"]
+        for child in children:
+            if child["endTimeUnixNano"] <= horizon:
+                chain.append(child)
+                horizon = child["startTimeUnixNano"]
+        for child in reversed(chain):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return path
+
+
+def _duration_ms(record: Dict[str, Any]) -> float:
+    return (record["endTimeUnixNano"] - record["startTimeUnixNano"]) / 1e6
+
+
+def print_critical_path(spans: List[Dict[str, Any]], out=sys.stdout) -> None:
+    path = critical_path(spans)
+    if not path:
+        print("no spans found", file=out)
+        return
+    total = _duration_ms(path[0]) or 1.0
+    root = path[0]
+    session = root.get("attributes", {}).get("session_id", "-")
+    print(f"trace {root['traceId']}  session {session}  total {total:.1f} ms", file=out)
+    for record in path:
+        duration = _duration_ms(record)
+        attrs = {k: v for k, v in (record.get("attributes") or {}).items() if v is not None and k != "session_id"}
+        attr_text = " ".join(f"{k}={v}" for k, v in attrs.items())
+        status = record.get("status", {}).get("code", "OK")
+        flag = "" if status == "OK" else f" [{status}]"
+        print(
+            f"{'  ' * record['depth']}{record['name']:<{40 - 2 * record['depth']}} "
+            f"{duration:>9.1f} ms {duration / total:>6.1%}{flag}  {attr_text}",
+            file=out,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace_id", nargs="?")
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--last", action="store_true", help="show the most recent trace")
+    parser.add_argument("--session", default=None, help="list trace ids recorded for a session")
+    args = parser.parse_args(argv)
+
+    if args.session:
+        for record in iter_spans(args.dir):
+            if not record.get("parentSpanId") and record.get("attributes", {}).get("session_id") == args.session:
+                print(f"{record['traceId']}  {record['name']}  {_duration_ms(record):.1f} ms")
+        return 0
+
+    trace_id = args.trace_id or (last_trace_id(args.dir) if args.last else None)
+    if not trace_id:
+        parser.error("give a trace id, --last or --session")
+    print_critical_path(load_trace(args.dir, trace_id))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
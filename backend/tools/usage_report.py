@@ -0,0 +1,110 @@
+"""Summarise upstream token usage, latency and cost from the usage ledger.
+
+Usage (from ``backend/``)::
+
+    python -m tools.usage_report                          # by stage, model, category and shape
+    python -m tools.usage_report --by category,shape      # one custom grouping
+    python -m tools.usage_report --by session_id --top 20 --since 24h
+
+Reads ``usage.jsonl`` and its rotated siblings from ``--dir`` (defaults to
+``USAGE_DIR``). Each table lists calls, tokens, estimated cost and latency
+percentiles per group, most expensive first. Rows with estimated token counts
+(the provider sent no ``usage`` block) are counted in the ``est`` column.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import USAGE_DIR
+from app.services.usage import USAGE_FILE
+
+from .audit_query import parse_time
+
+DEFAULT_GROUPINGS = ("stage,provider,model", "category", "stage,shape")
+
+
+def iter_usage(directory: str, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    files = sorted(Path(directory).glob(f"{USAGE_FILE}*"), key=lambda p: p.stat().st_mtime)
+    for path in files:
+        if since is not None and path.stat().st_mtime < since:
+            continue
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or entry.get("ts", 0) >= since:
+                    yield entry
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def summarise(entries: Sequence[Dict[str, Any]], fields: Sequence[str]) -> List[Tuple[Tuple[str, ...], Dict[str, Any]]]:
+    groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for entry in entries:
+        key = tuple(str(entry.get(field) or "-") for field in fields)
+        group = groups.setdefault(key, {
+            "calls": 0, "prompt": 0, "completion": 0, "embedding": 0, "cost": 0.0, "estimated": 0, "seconds": [],
+        })
+        group["calls"] += 1
+        group["prompt"] += entry.get("prompt_tokens", 0)
+        group["completion"] += entry.get("completion_tokens", 0)
+        group["embedding"] += entry.get("embedding_tokens", 0)
+        group["cost"] += entry.get("cost_usd", 0.0)
+        group["estimated"] += bool(entry.get("estimated"))
+        group["seconds"].append(entry.get("seconds", 0.0))
+    return sorted(groups.items(), key=lambda item: (item[1]["cost"], item[1]["calls"]), reverse=True)
+
+
+def print_table(fields: Sequence[str], rows, top: int = 0) -> None:
+    label = "/".join(fields)
+    print(f"\n{label:<44} {'calls':>7} {'est':>5} {'prompt':>10} {'compl':>9} {'embed':>9} "
+          f"{'cost $':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for key, group in rows[: top or None]:
+        print(
+            f"{'/'.join(key)[:44]:<44} {group['calls']:>7} {group['estimated']:>5} {group['prompt']:>10} "
+            f"{group['completion']:>9} {group['embedding']:>9} {group['cost']:>10.4f} "
+            f"{_percentile(group['seconds'], 0.5) * 1000:>8.1f} {_percentile(group['seconds'], 0.95) * 1000:>8.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=USAGE_DIR)
+    parser.add_argument("--since", help="e.g. 7d, 12h, 2024-05-01 or unix ms")
+    parser.add_argument(
+        "--by",
+        action="append",
+        help="comma-separated fields: stage, provider, model, category, session_id, shape (repeatable)",
+    )
+    parser.add_argument("--top", type=int, default=0, help="rows per table (0 = all)")
+    args = parser.parse_args(argv)
+
+    since_ms = parse_time(args.since)
+    entries = list(iter_usage(args.dir, since_ms / 1000 if since_ms is not None else None))
+    if not entries:
+        print(f"no usage records in {args.dir}")
+        return 1
+    total_cost = sum(entry.get("cost_usd", 0.0) for entry in entries)
+    span = max(e.get("ts", 0) for e in entries) - min(e.get("ts", 0) for e in entries)
+    print(f"{len(entries)} upstream calls over {span / 3600:.1f} h, estimated cost ${total_cost:.4f}"
+          f" (as of {time.strftime('%Y-%m-%d %H:%M', time.localtime())})")
+    for grouping in args.by or DEFAULT_GROUPINGS:
+        fields = [field.strip() for field in grouping.split(",") if field.strip()]
+        print_table(fields, summarise(entries, fields), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
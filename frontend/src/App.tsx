@@ -1,5 +1,5 @@
-import React, { useEffect, useMemo, useState } from 'react'
-import { continueChat, ChatMessage } from './api'
+import React, { useEffect, useMemo, useRef, useState } from 'react'
+import { continueChat, newClientId, prefetchDraft, ChatMessage } from './api'
 
 const styles = `
 :root {
@@ -482,6 +482,10 @@ const formatTimestamp = (value: Date) =>
     minute: '2-digit'
   })
 
+const MAX_HISTORY_MESSAGES = 40
+const PREFETCH_DEBOUNCE_MS = 400
+const PREFETCH_MIN_CHARS = 12
+
 export default function App() {
   useEffect(() => {
     const styleTag = document.createElement('style')
@@ -497,6 +501,19 @@ export default function App() {
   const [messages, setMessages] = useState<DisplayMessage[]>([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  // One session id per page load; one idempotency key per user turn, reused when
+  // the same turn is sent again after a failure so the server replays its answer.
+  const [sessionId] = useState(newClientId)
+  const pendingTurn = useRef<{ text: string; key: string } | null>(null)
+
+  useEffect(() => {
+    const draft = input.trim()
+    if (loading || draft.length < PREFETCH_MIN_CHARS) return
+    const timer = window.setTimeout(() => {
+      void prefetchDraft(draft, sessionId)
+    }, PREFETCH_DEBOUNCE_MS)
+    return () => window.clearTimeout(timer)
+  }, [input, loading, sessionId])
 
   const quickVideos: QuickVideo[] = useMemo(
     () => [
@@ -574,17 +591,25 @@ export default function App() {
     setError(null)
 
     const userChatMessage: ChatMessage = { role: 'user', content: trimmed }
+    // The backend refuses long histories (413) and only reads the recent ones.
     const history = [
       ...messages.map(({ role, content }) => ({ role, content })),
       userChatMessage
-    ]
+    ].slice(-MAX_HISTORY_MESSAGES)
     const userDisplayMessage = createDisplayMessage(userChatMessage)
+    const turn =
+      pendingTurn.current?.text === trimmed ? pendingTurn.current : { text: trimmed, key: newClientId() }
+    pendingTurn.current = turn
 
     setMessages(prev => [...prev, userDisplayMessage])
 
     try {
-      const data = await continueChat(history)
-      setMessages(prev => reconcileMessages(prev, data.messages))
+      const data = await continueChat(history, turn.key, sessionId)
+      pendingTurn.current = null
+      setMessages(prev => {
+        const kept = prev.slice(0, Math.max(0, prev.length - history.length))
+        return [...kept, ...reconcileMessages(prev.slice(kept.length), data.messages)]
+      })
       setInput('')
     } catch (err) {
       setError('Failed to get a response from the assistant. Please try again.')
@@ -36,7 +36,71 @@ export async function sendMessage(message: string): Promise<AgentResponse> {
 	}
 }
 
-export async function continueChat(messages: ChatMessage[]): Promise<ContinueResponse> {
-	const res = await axios.post<ContinueResponse>('/api/chat/continue', { messages })
+// Pass the same idempotencyKey when retrying a turn so the server replays the
+// first answer instead of running the pipeline again.
+export async function continueChat(
+	messages: ChatMessage[],
+	idempotencyKey?: string,
+	sessionId?: string
+): Promise<ContinueResponse> {
+	const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined
+	const res = await axios.post<ContinueResponse>('/api/chat/continue', { messages, session_id: sessionId }, { headers })
 	return res.data
 }
+
+// Random id for a browser session or a user turn.
+export function newClientId(): string {
+	if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+		return crypto.randomUUID()
+	}
+	return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+}
+
+export interface FirstAidGuide {
+	category: string
+	slug: string
+	severity: string
+	call_emergency_services: boolean
+	steps: string[]
+	emergency_numbers: Record<string, string>
+	sources: string[]
+	verified: boolean
+}
+
+// Cached by the browser and revalidated with the guide's ETag, so this can be
+// shown immediately while the conversational answer is produced.
+export async function getGuide(category: string): Promise<FirstAidGuide> {
+	const slug = category.trim().toLowerCase().replace(/\s+/g, '-')
+	const res = await axios.get<FirstAidGuide>(`/api/guides/${encodeURIComponent(slug)}`)
+	return res.data
+}
+
+// Fire-and-forget: lets the backend start retrieval while the user is still
+// typing. Failures (including 429 rate limiting) are deliberately ignored.
+export async function prefetchDraft(text: string, sessionId?: string): Promise<void> {
+	try {
+		await axios.post('/api/chat/prefetch', { text, session_id: sessionId })
+	} catch {
+		// speculative only
+	}
+}
+
+export type ChatEventType = 'ready' | 'triage' | 'steps' | 'follow_up' | 'message' | 'error'
+
+export interface ChatEvent {
+	type: ChatEventType
+	turn?: number
+	[key: string]: any
+}
+
+export function openChatSocket(onEvent: (event: ChatEvent) => void, sessionId?: string): WebSocket {
+	const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws'
+	const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : ''
+	const socket = new WebSocket(`${scheme}://${window.location.host}/api/chat/ws${query}`)
+	socket.onmessage = (msg) => onEvent(JSON.parse(msg.data) as ChatEvent)
+	return socket
+}
+
+export function sendChatTurn(socket: WebSocket, content: string): void {
+	socket.send(JSON.stringify({ type: 'user', content }))
+}
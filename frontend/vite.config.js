@@ -11,6 +11,7 @@ export default defineConfig({
       '/api': {
         target: proxyTarget,
         changeOrigin: true,
+        ws: true,
       },
     },
   },